@@ -0,0 +1,274 @@
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+from caching import LRUCache
+from parallel import run_tasks, uses_processes
+from utils import format_currency_labels, current_opportunities_kpis, competitor_kpis, contracts_kpis
+
+# aggregates of recently viewed filter selections, shared by all sessions
+AGGREGATE_CACHE = LRUCache(maxsize=256)
+
+# grouped data of every page: group-by columns and mapping of column to 'count', 'sum' or 'mean',
+# grouped from the filtered rows or answered from the rollup cubes, each independently of the others
+CURRENT_OPPORTUNITIES_GROUPS = {
+    "opp_by_type": (["Type"], {'Notice_ID': 'count', 'Days_to_ResponseDeadline': 'mean'}),
+    "opp_by_agency": (["Awarding_Agency"], {"Notice_ID": "count"}),
+    "opp_by_posted_date": (["Posted_Date"], {"Notice_ID": "count"}),
+    "avg_days_to_response_NAICS": (["NAICSCodeDesc"], {"Days_to_ResponseDeadline": "mean"}),
+}
+COMPETITOR_GROUPS = {
+    "awards_by_recipient": (["Recipient Name"], {"generated_internal_id": "count"}),
+    "awards_amount_by_recipient": (["Recipient Name"], {"Award Amount": "sum"}),
+    "award_amount_df": (["Awarding Agency"], {"Award ID": "count", "Award Amount": "sum"}),
+    "award_amount_by_recp_naics_df": (["naics_description", "Awarding Agency"], {"Award Amount": "sum"}),
+}
+FORECAST_GROUPS = {
+    "award_amount_by_months": (["Months Until Contract Ends", "Recipient Name"], {"Award Amount": "sum"}),
+    "award_amount_by_duration": (["Contract Duration (Years)", "Recipient Name"], {"Award Amount": "sum"}),
+}
+
+
+def normalize_selection(selection: dict):
+    """
+    Hashable form of a sidebar selection that does not depend on the order of the choices.
+
+    :param selection: Mapping of column name to the list of selected values.
+    :return: Sorted tuple of (column, values) pairs for the columns with a selection.
+    """
+    return tuple(sorted((column, tuple(sorted(values, key=str)))
+                        for column, values in selection.items() if values))
+
+
+def cached_aggregates(version, page: str, selection: dict, compute):
+    """
+    Aggregates of a page for a filter selection, computed once per dataset version and selection.
+    The returned DataFrames are shared and must not be modified.
+
+    :param version: Version of the dataset the page is computed from.
+    :param page: Name of the page.
+    :param selection: Mapping of column name to the list of selected values.
+    :param compute: Callable without arguments computing the aggregates on a miss.
+    :return: Dictionary of aggregates.
+    """
+    return AGGREGATE_CACHE.get_or_compute((version, page, normalize_selection(selection)), compute)
+
+
+def group_aggregate(data: pd.DataFrame, by: list, aggregations: dict):
+    """
+    Aggregate the rows per key, in key order, like RollupCube.aggregate.
+
+    :param data: Filtered rows.
+    :param by: Columns to group by.
+    :param aggregations: Mapping of column to 'count', 'sum' or 'mean'.
+    :return: DataFrame with the keys and aggregated columns, one row per key in key order.
+    """
+    # categorical groupby with observed=True keeps appearance order on pandas 1.x, sort_index restores key order
+    return data.groupby(by, observed=True).agg(aggregations).sort_index().reset_index()
+
+
+def grouped_rows(data: pd.DataFrame, groups: dict, kpis):
+    """
+    KPIs and grouped data of a page computed from the filtered rows, the groups running concurrently
+    when parallel workers are configured.
+
+    :param data: Filtered rows.
+    :param groups: Mapping of aggregate name to group-by columns and aggregations.
+    :param kpis: KPI function of the page from utils.
+    :return: Dictionary of the KPIs tuple and the grouped DataFrames, in the order of the groups.
+    """
+    # only the columns of a group are copied to a worker process
+    columns = uses_processes(len(data))
+    tasks = {"kpis": partial(kpis, data)}
+    tasks.update({name: partial(group_aggregate, data[by + list(aggregations)] if columns else data, by,
+                                aggregations)
+                  for name, (by, aggregations) in groups.items()})
+    return run_tasks(tasks, rows=len(data))
+
+
+def grouped_cube(cube, selection: dict, groups: dict):
+    """
+    Grouped data of a page answered from the rollup cubes, the groups running concurrently
+    when parallel workers are configured.
+
+    :param cube: RollupCubes of the dataset.
+    :param selection: Mapping of column name to the list of selected values.
+    :param groups: Mapping of aggregate name to group-by columns and aggregations.
+    :return: Dictionary of the grouped DataFrames, in the order of the groups.
+    """
+    return run_tasks({name: partial(cube.aggregate, selection, by, aggregations)
+                      for name, (by, aggregations) in groups.items()})
+
+
+def current_opportunities_aggregates(data: pd.DataFrame):
+    """
+    KPIs and chart data of the Current Opportunities page.
+
+    :param data: Filtered active opportunities.
+    :return: Dictionary of the KPIs tuple and the aggregated DataFrames.
+    """
+    return finish_current_opportunities_aggregates(
+        **grouped_rows(data, CURRENT_OPPORTUNITIES_GROUPS, current_opportunities_kpis))
+
+
+def finish_current_opportunities_aggregates(kpis, opp_by_type, opp_by_agency, opp_by_posted_date,
+                                            avg_days_to_response_NAICS):
+    """
+    Order, truncate and label the grouped data of the Current Opportunities page.
+    The grouped DataFrames hold one row per key, in key order, whichever backend computed them.
+
+    :return: Dictionary of the KPIs tuple and the aggregated DataFrames.
+    """
+    opp_by_type = opp_by_type.sort_values("Days_to_ResponseDeadline", ascending=True)
+
+    opp_by_agency = opp_by_agency.sort_values("Notice_ID", ascending=True)
+    opp_by_agency['Awarding_Agency'] = opp_by_agency['Awarding_Agency'].str[:15]  # Truncate the "Awarding_Agency" column
+
+    avg_days_to_response_NAICS = avg_days_to_response_NAICS.sort_values("Days_to_ResponseDeadline", ascending=True)
+    avg_days_to_response_NAICS['NAICSCodeDesc'] = avg_days_to_response_NAICS['NAICSCodeDesc'].str[:15]
+    avg_days_to_response_NAICS = avg_days_to_response_NAICS[:27]
+
+    return {
+        "kpis": kpis,
+        "opp_by_type": opp_by_type,
+        "opp_by_agency": opp_by_agency,
+        "opp_by_posted_date": opp_by_posted_date,
+        "avg_days_to_response_NAICS": avg_days_to_response_NAICS,
+    }
+
+
+def competitor_aggregates(data: pd.DataFrame):
+    """
+    KPIs and chart data of the Competitor Info page.
+
+    :param data: Filtered past awards.
+    :return: Dictionary of the KPIs tuple and the aggregated DataFrames.
+    """
+    return finish_competitor_aggregates(**grouped_rows(data, COMPETITOR_GROUPS, competitor_kpis))
+
+
+def finish_competitor_aggregates(kpis, awards_by_recipient, awards_amount_by_recipient, award_amount_df,
+                                 award_amount_by_recp_naics_df):
+    """
+    Order, truncate and label the grouped data of the Competitor Info page.
+    The grouped DataFrames hold one row per key, in key order, whichever backend computed them.
+
+    :return: Dictionary of the KPIs tuple and the aggregated DataFrames.
+    """
+    awards_by_recipient = awards_by_recipient.sort_values("generated_internal_id", ascending=True)
+    awards_by_recipient.rename(columns={"generated_internal_id": "Number of Awards"}, inplace=True)
+    awards_by_recipient = awards_by_recipient[:10]
+
+    awards_amount_by_recipient['Formatted Award Amount'] = format_currency_labels(
+        awards_amount_by_recipient['Award Amount'])
+    awards_amount_by_recipient = awards_amount_by_recipient[:10]
+
+    award_amount_df['Award Amount'] = format_currency_labels(award_amount_df['Award Amount'])
+    award_amount_df.rename(columns={"Award ID": "Number of Awards"}, inplace=True)
+
+    award_amount_by_recp_naics_df = award_amount_by_recp_naics_df.sort_values(by="Award Amount", ascending=False)
+    award_amount_by_recp_naics_df['Award Amount'] = format_currency_labels(
+        award_amount_by_recp_naics_df['Award Amount'])
+    award_amount_by_recp_naics_df.rename(columns={"naics_description": "NAICS"}, inplace=True)
+
+    return {
+        "kpis": kpis,
+        "awards_by_recipient": awards_by_recipient,
+        "awards_amount_by_recipient": awards_amount_by_recipient,
+        "award_amount_df": award_amount_df,
+        "award_amount_by_recp_naics_df": award_amount_by_recp_naics_df,
+    }
+
+
+def forecast_aggregates(data: pd.DataFrame):
+    """
+    KPIs and chart data of the Forecast Recompetes page.
+
+    :param data: Filtered past awards.
+    :return: Dictionary of the KPIs tuple and the aggregated DataFrames.
+    """
+    return finish_forecast_aggregates(**grouped_rows(data, FORECAST_GROUPS, contracts_kpis))
+
+
+def finish_forecast_aggregates(kpis, award_amount_by_months, award_amount_by_duration):
+    """
+    Label and filter the grouped data of the Forecast Recompetes page.
+    The grouped DataFrames hold one row per key, in key order, whichever backend computed them.
+
+    :return: Dictionary of the KPIs tuple and the aggregated DataFrames.
+    """
+    award_amount_by_months["Symbol"] = "diamond"
+    award_amount_by_months = award_amount_by_months[
+        award_amount_by_months["Months Until Contract Ends"] != "Contract/s Expired"
+        ]
+
+    award_amount_by_duration["Symbol"] = "diamond"
+
+    return {
+        "kpis": kpis,
+        "award_amount_by_months": award_amount_by_months,
+        "award_amount_by_duration": award_amount_by_duration,
+    }
+
+
+def current_opportunities_cube_aggregates(cube, selection: dict, rows):
+    """
+    KPIs and chart data of the Current Opportunities page answered from the rollup cubes.
+
+    :param cube: RollupCubes of the active opportunities.
+    :param selection: Mapping of column name to the list of selected values.
+    :param rows: Callable without arguments returning the filtered rows, used for the KPIs only
+                 when the distinct opportunities cannot be counted from the cube.
+    :return: Same dictionary as current_opportunities_aggregates.
+    """
+    if cube.counts_distinct:
+        count = cube.total(selection, "count:Days_to_ResponseDeadline")
+        kpis = (cube.count_distinct(selection),
+                cube.total(selection, "sum:Days_to_ResponseDeadline") / count if count else np.nan,
+                cube.total(selection, "rows", where={"Score_Mapped": ["Positive"]}),
+                cube.total(selection, "rows", where={"DaysRemainingCode": ["Green"]}))
+    else:
+        kpis = current_opportunities_kpis(rows())
+    return finish_current_opportunities_aggregates(kpis=kpis,
+                                                   **grouped_cube(cube, selection, CURRENT_OPPORTUNITIES_GROUPS))
+
+
+def competitor_cube_aggregates(cube, selection: dict, rows):
+    """
+    KPIs and chart data of the Competitor Info page answered from the rollup cubes.
+
+    :param cube: RollupCubes of the past awards.
+    :param selection: Mapping of column name to the list of selected values.
+    :param rows: Callable without arguments returning the filtered rows, used for the KPIs only
+                 when the distinct awards cannot be counted from the cube.
+    :return: Same dictionary as competitor_aggregates.
+    """
+    if cube.counts_distinct:
+        kpis = (cube.count_distinct(selection),
+                cube.total(selection, "rows", where={"AwardAmount_Binned": ["6-12 million", "12+ million"]}),
+                cube.total(selection, "sum:Award Amount"))
+    else:
+        kpis = competitor_kpis(data=rows())
+    return finish_competitor_aggregates(kpis=kpis, **grouped_cube(cube, selection, COMPETITOR_GROUPS))
+
+
+def forecast_cube_aggregates(cube, selection: dict, rows):
+    """
+    KPIs and chart data of the Forecast Recompetes page answered from the rollup cubes.
+
+    :param cube: RollupCubes of the past awards.
+    :param selection: Mapping of column name to the list of selected values.
+    :param rows: Callable without arguments returning the filtered rows, used for the KPIs only
+                 when the distinct contracts cannot be counted from the cube.
+    :return: Same dictionary as forecast_aggregates.
+    """
+    if cube.counts_distinct:
+        with_offers = cube.count_distinct(selection, "count:number_of_offers_received")
+        total_offers = cube.total(selection, "sum:number_of_offers_received")
+        kpis = (cube.count_distinct(selection),
+                total_offers / with_offers if with_offers else 0,
+                cube.total(selection, "sum:Award Amount"))
+    else:
+        kpis = contracts_kpis(data=rows())
+    return finish_forecast_aggregates(kpis=kpis, **grouped_cube(cube, selection, FORECAST_GROUPS))
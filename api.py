@@ -0,0 +1,303 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import threading
+from urllib.parse import parse_qsl
+
+import numpy as np
+import pandas as pd
+
+from page_models import load_datasets, datasets_version, home_page, table_rows, PAGES, FILTERS, CHARTS, KPIS, \
+    TABLES, TABLE_EXTRA_COLUMNS, HOME_PAGE, CURRENT_OPPORTUNITIES, COMPETITOR_INFO, FORECAST_RECOMPETES
+
+try:
+    import pyarrow as pa
+except ImportError:  # the Arrow format is only served when pyarrow is installed
+    pa = None
+
+try:
+    import uvicorn
+except ImportError:  # the app can be served by any ASGI server, uvicorn is only used by serve()
+    uvicorn = None
+
+# port of the API served from the streamlit process next to the dashboard, sharing its datasets and caches,
+# empty for none
+API_PORT = os.environ.get("FOAM_API_PORT", "")
+API_HOST = os.environ.get("FOAM_API_HOST", "127.0.0.1")
+
+ARROW_TYPE = "application/vnd.apache.arrow.stream"
+JSON_TYPE = "application/json"
+
+# rows per page of the row resources, by default and at most
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 1000
+
+# page of every path segment
+SLUGS = {
+    "home": HOME_PAGE,
+    "current-opportunities": CURRENT_OPPORTUNITIES,
+    "competitor-info": COMPETITOR_INFO,
+    "forecast-recompetes": FORECAST_RECOMPETES,
+}
+
+# query parameters that are not filters
+PARAMETERS = {"format", "q", "page", "page_size", "sort_by", "order"}
+
+
+class ApiError(Exception):
+    """
+    Request that cannot be answered, with its HTTP status.
+    """
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def _json_value(value):
+    # numpy scalars and missing values of the KPIs
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    return value
+
+
+def _records(data: pd.DataFrame):
+    return json.loads(data.to_json(orient="records", date_format="iso"))
+
+
+def _arrow(data: pd.DataFrame):
+    table = pa.Table.from_pandas(data, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def _format(parameters: dict, accept: str):
+    requested = parameters.get("format", [None])[-1]
+    if requested is None:
+        requested = "arrow" if ARROW_TYPE in accept else "json"
+    if requested not in ("json", "arrow"):
+        raise ApiError(400, f"Unknown format {requested!r}, expected 'json' or 'arrow'.")
+    if requested == "arrow" and pa is None:
+        raise ApiError(406, "The Arrow format needs pyarrow, which is not installed.")
+    return requested
+
+
+def _options(datasets, page: str):
+    return datasets.opportunity_options if page in (HOME_PAGE, CURRENT_OPPORTUNITIES) else datasets.award_options
+
+
+def _selection(datasets, page: str, parameters: dict):
+    """
+    :return: Mapping of filter column to the selected values, typed like the options of the sidebar.
+    """
+    filters = FILTERS.get(page, [])
+    unknown = set(parameters) - PARAMETERS - set(filters)
+    if unknown:
+        raise ApiError(400, f"Unknown parameters {sorted(unknown)}, the filters of {page} are {filters}.")
+    options = _options(datasets, page)
+    selection = {}
+    for column in filters:
+        values = parameters.get(column, [])
+        by_label = {str(option): option for option in options[column]}
+        missing = [value for value in values if value not in by_label]
+        if missing:
+            raise ApiError(400, f"Unknown values {missing} of the filter {column!r}.")
+        selection[column] = [by_label[value] for value in values]
+    return selection
+
+
+def _page_number(parameters: dict, name: str, default: int, maximum: int = None):
+    value = parameters.get(name, [str(default)])[-1]
+    if not value.isdigit() or int(value) < 1 or (maximum is not None and int(value) > maximum):
+        raise ApiError(400, f"{name} must be a whole number from 1" + (f" to {maximum}." if maximum else "."))
+    return int(value)
+
+
+def _etag(version, path: str, parameters: dict, representation: str):
+    # filters with their values in any order name the same selection
+    canonical = sorted((name, tuple(values if name in PARAMETERS else sorted(values)))
+                       for name, values in parameters.items())
+    digest = hashlib.blake2b(repr((version, path, canonical, representation)).encode(), digest_size=16)
+    return f'"{digest.hexdigest()}"'
+
+
+def _not_modified(etag: str, if_none_match: str):
+    tags = [tag.strip() for tag in if_none_match.split(",") if tag.strip()]
+    # weak comparison, as for GET requests
+    return "*" in tags or etag in [tag[2:] if tag.startswith("W/") else tag for tag in tags]
+
+
+def _model(datasets, page: str, selection: dict, parameters: dict):
+    if page == HOME_PAGE:
+        return home_page(datasets)
+    if page == CURRENT_OPPORTUNITIES:
+        return PAGES[page](datasets, selection, parameters.get("q", [""])[-1].strip())
+    return PAGES[page](datasets, selection)
+
+
+def _resource(datasets, page: str, parts: list, parameters: dict, selection: dict, representation: str):
+    """
+    :return: Body of a page resource: a JSON document, or a DataFrame sent as JSON records or Arrow IPC.
+    """
+    model = _model(datasets, page, selection, parameters)
+    kpis = {name: _json_value(value) for name, value in zip(KPIS[page], model.kpis)}
+    if not parts:
+        if representation == "arrow":
+            raise ApiError(406, "The page summary is JSON only, its kpis, charts and rows are served as Arrow.")
+        return {"page": page, "selection": {column: [str(value) for value in values]
+                                            for column, values in selection.items() if values},
+                "row_count": int(model.row_count), "kpis": kpis,
+                "charts": {name: _records(data) for name, data in model.charts.items()}}
+    if parts == ["kpis"]:
+        return pd.DataFrame([kpis]) if representation == "arrow" else kpis
+    if len(parts) == 2 and parts[0] == "charts" and parts[1] in model.charts:
+        return model.charts[parts[1]]
+    if parts == ["rows"] and page in TABLES:
+        columns = TABLES[page][1] + TABLE_EXTRA_COLUMNS[page]
+        page_size = _page_number(parameters, "page_size", PAGE_SIZE, MAX_PAGE_SIZE)
+        sort_by = parameters.get("sort_by", [None])[-1]
+        if sort_by is not None and sort_by not in columns:
+            raise ApiError(400, f"Cannot sort by {sort_by!r}, the columns are {columns}.")
+        order = parameters.get("order", ["asc"])[-1]
+        if order not in ("asc", "desc"):
+            raise ApiError(400, "order must be 'asc' or 'desc'.")
+        rows = table_rows(datasets, model, _page_number(parameters, "page", 1) - 1, page_size, sort_by,
+                          order == "asc")
+        return rows[columns].reset_index(drop=True)
+    raise ApiError(404, "Unknown resource.")
+
+
+def _index(datasets):
+    return {"pages": {slug: {"page": page, "kpis": KPIS[page],
+                             "filters": {column: [str(value) for value in _options(datasets, page)[column]]
+                                         for column in FILTERS.get(page, [])},
+                             "charts": [name for name, _, _ in CHARTS.get(page, [])],
+                             "rows": TABLES[page][1] if page in TABLES else None}
+                      for slug, page in SLUGS.items()},
+            "formats": ["json"] + (["arrow"] if pa is not None else [])}
+
+
+def handle(path: str, query: str, headers: dict):
+    """
+    Answer a GET request of the API.
+
+    Resources, the filters of a page being given as repeated query parameters named after their column,
+    with the option labels of the sidebar as values:
+
+    - /api: pages with their filters and options, KPIs, charts and table columns
+    - /api/<page>: KPIs, row count and chart data of a page, JSON only
+    - /api/<page>/kpis, /api/<page>/charts/<name>, /api/<page>/rows: one table, as JSON or Arrow IPC;
+      the rows take page, page_size, sort_by and order (asc or desc), and the current opportunities a q search
+
+    :param path: Path of the request.
+    :param query: Query string of the request.
+    :param headers: Mapping of lower-case header name to value.
+    :return: Tuple of the status, the list of response headers as pairs and the body as bytes.
+    """
+    try:
+        parameters = {}
+        for name, value in parse_qsl(query, keep_blank_values=True):
+            parameters.setdefault(name, []).append(value)
+        parts = [part for part in path.split("/") if part]
+        if not parts or parts[0] != "api" or (len(parts) > 1 and parts[1] not in SLUGS):
+            raise ApiError(404, "Unknown resource.")
+        representation = _format(parameters, headers.get("accept", ""))
+        try:
+            # answered from the versions alone when the client holds the current representation
+            etag = _etag(datasets_version(), path, parameters, representation)
+            response_headers = [("etag", etag), ("cache-control", "no-cache"), ("vary", "accept")]
+            if _not_modified(etag, headers.get("if-none-match", "")):
+                return 304, response_headers, b""
+            datasets = load_datasets()
+        except FileNotFoundError:
+            raise ApiError(503, "No data source found.")
+
+        page = SLUGS[parts[1]] if len(parts) > 1 else None
+        if page is None:
+            body = _index(datasets)
+        else:
+            body = _resource(datasets, page, parts[2:], parameters, _selection(datasets, page, parameters),
+                             representation)
+        if isinstance(body, pd.DataFrame):
+            if representation == "arrow":
+                return 200, response_headers + [("content-type", ARROW_TYPE)], _arrow(body)
+            body = _records(body)
+        return 200, response_headers + [("content-type", JSON_TYPE)], json.dumps(body).encode()
+    except ApiError as error:
+        return error.status, [("content-type", JSON_TYPE)], json.dumps({"error": str(error)}).encode()
+
+
+async def app(scope, receive, send):
+    """
+    ASGI application of the API. The requests are answered on the threads of the event loop executor,
+    so that loading and aggregating never block the loop.
+    """
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+    if scope["type"] != "http":
+        return
+    if scope["method"] not in ("GET", "HEAD"):
+        status, headers, body = 405, [("allow", "GET, HEAD"), ("content-type", JSON_TYPE)], \
+            json.dumps({"error": "Only GET and HEAD are allowed."}).encode()
+    else:
+        request_headers = {name.decode("latin-1").lower(): value.decode("latin-1")
+                           for name, value in scope["headers"]}
+        status, headers, body = await asyncio.get_running_loop().run_in_executor(
+            None, handle, scope["path"], scope["query_string"].decode("latin-1"), request_headers)
+    await send({"type": "http.response.start", "status": status,
+                "headers": [(name.encode("latin-1"), value.encode("latin-1")) for name, value in
+                            headers + [("content-length", str(len(body)))]]})
+    await send({"type": "http.response.body", "body": b"" if scope["method"] == "HEAD" else body})
+
+
+def serve(host: str = API_HOST, port: int = 8000):
+    """
+    Serve the API with uvicorn until interrupted.
+
+    :param host: Interface to listen on.
+    :param port: Port to listen on.
+    """
+    if uvicorn is None:
+        raise RuntimeError("Serving the API needs uvicorn: pip install uvicorn")
+    uvicorn.run(app, host=host, port=port, log_level="warning")
+
+
+_server_lock = threading.Lock()
+_server = None
+
+
+def start_background_server(host: str = API_HOST, port: int = None):
+    """
+    Serve the API from a daemon thread of the current process, once, so that it shares the datasets and
+    caches of the dashboard. Does nothing when no port is configured or uvicorn is not installed.
+
+    :param host: Interface to listen on.
+    :param port: Port to listen on, FOAM_API_PORT by default.
+    """
+    global _server
+    port = port or (int(API_PORT) if API_PORT else None)
+    with _server_lock:
+        if _server is not None or port is None or uvicorn is None:
+            return
+        _server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="warning"))
+        threading.Thread(target=_server.run, name="foam-api", daemon=True).start()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="F.O.A.M data API")
+    parser.add_argument("--host", default=API_HOST)
+    parser.add_argument("--port", type=int, default=int(API_PORT or 8000))
+    args = parser.parse_args()
+    serve(args.host, args.port)
@@ -1,11 +1,20 @@
+from functools import partial
+
 import pandas as pd
 import streamlit as st
 import streamlit_option_menu as menu
-from utils import format_currency_label, \
-    current_opportunities_kpis, bar_scatter_chart, bar_chart, scatter_plot, preprocess_color_info, opportunities_table, \
-    competitor_kpis, pie_chart, table_chart, contracts_kpis, binned_bar_chart, \
-    binned_scatter_plot, forecast_table, awards_table, metric_div, kpi_widget, metric_div_1
-
+from api import start_background_server
+from figure_cache import cached_spec, figure_from_spec
+from parallel import run_tasks, PARALLEL_WORKERS
+from profiling import PROFILER
+from data_loader import load_opportunity_descriptions
+from page_models import load_datasets, home_page, current_opportunities_page, competitor_page, forecast_page, \
+    table_rows, PageModel, CHARTS, TABLES
+from utils import format_currency_label, page_count, metric_div, kpi_widget, metric_div_1
+
+# the data API, when FOAM_API_PORT is set, is served from this process and shares its datasets and caches
+start_background_server()
+PROFILER.begin()
 st.set_page_config(page_title="F.O.A.M", layout="wide", page_icon="📊")
 # ---------------------------------- Page Styling -------------------------------------
 
@@ -23,32 +32,108 @@ st.markdown("""
 with st.sidebar:
     st.image('./assets/icon.png')
 
+TABLE_PAGE_SIZES = [25, 50, 100, 250]
+
+
+def table_page_controls(columns: list, row_count: int, key: str):
+    """
+    Sort and page selectors shown above a paginated table.
+
+    :param columns: Columns the table can be sorted by.
+    :param row_count: Number of rows of the table.
+    :param key: Prefix of the widget keys, unique per table.
+    :return: Tuple of the zero-based page, the page size, the sort column and the sort direction.
+    """
+    controls = st.columns(4)
+    sort_by = controls[0].selectbox(label="Sort By", options=[None] + columns, key=f"{key}_sort_by",
+                                    format_func=lambda column: "-" if column is None else column)
+    order = controls[1].selectbox(label="Order", options=["Ascending", "Descending"], key=f"{key}_order")
+    page_size = controls[2].selectbox(label="Rows Per Page", options=TABLE_PAGE_SIZES, index=1,
+                                      key=f"{key}_page_size")
+    page = controls[3].number_input(label=f"Page (of {page_count(row_count, page_size)})", min_value=1,
+                                    max_value=page_count(row_count, page_size), value=1, step=1,
+                                    key=f"{key}_page")
+    return page - 1, page_size, sort_by, order == "Ascending"
+
+
+def show_chart(container, name: str, build):
+    """
+    Build a chart and send it to the browser, timing both as stages of the rerun.
+
+    :param container: Streamlit container of the chart.
+    :param name: Name of the chart in the stage names.
+    :param build: Callable without arguments returning the JSON of the Plotly figure.
+    """
+    with PROFILER.stage(f"figure {name}"):
+        spec = build()
+        fig = figure_from_spec(spec)
+    with PROFILER.stage(f"emit {name}") as emitted:
+        container.plotly_chart(fig, use_container_width=True)
+    if emitted:
+        # payload of the chart, the figure JSON sent to the browser
+        emitted["bytes"] = len(spec)
+
+
+def profile_panel(run: dict):
+    """
+    Sidebar panel with the stage timings of the rerun and of the previous ones.
+
+    :param run: Dictionary of the rerun returned by the profiler.
+    """
+    with st.sidebar.expander("Profiler"):
+        st.write(f"Rerun: {run['seconds'] * 1000:.1f} ms")
+        st.dataframe(pd.DataFrame([{"stage": "  " * record["depth"] + record["stage"],
+                                    "ms": record["seconds"] * 1000, "bytes": record["bytes"]}
+                                   for record in run["stages"]]), hide_index=True)
+        st.write("Since start")
+        st.dataframe(pd.DataFrame(PROFILER.summary()), hide_index=True)
+
+
+def show_charts(model: PageModel):
+    """
+    Charts of a page, two per row in the order of its chart list, built concurrently when parallel workers
+    are configured.
+
+    :param model: PageModel of the page.
+    """
+    builds = {name: partial(cached_spec, builder, data=model.charts[name], **arguments)
+              for name, builder, arguments in CHARTS[model.page]}
+    if PARALLEL_WORKERS:
+        # built together up front, the figure stages then only pick them up
+        with PROFILER.stage("figures"):
+            figures = run_tasks(builds)
+        builds = {name: partial(figures.get, name) for name in figures}
+    chart_row = st.columns(2)
+    for number, (name, build) in enumerate(builds.items()):
+        show_chart(chart_row[number % 2], name, build)
+
+
+def show_table(datasets, model: PageModel, key: str):
+    """
+    Paginated table of a page, with its sort and page selectors.
+
+    :param datasets: Datasets the page model was computed from.
+    :param model: PageModel of the page.
+    :param key: Prefix of the widget keys, unique per table.
+    :return: DataFrame of the rows of the shown page.
+    """
+    builder, columns = TABLES[model.page]
+    page, page_size, sort_by, ascending = table_page_controls(columns, model.row_count, key=key)
+    rows = table_rows(datasets, model, page, page_size, sort_by, ascending)
+    show_chart(st, builder.__name__, partial(cached_spec, builder, data=rows, columns=columns))
+    return rows
+
+
 # ----------------------------------- Data Loading ------------------------------------
 try:
-    active_opportunities = pd.read_csv("./data/ActiveOpportunities.csv",
-                                       usecols=["Awarding_Agency", "Title", "DescriptionText", "Type",
-                                                "Score", "Set_Aside_Type",
-                                                "DaysRemainingCode", "Notice_ID", "Score_Mapped",
-                                                "Days_to_ResponseDeadline", "Posted_Date",
-                                                "NAICSCodeDesc", "Description link"
-                                                ])
-    past_awards = pd.read_csv("./data/PastAwards.csv",
-                              usecols=["Award ID", "Awarding Agency", "Recipient Name",
-                                       "Contract Award Type", "Contract Status", "naics_description",
-                                       "AwardAmount_Binned", "generated_internal_id", "Award Amount",
-                                       "Description", "Start Date", "End Date", "Last Modified Date",
-                                       "Months Until Contract Ends", "PastAwards_URL",
-                                       "number_of_offers_received", "Contract Duration (Years)"])
-
-    # ------------------------------------ Data pre-processing ----------------------------
-    active_opportunities["Posted_Date"] = pd.to_datetime(active_opportunities["Posted_Date"])
-    past_awards["Start Date"] = pd.to_datetime(past_awards["Start Date"])
-    past_awards["End Date"] = pd.to_datetime(past_awards["End Date"])
-    past_awards["Last Modified Date"] = pd.to_datetime(past_awards["Last Modified Date"])
-    active_opportunities = preprocess_color_info(active_opportunities)
+    with PROFILER.stage("load"):
+        datasets = load_datasets()
+        opportunity_options = datasets.opportunity_options
+        award_options = datasets.award_options
     # ------------------------------------ Menu  -------------------------------------------
     view = menu.option_menu(menu_title=None, orientation="horizontal", menu_icon=None,
                             options=["Home Page", "Current Opportunities", "Competitor Info", "Forecast Recompetes"])
+    PROFILER.set_page(view)
     if view == "Home Page":
         row = st.columns(2)
         row[0].markdown("""
@@ -68,304 +153,154 @@ try:
         row[1].write("# ");
         row[1].write("## ")
 
+        with PROFILER.stage("kpis"):
+            total_opportunities, days_to_respond, count_positive_ecs, count_green = home_page(datasets).kpis
         row[1].markdown(
-            metric_div_1.format(label="Total Opportunities", value=active_opportunities["Notice_ID"].nunique()),
+            metric_div_1.format(label="Total Opportunities", value=total_opportunities),
             unsafe_allow_html=True)
         row[1].markdown(metric_div_1.format(label="Count of Positive ECS Rating",
-                                            value=len(
-                                                active_opportunities[active_opportunities["Score_Mapped"] == "Positive"]
-                                            )), unsafe_allow_html=True)
+                                            value=count_positive_ecs), unsafe_allow_html=True)
         row[1].markdown(metric_div_1.format(label="Opportunities With 25+ Days Remaining",
-                                            value=len(active_opportunities
-                                                      [active_opportunities['DaysRemainingCode'] == "Green"]))
+                                            value=count_green)
                         , unsafe_allow_html=True)
         row[1].markdown(metric_div_1.format(label="Avg. Days to Respond",
-                                            value=round(active_opportunities["Days_to_ResponseDeadline"].mean(), 1)),
+                                            value=round(days_to_respond, 1)),
                         unsafe_allow_html=True)
         with st.sidebar:
             st.write("# ")
 
     if view == "Current Opportunities":
         with st.sidebar:
+            # the keyword search needs the texts in memory, the SQL backend only answers the filters
+            query = "" if datasets.backend is not None else st.text_input(
+                label="Keyword Search", placeholder="e.g. cloud migration, cyber*").strip()
             awarding_agency = st.multiselect(label="Agency",
-                                             options=sorted(set(active_opportunities["Awarding_Agency"].values)))
+                                             options=opportunity_options["Awarding_Agency"])
             opp_type = st.multiselect(label="Opportunity Type",
-                                      options=sorted(set(active_opportunities["Type"].values)))
+                                      options=opportunity_options["Type"])
             ecs_rating = st.multiselect(label="ECS Rating",
-                                        options=sorted(set(active_opportunities["Score"].values))[::-1])
+                                        options=opportunity_options["Score"][::-1])
             set_aside_type = st.multiselect(label="Set Aside Type",
-                                            options=sorted(set(active_opportunities["Set_Aside_Type"].dropna().values)))
+                                            options=opportunity_options["Set_Aside_Type"])
             days_remaining = st.multiselect(label="Days Remaining",
-                                            options=sorted(set(active_opportunities["DaysRemainingCode"].values)))
+                                            options=opportunity_options["DaysRemainingCode"])
 
         # ------------------------------------ Data Filtering ----------------------------------------
-        filtered_df = active_opportunities.copy()
-
-        if awarding_agency:
-            filtered_df = filtered_df[filtered_df["Awarding_Agency"].isin(awarding_agency)]
-        if opp_type:
-            filtered_df = filtered_df[filtered_df["Type"].isin(opp_type)]
-        if ecs_rating:
-            filtered_df = filtered_df[filtered_df["Score"].isin(ecs_rating)]
-        if set_aside_type:
-            filtered_df = filtered_df[filtered_df["Set_Aside_Type"].isin(set_aside_type)]
-        if days_remaining:
-            filtered_df = filtered_df[filtered_df["DaysRemainingCode"].isin(days_remaining)]
+        selection = {"Awarding_Agency": awarding_agency,
+                     "Type": opp_type,
+                     "Score": ecs_rating,
+                     "Set_Aside_Type": set_aside_type,
+                     "DaysRemainingCode": days_remaining}
+        model = current_opportunities_page(datasets, selection, query)
 
         # ------------------------------------ KPIs ----------------------------------------
-        total_opportunities, days_to_respond, count_positive_ecs, count_green = current_opportunities_kpis(filtered_df)
-
-        kpi_row_page1 = st.columns(4)
-        kpi_row_page1[0].markdown(kpi_widget(label="Total Opportunities", value=f"{total_opportunities}"),
-                                  unsafe_allow_html=True)
-        kpi_row_page1[1].markdown(kpi_widget(label="Avg. Days to Respond", value=f"{days_to_respond:.1f}"),
-                                  unsafe_allow_html=True)
-        kpi_row_page1[2].markdown(kpi_widget(label="Count of positive ECS Rating",
-                                             value=f"{count_positive_ecs}"), unsafe_allow_html=True)
-        kpi_row_page1[3].markdown(kpi_widget(label="Opportunities with 25+ Days Remaining",
-                                             value=f"{count_green}"), unsafe_allow_html=True)
+        with PROFILER.stage("kpis"):
+            total_opportunities, days_to_respond, count_positive_ecs, count_green = model.kpis
+
+            kpi_row_page1 = st.columns(4)
+            kpi_row_page1[0].markdown(kpi_widget(label="Total Opportunities", value=f"{total_opportunities}"),
+                                      unsafe_allow_html=True)
+            kpi_row_page1[1].markdown(kpi_widget(label="Avg. Days to Respond", value=f"{days_to_respond:.1f}"),
+                                      unsafe_allow_html=True)
+            kpi_row_page1[2].markdown(kpi_widget(label="Count of positive ECS Rating",
+                                                 value=f"{count_positive_ecs}"), unsafe_allow_html=True)
+            kpi_row_page1[3].markdown(kpi_widget(label="Opportunities with 25+ Days Remaining",
+                                                 value=f"{count_green}"), unsafe_allow_html=True)
         # ------------------------------------ Charts ----------------------------------------
-        first_chart_row_page1 = st.columns(2)
-        # ------------------------------------ Opp by Type ----------------------------------------
-
-        opp_by_type = filtered_df.groupby("Type").agg(
-            {'Notice_ID': 'count', 'Days_to_ResponseDeadline': 'mean'}
-        ).reset_index()
-        opp_by_type = opp_by_type.sort_values("Days_to_ResponseDeadline", ascending=True)
-        fig = bar_scatter_chart(data=opp_by_type, bar_X="Type", bar_Y="Notice_ID",
-                                bar_name="Number of Opportunities", scatter_X="Type",
-                                scatter_Y="Days_to_ResponseDeadline",
-                                scatter_name="Avg. Days to Respond to Deadline",
-                                title="OPPORTUNITY BY TYPE")
-
-        first_chart_row_page1[0].plotly_chart(fig, use_container_width=True)
-        # ------------------------------------ Opp by Agency ----------------------------------------
-
-        opp_by_agency = filtered_df.groupby("Awarding_Agency")["Notice_ID"].count().reset_index()
-        opp_by_agency = opp_by_agency.sort_values("Notice_ID", ascending=True)
-        opp_by_agency['Awarding_Agency'] = opp_by_agency['Awarding_Agency'].str[
-                                           :15]  # Truncate the "Awarding_Agency" column
-        fig = bar_chart(data=opp_by_agency, y="Awarding_Agency", x="Notice_ID",
-                        orient="h", title="OPPORTUNITY BY AWARDING AGENCIES", text="Notice_ID",
-                        pre_hover_text="Number of Opportunities")
-
-        first_chart_row_page1[1].plotly_chart(fig, use_container_width=True)
-        # ------------------------------------ Opp by Posted Month ----------------------------------------
-
-        opp_by_posted_date = filtered_df.groupby("Posted_Date")["Notice_ID"].count().reset_index()
-        fig = scatter_plot(data=opp_by_posted_date, x="Posted_Date", y="Notice_ID",
-                           title="OPPORTUNITY POSTED BY MONTH", name="Opportunity Count",
-                           text="Notice_ID")
-        first_chart_row_page1[0].plotly_chart(fig, use_container_width=True)
-
-        # ----------------------------------- Avg. Days to Response to Deadline By NAICS --------------------
-
-        avg_days_to_response_NAICS = filtered_df.groupby(
-            "NAICSCodeDesc"
-        )["Days_to_ResponseDeadline"].mean().reset_index()
-        avg_days_to_response_NAICS = avg_days_to_response_NAICS.sort_values("Days_to_ResponseDeadline", ascending=True)
-        avg_days_to_response_NAICS['NAICSCodeDesc'] = avg_days_to_response_NAICS['NAICSCodeDesc'].str[:15]
-        avg_days_to_response_NAICS = avg_days_to_response_NAICS[:27]
-        fig = bar_chart(data=avg_days_to_response_NAICS, y="NAICSCodeDesc", x="Days_to_ResponseDeadline",
-                        orient="h", title="AVG. DAYS TO RESPONSE TO DEADLINE BY NAICS", text="Days_to_ResponseDeadline",
-                        pre_hover_text="Avg. Days to Response")
-
-        first_chart_row_page1[1].plotly_chart(fig, use_container_width=True)
+        show_charts(model)
         # ------------------------------------ Data Chart --------------------------------------
-        table_columns = ["Awarding_Agency", "Title", "Type",
-                         "Posted_Date", "Days_to_ResponseDeadline", "Description link",
-                         "NAICSCodeDesc", "Set_Aside_Type", "Score"]
-        fig = opportunities_table(data=filtered_df, columns=table_columns)
-        st.plotly_chart(fig, use_container_width=True)
+        page_rows = show_table(datasets, model, key="opportunities")
+        # ------------------------------------ Opportunity Details --------------------------------------
+        # descriptions are read for the chosen opportunity only, from the text store when compiled
+        with st.expander("Opportunity Description"):
+            notice_ids = list(page_rows["Notice_ID"].astype(object))
+            labels = [f"{number}. {title}" for number, title in enumerate(page_rows["Title"], start=1)]
+            choice = st.selectbox(label="Opportunity", options=labels)
+            if choice is not None:
+                notice_id = notice_ids[labels.index(choice)]
+                st.write(load_opportunity_descriptions([notice_id])[notice_id] or "No description available.")
 
     if view == "Competitor Info":
         with st.sidebar:
             agency_name = st.multiselect(label="Agency",
-                                         options=sorted(set(past_awards["Awarding Agency"].values)))
+                                         options=award_options["Awarding Agency"])
             awardee = st.multiselect(label="Awardee",
-                                     options=sorted(set(past_awards["Recipient Name"].values)))
+                                     options=award_options["Recipient Name"])
             contract_type = st.multiselect(label="Contract Type",
-                                           options=sorted(set(past_awards["Contract Award Type"].values)))
+                                           options=award_options["Contract Award Type"])
             contract_status = st.multiselect(label="Contract Status",
-                                             options=sorted(set(past_awards["Contract Status"].values)))
-            custom_order = ['0-1 million', '1-6 million', '6-12 million', '12+ million']
+                                             options=award_options["Contract Status"])
             award_amount_bins = st.multiselect(label="Award Amount Bins",
-                                               options=sorted(set(past_awards["AwardAmount_Binned"].dropna().values),
-                                                              key=lambda x: custom_order.index(x)))
+                                               options=award_options["AwardAmount_Binned"])
         # ------------------------------------ Data Filtering ----------------------------------------
 
-        filtered_past_awards = past_awards.copy()
-
-        if agency_name:
-            filtered_past_awards = filtered_past_awards[filtered_past_awards["Awarding Agency"].isin(agency_name)]
-        if awardee:
-            filtered_past_awards = filtered_past_awards[filtered_past_awards["Recipient Name"].isin(awardee)]
-        if contract_type:
-            filtered_past_awards = filtered_past_awards[filtered_past_awards["Contract Award Type"].isin(contract_type)]
-        if contract_status:
-            filtered_past_awards = filtered_past_awards[filtered_past_awards["Contract Status"].isin(contract_status)]
-        if award_amount_bins:
-            filtered_past_awards = filtered_past_awards[
-                filtered_past_awards["AwardAmount_Binned"].isin(award_amount_bins)]
+        selection = {"Awarding Agency": agency_name,
+                     "Recipient Name": awardee,
+                     "Contract Award Type": contract_type,
+                     "Contract Status": contract_status,
+                     "AwardAmount_Binned": award_amount_bins}
+        model = competitor_page(datasets, selection)
 
         # ------------------------------------ KPIs ----------------------------------------
 
-        total_past_awards, six_million_above, award_amount = competitor_kpis(data=filtered_past_awards)
-
-        kpi_row_page2 = st.columns(3)
-        kpi_row_page2[0].markdown(kpi_widget(label="Total Number of Past Awards", value=f"{total_past_awards}"),
-                                  unsafe_allow_html=True)
-        kpi_row_page2[1].markdown(kpi_widget(label="Number of Awards Value $6+ Million", value=f"{six_million_above}"),
-                                  unsafe_allow_html=True)
-        kpi_row_page2[2].markdown(kpi_widget(label="Total Past Award(s) Amount",
-                                             value=f"${format_currency_label(award_amount)}"),
-                                  unsafe_allow_html=True)
+        with PROFILER.stage("kpis"):
+            total_past_awards, six_million_above, award_amount = model.kpis
+
+            kpi_row_page2 = st.columns(3)
+            kpi_row_page2[0].markdown(kpi_widget(label="Total Number of Past Awards", value=f"{total_past_awards}"),
+                                      unsafe_allow_html=True)
+            kpi_row_page2[1].markdown(kpi_widget(label="Number of Awards Value $6+ Million",
+                                                 value=f"{six_million_above}"), unsafe_allow_html=True)
+            kpi_row_page2[2].markdown(kpi_widget(label="Total Past Award(s) Amount",
+                                                 value=f"${format_currency_label(award_amount)}"),
+                                      unsafe_allow_html=True)
         # ------------------------------------ Charts ----------------------------------------
-        first_chart_row_page2 = st.columns(2)
-        # ------------------------------------ Number of Awards By Recipient -----------------
-
-        awards_by_recipient = filtered_past_awards.groupby("Recipient Name")[
-            "generated_internal_id"].count().reset_index()
-        awards_by_recipient = awards_by_recipient.sort_values("generated_internal_id", ascending=True)
-        awards_by_recipient.rename(columns={"generated_internal_id": "Number of Awards"}, inplace=True)
-        awards_by_recipient = awards_by_recipient[:10]
-
-        fig = pie_chart(data=awards_by_recipient, values="Number of Awards",
-                        names="Recipient Name", title="NUMBER OF PAST AWARDS BY RECIPIENTS",
-                        text_info="percent+value")
-
-        first_chart_row_page2[0].plotly_chart(fig, use_container_width=True)
-        # ------------------------------------ Amount of Awards By Recipient ----------------------------------------
-
-        awards_amount_by_recipient = filtered_past_awards.groupby("Recipient Name")["Award Amount"].sum().reset_index()
-        awards_amount_by_recipient['Formatted Award Amount'] = awards_amount_by_recipient['Award Amount'].apply(
-            format_currency_label)
-        awards_amount_by_recipient = awards_amount_by_recipient[:10]
-
-        fig = pie_chart(data=awards_amount_by_recipient, values="Award Amount",
-                        names="Recipient Name", title="PAST AWARDS AMOUNT BY RECIPIENTS",
-                        text_info="percent")
-
-        first_chart_row_page2[1].plotly_chart(fig, use_container_width=True)
-        # ------------------------------------ Award Amount Chart ----------------------------------------
-
-        award_amount_df = filtered_past_awards.groupby("Awarding Agency").agg(
-            {'Award ID': 'count', 'Award Amount': 'sum'}
-        ).reset_index()
-        award_amount_df['Award Amount'] = award_amount_df['Award Amount'].apply(
-            format_currency_label)
-        award_amount_df.rename(columns={"Award ID": "Number of Awards"}, inplace=True)
-
-        fig = table_chart(award_amount_df,
-                          title="PAST AWARDS AMOUNT BY AWARDING AGENCY")
-        first_chart_row_page2[0].plotly_chart(fig, use_container_width=True)
-
-        # ------------------------------------ Award Amount Chart#2 ----------------------------------------
-        award_amount_by_recp_naics_df = filtered_past_awards.groupby(
-            ["naics_description", "Awarding Agency"]
-        )['Award Amount'].sum().reset_index()
-        award_amount_by_recp_naics_df = award_amount_by_recp_naics_df.sort_values(by="Award Amount", ascending=False)
-        award_amount_by_recp_naics_df['Award Amount'] = award_amount_by_recp_naics_df['Award Amount'].apply(
-            format_currency_label)
-        award_amount_by_recp_naics_df.rename(columns={"naics_description": "NAICS"}, inplace=True)
-
-        fig = table_chart(award_amount_by_recp_naics_df,
-                          title="PAST AWARDS AMOUNT BY NAICS AND RECIPIENT")
-        first_chart_row_page2[1].plotly_chart(fig, use_container_width=True)
-
+        show_charts(model)
         # ------------------------------- Competitor Info Table ---------------------------------
-        columns = ["Award ID", "Awarding Agency", "Recipient Name",
-                   "AwardAmount_Binned", "Award Amount",
-                   "Start Date", "End Date", "Last Modified Date",
-                   "Months Until Contract Ends", "PastAwards_URL"]
-        table_data = awards_table(filtered_past_awards, columns)
-        st.plotly_chart(table_data, use_container_width=True)
+        show_table(datasets, model, key="awards")
         # --------------------------------------------------------------------------------------
 
     if view == "Forecast Recompetes":
         with st.sidebar:
             agency = st.multiselect(label="Agency",
-                                    options=sorted(set(past_awards["Awarding Agency"].values)))
+                                    options=award_options["Awarding Agency"])
             incumbent = st.multiselect(label="Incumbent Name",
-                                       options=sorted(set(past_awards["Recipient Name"].values)))
+                                       options=award_options["Recipient Name"])
             status_contract = st.multiselect(label="Contract Status",
-                                             options=sorted(set(past_awards["Contract Status"].values)))
-            custom_order = [
-                '0-3 months', '3-6 months', '6-12 months', '12-18 months', '18+ months', 'Contract/s Expired'
-            ]
+                                             options=award_options["Contract Status"])
             months_to_end = st.multiselect(label="Months To Contracts Ends",
-                                           options=sorted(set(past_awards["Months Until Contract Ends"].values),
-                                                          key=lambda x: custom_order.index(x)))
+                                           options=award_options["Months Until Contract Ends"])
         # ------------------------------------ Data Filtering ----------------------------------------
 
-        filtered_contracts_data = past_awards.copy()  # Create a copy of the original DataFrame
-
-        # Check if any filters are selected and apply them
-        if agency:
-            filtered_contracts_data = filtered_contracts_data[
-                filtered_contracts_data["Awarding Agency"].isin(agency)]
-        if incumbent:
-            filtered_contracts_data = filtered_contracts_data[
-                filtered_contracts_data["Recipient Name"].isin(incumbent)]
-        if status_contract:
-            filtered_contracts_data = filtered_contracts_data[
-                filtered_contracts_data["Contract Status"].isin(status_contract)]
-        if months_to_end:
-            filtered_contracts_data = filtered_contracts_data[
-                filtered_contracts_data["Months Until Contract Ends"].isin(months_to_end)]
+        selection = {"Awarding Agency": agency,
+                     "Recipient Name": incumbent,
+                     "Contract Status": status_contract,
+                     "Months Until Contract Ends": months_to_end}
+        model = forecast_page(datasets, selection)
         # ------------------------------------ KPIs ----------------------------------------
 
-        contracts_count, average_offers_per_contract, contracts_value = contracts_kpis(data=filtered_contracts_data)
-        kpi_row_page3 = st.columns(3)
+        with PROFILER.stage("kpis"):
+            contracts_count, average_offers_per_contract, contracts_value = model.kpis
+            kpi_row_page3 = st.columns(3)
 
-        kpi_row_page3[0].markdown(kpi_widget(label="Count of Contracts", value=f"{contracts_count}"),
-                                  unsafe_allow_html=True)
-        kpi_row_page3[1].markdown(
-            kpi_widget(label="Avg. Offers Per Contract", value=f"{average_offers_per_contract:.2f}"),
-            unsafe_allow_html=True)
-        kpi_row_page3[2].markdown(kpi_widget(label="Contract(s) Value",
-                                             value=f"${format_currency_label(contracts_value)}"),
-                                  unsafe_allow_html=True)
+            kpi_row_page3[0].markdown(kpi_widget(label="Count of Contracts", value=f"{contracts_count}"),
+                                      unsafe_allow_html=True)
+            kpi_row_page3[1].markdown(
+                kpi_widget(label="Avg. Offers Per Contract", value=f"{average_offers_per_contract:.2f}"),
+                unsafe_allow_html=True)
+            kpi_row_page3[2].markdown(kpi_widget(label="Contract(s) Value",
+                                                 value=f"${format_currency_label(contracts_value)}"),
+                                      unsafe_allow_html=True)
 
         # ------------------------------------ Charts ----------------------------------------
-        first_chart_row_page3 = st.columns(2)
-        # --------------------- Award Amount By Months Until Contract Ends -------------------
-
-        award_amount_by_months = filtered_contracts_data.groupby(
-            ["Months Until Contract Ends", "Recipient Name"]
-        )["Award Amount"].sum().reset_index()
-        award_amount_by_months["Symbol"] = "diamond"
-        award_amount_by_months = award_amount_by_months[
-            award_amount_by_months["Months Until Contract Ends"] != "Contract/s Expired"
-            ]
-        fig = binned_scatter_plot(data=award_amount_by_months, x="Months Until Contract Ends",
-                                  y="Award Amount",
-                                  color="Recipient Name",
-                                  title="AWARD AMOUNT BY MONTHS UNTIL CONTRACT ENDS",
-                                  )
-
-        first_chart_row_page3[0].plotly_chart(fig, use_container_width=True)
-        # --------------------- Award Amount By Contract Duration (Years) -------------------
-
-        award_amount_by_duration = filtered_contracts_data.groupby(
-            ["Contract Duration (Years)", "Recipient Name"]
-        )["Award Amount"].sum().reset_index()
-        award_amount_by_duration["Symbol"] = "diamond"
-
-        fig = binned_bar_chart(data=award_amount_by_duration, x="Contract Duration (Years)",
-                               y="Award Amount", color="Recipient Name",
-                               title="AWARD AMOUNT BY CONTRACT DURATION (Years)")
-
-        first_chart_row_page3[1].plotly_chart(fig, use_container_width=True)
+        show_charts(model)
         # ------------------------------------ Filtered dataframe ----------------------------
-
-        columns = ["Award ID", "Awarding Agency", "Recipient Name",
-                   "naics_description", "Award Amount",
-                   "Start Date", "End Date", "Last Modified Date",
-                   "Months Until Contract Ends", "PastAwards_URL"]
-        table_data = forecast_table(filtered_contracts_data, columns)
-        st.plotly_chart(table_data, use_container_width=True)
+        show_table(datasets, model, key="forecast")
 
 
 except FileNotFoundError:
     st.warning("No data source found!")
+
+profile_run = PROFILER.end()
+if profile_run is not None:
+    profile_panel(profile_run)
@@ -0,0 +1,266 @@
+import base64
+import json
+import os
+import shutil
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from schema import PAST_AWARDS_SCHEMA, apply_schema
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+except ImportError:  # the store is only compiled and read when pyarrow is installed
+    pa = ds = None
+
+# bumped whenever the store layout changes, so stores written by older versions are rebuilt
+STORE_VERSION = 3
+
+MANIFEST = "manifest.json"
+
+# filter columns whose distinct values are recorded per partition, used to skip partitions
+PRUNING_COLUMNS = ["Awarding Agency", "Contract Status", "Contract Award Type", "AwardAmount_Binned",
+                   "Months Until Contract Ends"]
+
+# position of each row in the source file, restores the file order across partitions
+ROW_COLUMN = "_row"
+
+# agencies with fewer awards in a quarter share one partition of that quarter,
+# opening many tiny files costs more than reading a few rows too many
+MIN_PARTITION_ROWS = 50_000
+
+
+def end_quarter(end_dates: pd.Series):
+    """
+    :param end_dates: Datetime series of contract end dates.
+    :return: Series of labels such as '2024Q1', 'unknown' for missing dates.
+    """
+    labels = end_dates.dt.year.astype("Int64").astype(str) + "Q" + end_dates.dt.quarter.astype("Int64").astype(str)
+    return labels.where(end_dates.notna(), "unknown")
+
+
+def _date_bound(dates: pd.Series, bound: str):
+    value = getattr(dates, bound)()
+    return None if pd.isna(value) else value.date().isoformat()
+
+
+def _schema(data: pd.DataFrame):
+    schema = pa.Schema.from_pandas(data, preserve_index=False)
+    fields = []
+    for field in schema:
+        if pa.types.is_dictionary(field.type):
+            # dictionary indices wide enough for the categories added to a partition by later updates
+            field = pa.field(field.name, pa.dictionary(pa.int32(), field.type.value_type, field.type.ordered))
+        elif pa.types.is_null(field.type):
+            # text columns without any value, as in an empty store
+            field = pa.field(field.name, pa.string())
+        fields.append(field)
+    return pa.schema(fields, metadata=schema.metadata)
+
+
+def _store_schema(manifest: dict):
+    # the schema of every file, kept in the manifest so that a store without partitions can be read too
+    return pa.ipc.read_schema(pa.py_buffer(base64.b64decode(manifest["schema"])))
+
+
+def _partition_entry(relative: str, quarter: str, part: pd.DataFrame):
+    # statistics of a partition, with the id of its last write
+    return {
+        "path": relative,
+        "quarter": quarter,
+        "rows": len(part),
+        "end_date": [_date_bound(part["End Date"], "min"), _date_bound(part["End Date"], "max")],
+        "award_amount": [float(part["Award Amount"].min()), float(part["Award Amount"].max())],
+        "values": {column: sorted(str(value) for value in part[column].dropna().unique())
+                   for column in PRUNING_COLUMNS},
+        "version": uuid.uuid4().hex,
+    }
+
+
+def build_store(data: pd.DataFrame, root: str, source, min_rows: int = MIN_PARTITION_ROWS):
+    """
+    Write past awards as parquet files partitioned by End Date quarter and awarding agency,
+    with a manifest of the statistics of every partition.
+
+    Within a quarter, each agency with at least min_rows awards gets its own file and the
+    other agencies share one. The store is written next to the root and moved into place,
+    so readers never see a partial store.
+
+    :param data: Typed DataFrame of past awards.
+    :param root: Directory of the store.
+    :param source: JSON-serializable version of the source file, saved in the manifest.
+    :param min_rows: Minimum number of awards of an agency in a quarter to get its own file.
+    :return: The manifest.
+    """
+    temporary = root + ".tmp"
+    shutil.rmtree(temporary, ignore_errors=True)
+    os.makedirs(temporary)
+
+    data = data.assign(**{ROW_COLUMN: np.arange(len(data))})
+    # one schema for every file, a column missing from a partition would otherwise be typed as null
+    schema = _schema(data)
+    agencies = sorted(data["Awarding Agency"].dropna().unique())
+    agency_number = {agency: number for number, agency in enumerate(agencies)}
+    agency = data["Awarding Agency"].astype(object)
+    quarters = end_quarter(data["End Date"])
+    sizes = data.groupby([quarters, agency.fillna("")]).size()
+    large = {key for key, size in sizes.items() if size >= min_rows and key[1]}
+    group = [f"agency-{agency_number[key[1]]:04d}" if key in large else "agency-other"
+             for key in zip(quarters, agency.fillna(""))]
+
+    partitions = []
+    for (quarter, name), part in data.groupby([quarters, pd.Series(group, index=data.index, dtype=object)], sort=True):
+        relative = os.path.join(f"end={quarter}", f"{name}.parquet")
+        os.makedirs(os.path.join(temporary, f"end={quarter}"), exist_ok=True)
+        part.to_parquet(os.path.join(temporary, relative), index=False, schema=schema)
+        partitions.append(_partition_entry(relative, quarter, part))
+
+    # the agency numbers and the next row position place the rows added by update_store
+    manifest = {"version": STORE_VERSION, "source": source, "rows": len(data), "columns": list(data.columns),
+                "next_row": len(data),
+                "agencies": {str(agency): number for agency, number in agency_number.items()},
+                "schema": base64.b64encode(schema.serialize().to_pybytes()).decode("ascii"),
+                "partitions": partitions}
+    _write_manifest(temporary, manifest)
+    shutil.rmtree(root, ignore_errors=True)
+    os.replace(temporary, root)
+    return manifest
+
+
+def _write_manifest(root: str, manifest: dict):
+    temporary = os.path.join(root, MANIFEST + ".tmp")
+    with open(temporary, "w") as file:
+        json.dump(manifest, file, indent=1)
+    os.replace(temporary, os.path.join(root, MANIFEST))
+
+
+def partition_paths(data: pd.DataFrame, manifest: dict):
+    """
+    Partitions of the store that hold rows, or would receive them, from their End Date and awarding agency.
+
+    :param data: DataFrame of past awards.
+    :param manifest: Manifest of the store.
+    :return: List of the relative paths of the partitions of the rows.
+    """
+    existing = {partition["path"] for partition in manifest["partitions"]}
+    paths = []
+    for quarter, agency in zip(end_quarter(data["End Date"]), data["Awarding Agency"].astype(object)):
+        number = manifest["agencies"].get(agency) if isinstance(agency, str) else None
+        own = None if number is None else os.path.join(f"end={quarter}", f"agency-{number:04d}.parquet")
+        # agencies without a file of their own in the quarter, new ones included, share the other file
+        paths.append(own if own in existing else os.path.join(f"end={quarter}", "agency-other.parquet"))
+    return paths
+
+
+def update_store(root: str, removed: pd.DataFrame, added: pd.DataFrame, key: str, source):
+    """
+    Apply changed rows to the store, rewriting only the partitions that held or receive them and their
+    manifest entries. The other files, and the versions of their entries, are left as they are.
+
+    Rows keep their position in the source file when updated, and rows new to the store are placed
+    after all the others, as appended rows of the source file. The partition layout is kept until
+    the store is built again.
+
+    :param root: Directory of the store.
+    :param removed: Typed past awards as stored before the change, of the updated and removed rows.
+    :param added: Typed past awards after the change, of the updated and inserted rows, in file order.
+    :param key: Column identifying the rows.
+    :param source: JSON-serializable version of the changed source file, saved in the manifest.
+    :return: List of the relative paths of the rewritten partitions.
+    """
+    manifest = read_manifest(root)
+    entries = {partition["path"]: partition for partition in manifest["partitions"]}
+    removed_paths, added_paths = partition_paths(removed, manifest), partition_paths(added, manifest)
+    touched = sorted(set(removed_paths) | set(added_paths))
+    schema = _store_schema(manifest)
+    keys = set(removed[key].astype(str)) | set(added[key].astype(str))
+
+    parts, positions = {}, {}
+    for relative in touched:
+        if relative in entries:
+            part = pd.read_parquet(os.path.join(root, relative))
+            changed = part[key].astype(str).isin(keys).values
+            positions.update(zip(part[key][changed].astype(str), part[ROW_COLUMN][changed]))
+            parts[relative] = part[~changed]
+    rows = []
+    for value in added[key].astype(str):
+        if value not in positions:
+            positions[value] = manifest["next_row"]
+            manifest["next_row"] += 1
+        rows.append(positions[value])
+    added = added.assign(**{ROW_COLUMN: rows})
+
+    added_paths = np.array(added_paths, dtype=object)
+    for relative in touched:
+        part = pd.concat([frame for frame in [parts.get(relative), added[added_paths == relative]]
+                          if frame is not None], ignore_index=True)
+        part = part.sort_values(ROW_COLUMN, kind="mergesort")
+        path = os.path.join(root, relative)
+        if not len(part):
+            entries.pop(relative, None)
+            if os.path.exists(path):
+                os.remove(path)
+            continue
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # readers see the old file or the new one, never a partial write
+        part.to_parquet(path + ".tmp", index=False, schema=schema)
+        os.replace(path + ".tmp", path)
+        entries[relative] = _partition_entry(relative, os.path.dirname(relative)[len("end="):], part)
+
+    manifest["partitions"] = [entries[relative] for relative in sorted(entries)]
+    manifest["rows"] = sum(partition["rows"] for partition in manifest["partitions"])
+    manifest["source"] = source
+    _write_manifest(root, manifest)
+    return touched
+
+
+def read_manifest(root: str):
+    """
+    :param root: Directory of the store.
+    :return: The manifest, or None when there is no store of the current version.
+    """
+    path = os.path.join(root, MANIFEST)
+    if not os.path.exists(path):
+        return None
+    with open(path) as file:
+        manifest = json.load(file)
+    return manifest if manifest.get("version") == STORE_VERSION else None
+
+
+def matching_partitions(manifest: dict, selection: dict):
+    """
+    Partitions that can hold rows matching a filter selection, judged from their statistics only.
+
+    :param manifest: Manifest of the store.
+    :param selection: Mapping of column name to the list of selected values.
+    :return: List of the manifest entries of the partitions to read.
+    """
+    selected = {column: {str(value) for value in values}
+                for column, values in selection.items() if values and column in PRUNING_COLUMNS}
+    return [partition for partition in manifest["partitions"]
+            if all(values & set(partition["values"][column]) for column, values in selected.items())]
+
+
+def read_store(root: str, selection: dict = None, manifest: dict = None):
+    """
+    Read the past awards matching a filter selection, opening only the partitions that can match.
+    Inside those partitions the whole selection is applied by the parquet scanner.
+
+    :param root: Directory of the store.
+    :param selection: Mapping of column name to the list of selected values, None to read every row.
+    :param manifest: Manifest of the store, read from disk when None.
+    :return: Typed DataFrame of the matching past awards, in the order of the source file.
+    """
+    manifest = read_manifest(root) if manifest is None else manifest
+    selection = {column: list(values) for column, values in (selection or {}).items() if values}
+    paths = [os.path.join(root, partition["path"]) for partition in matching_partitions(manifest, selection)]
+    schema = _store_schema(manifest)
+    expression = None
+    for column, values in selection.items():
+        condition = ds.field(column).isin(values)
+        expression = condition if expression is None else expression & condition
+    data = ds.dataset(paths, schema=schema, format="parquet").to_table(filter=expression).to_pandas()
+    data = data.sort_values(ROW_COLUMN, kind="mergesort").drop(columns=ROW_COLUMN).reset_index(drop=True)
+    return apply_schema(data, PAST_AWARDS_SCHEMA)
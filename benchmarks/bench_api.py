@@ -0,0 +1,130 @@
+"""
+Load test of the data API: concurrent clients with keep-alive connections request a mix of page summaries,
+KPIs, chart data and table rows, as JSON and Arrow, with and without filters, half of them revalidating with the
+ETag of their previous answer. Prints the throughput and the latency percentiles of every kind of request.
+
+Starts a local server (python api.py) on the real datasets unless --url points to a running one, e.g. the API of a
+dashboard started with FOAM_API_PORT. Run from the repository root:
+
+    python -m benchmarks.bench_api
+    python -m benchmarks.bench_api --clients 32 --requests 5000
+    python -m benchmarks.bench_api --url http://127.0.0.1:8502
+"""
+import argparse
+import http.client
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+import numpy as np
+
+PORT = 8765
+CLIENTS = 8
+REQUESTS = 2000
+
+# kind of request and its path and query
+REQUESTS_MIX = [
+    ("index", "/api"),
+    ("summary", "/api/home"),
+    ("summary", "/api/current-opportunities"),
+    ("summary", "/api/current-opportunities?DaysRemainingCode=Green&Type=Solicitation"),
+    ("summary", "/api/current-opportunities?q=cloud"),
+    ("summary", "/api/competitor-info"),
+    ("summary", "/api/competitor-info?Contract%20Status=Expired"),
+    ("summary", "/api/forecast-recompetes?Contract%20Status=Active"),
+    ("kpis", "/api/competitor-info/kpis?AwardAmount_Binned=1-6%20million"),
+    ("chart arrow", "/api/forecast-recompetes/charts/award_amount_by_months?format=arrow"),
+    ("chart arrow", "/api/competitor-info/charts/award_amount_by_recp_naics_df?format=arrow"),
+    ("rows json", "/api/current-opportunities/rows?sort_by=Posted_Date&order=desc"),
+    ("rows json", "/api/competitor-info/rows?page=3&page_size=100"),
+    ("rows arrow", "/api/forecast-recompetes/rows?format=arrow&page_size=500"),
+]
+
+
+def wait_for(host: str, port: int, timeout: float = 60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            connection = http.client.HTTPConnection(host, port, timeout=5)
+            connection.request("GET", "/api")
+            if connection.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"The API did not answer on {host}:{port} within {timeout:.0f}s")
+
+
+def client(host: str, port: int, requests: int, seed: int, results: list):
+    """
+    Send requests from the mix at random on one keep-alive connection, appending (kind, status, seconds).
+    """
+    rng = random.Random(seed)
+    connection = http.client.HTTPConnection(host, port, timeout=60)
+    etags = {}
+    for _ in range(requests):
+        kind, path = rng.choice(REQUESTS_MIX)
+        headers = {}
+        if path in etags and rng.random() < 0.5:
+            headers["If-None-Match"] = etags[path]
+            kind += " (304)"
+        start = time.perf_counter()
+        connection.request("GET", path, headers=headers)
+        response = connection.getresponse()
+        response.read()
+        results.append((kind, response.status, time.perf_counter() - start))
+        if response.getheader("etag"):
+            etags[path] = response.getheader("etag")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", help="base URL of a running API, a local server is started otherwise")
+    parser.add_argument("--clients", type=int, default=CLIENTS, help="concurrent connections")
+    parser.add_argument("--requests", type=int, default=REQUESTS, help="requests in total")
+    args = parser.parse_args()
+
+    server = None
+    if args.url:
+        host, port = urlsplit(args.url).hostname, urlsplit(args.url).port or 80
+    else:
+        host, port = "127.0.0.1", PORT
+        server = subprocess.Popen([sys.executable, "api.py", "--host", host, "--port", str(port)],
+                                  env={key: value for key, value in os.environ.items() if key != "FOAM_API_PORT"})
+    try:
+        wait_for(host, port)
+        # one pass over the mix first, so the load measures served requests rather than the first computations
+        for _, path in REQUESTS_MIX:
+            connection = http.client.HTTPConnection(host, port, timeout=60)
+            connection.request("GET", path)
+            connection.getresponse().read()
+
+        results = []
+        threads = [threading.Thread(target=client, args=(host, port, args.requests // args.clients, number, results))
+                   for number in range(args.clients)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        seconds = time.perf_counter() - start
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    print(f"{len(results)} requests from {args.clients} clients in {seconds:.1f}s: "
+          f"{len(results) / seconds:.0f} requests/s")
+    print(f"  {'kind':<22}{'count':>7}{'statuses':>16}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for kind in sorted({kind for kind, _, _ in results}):
+        latencies = np.array([seconds for other, _, seconds in results if other == kind]) * 1000
+        statuses = sorted({status for other, status, _ in results if other == kind})
+        print(f"  {kind:<22}{len(latencies):>7}{','.join(map(str, statuses)):>16}"
+              + "".join(f"{np.percentile(latencies, q):>9.1f}" for q in (50, 95, 99)))
+
+
+if __name__ == "__main__":
+    main()
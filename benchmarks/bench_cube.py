@@ -0,0 +1,72 @@
+"""
+Timings of the page aggregations answered from the rollup cubes against the pandas path over the filtered rows,
+without filters. Their equivalence is checked by tests/test_cube.py.
+
+The datasets are scaled up two ways: resampled, repeating the rows with distinct keys, and grown, where every copy
+also brings new dates, recipients and NAICS descriptions, as a longer history would. The rollups per chart grouping
+are timed against a single cube over the filter and chart columns together. Run from the repository root:
+
+    python -m benchmarks.bench_cube
+"""
+import time
+import timeit
+
+from aggregations import current_opportunities_aggregates, competitor_aggregates, forecast_aggregates, \
+    current_opportunities_cube_aggregates, competitor_cube_aggregates, forecast_cube_aggregates
+from benchmarks.synthetic import grow, scale, ACTIVE_OPPORTUNITIES_GROWN, PAST_AWARDS_GROWN
+from cube import RollupCubes, ACTIVE_OPPORTUNITIES_CUBE, PAST_AWARDS_CUBE
+from data_loader import load_active_opportunities, load_past_awards, ACTIVE_OPPORTUNITIES_FACETS, \
+    PAST_AWARDS_FACETS
+from facets import FacetIndex
+
+SCALES = [1, 10, 100]
+
+PAGES = [
+    ("current_opportunities", load_active_opportunities, "Notice_ID", ACTIVE_OPPORTUNITIES_FACETS,
+     ACTIVE_OPPORTUNITIES_CUBE, ACTIVE_OPPORTUNITIES_GROWN, current_opportunities_aggregates,
+     current_opportunities_cube_aggregates),
+    ("competitor", load_past_awards, "generated_internal_id", PAST_AWARDS_FACETS, PAST_AWARDS_CUBE,
+     PAST_AWARDS_GROWN, competitor_aggregates, competitor_cube_aggregates),
+    ("forecast", load_past_awards, "generated_internal_id", PAST_AWARDS_FACETS, PAST_AWARDS_CUBE,
+     PAST_AWARDS_GROWN, forecast_aggregates, forecast_cube_aggregates),
+]
+
+
+def bench(function, repeat=5):
+    return min(timeit.repeat(function, number=1, repeat=repeat)) * 1000
+
+
+def single_cube(spec: dict):
+    # every chart column as a dimension of one cube, answering every grouping
+    columns = spec["dimensions"] + sorted({column for by in spec["groupings"] for column in by} -
+                                          set(spec["dimensions"]))
+    return {**spec, "dimensions": columns, "groupings": []}
+
+
+def build(data, spec: dict):
+    start = time.perf_counter()
+    cube = RollupCubes(data, **spec)
+    return cube, (time.perf_counter() - start) * 1000
+
+
+def main():
+    print(f"{'':<58}{'single cube':^27}{'rollups':^27}")
+    print(f"{'page':<24}{'data':>10}{'scale':>6}{'rows':>9}{'rows ms':>9}" + f"{'cells':>8}{'build ms':>10}{'ms':>9}" * 2)
+    for name, load, key, facet_columns, spec, grown, aggregate, cube_aggregate in PAGES:
+        for kind, repeat in [("resampled", lambda data, factor: scale(data, factor, key)),
+                             ("grown", lambda data, factor: grow(data, factor, key, grown))]:
+            for factor in SCALES:
+                data = repeat(load(), factor)
+                facets = FacetIndex(data, facet_columns)
+                selection = {column: [] for column in facet_columns}
+                rows_ms = bench(lambda: aggregate(facets.select(selection)))
+                line = f"{name:<24}{kind:>10}{factor:>6}{len(data):>9}{rows_ms:>9.2f}"
+                for cube_spec in [single_cube(spec), spec]:
+                    cube, build_ms = build(data, cube_spec)
+                    cube_ms = bench(lambda: cube_aggregate(cube, selection, lambda: facets.select(selection)))
+                    line += f"{len(cube):>8}{build_ms:>10.1f}{cube_ms:>9.2f}"
+                print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Distinct counts of the award keys over filtered rows: nunique on the string keys, exact counts
+on the integer ids encoded at load time, a HyperLogLog sketch of the filtered rows (hashed once
+up front), and the sketches kept per cell of the rollup cube.
+
+The scaled datasets repeat every award once more with the same key, as amended awards would,
+so the keys are not unique and the cube has to estimate.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_distinct
+"""
+import random
+import timeit
+
+import pandas as pd
+
+from benchmarks.synthetic import random_selection, scale
+from cube import RollupCubes, PAST_AWARDS_CUBE
+from data_loader import load_past_awards, PAST_AWARDS_FACETS, PAST_AWARDS_KEYS
+from distinct import HyperLogLog, encode_keys, hash_values, SKETCH_PRECISION
+from facets import FacetIndex
+from utils import _count_distinct
+
+KEY = "generated_internal_id"
+SCALES = [1, 10, 100]
+SELECTIONS = 20
+
+
+def bench(function, repeat=3):
+    return min(timeit.repeat(function, number=1, repeat=repeat)) * 1000
+
+
+def main():
+    rng = random.Random(0)
+    print(f"{'scale':>6}{'rows':>10}{'mode':>10}{'ms':>10}{'max error':>11}")
+    for factor in SCALES:
+        data = scale(load_past_awards(), factor, KEY)
+        data = encode_keys(pd.concat([data, data], ignore_index=True), PAST_AWARDS_KEYS)
+        facets = FacetIndex(data, PAST_AWARDS_FACETS)
+        cube = RollupCubes(data, **PAST_AWARDS_CUBE, sketch_precision=SKETCH_PRECISION)
+        strings = data[KEY].astype(object)
+        hashes = hash_values(data[KEY].values)
+        selections = [random_selection(facets.options, rng) for _ in range(SELECTIONS)]
+        positions = [facets.positions(selection) for selection in selections]
+        positions = [slice(None) if position is None else position for position in positions]
+
+        modes = {
+            "nunique": lambda position: strings.iloc[position].nunique(),
+            "exact": lambda position: _count_distinct(data[KEY].values[position]),
+            "hll": lambda position: HyperLogLog().add(hashes[position]).estimate(),
+        }
+        expected = [modes["nunique"](position) for position in positions]
+        for mode, count in list(modes.items()) + [("cube", None)]:
+            if mode == "cube":
+                results = [cube.count_distinct(selection) for selection in selections]
+                ms = bench(lambda: [cube.count_distinct(selection) for selection in selections])
+            else:
+                results = [count(position) for position in positions]
+                ms = bench(lambda: [count(position) for position in positions])
+            error = max(abs(result - truth) / truth if truth else float(result > 0)
+                        for result, truth in zip(results, expected))
+            if mode == "exact":
+                assert results == expected
+            print(f"{factor:>6}{len(data):>10}{mode:>10}{ms / SELECTIONS:>10.2f}{error:>10.1%}")
+    print(f"standard error at precision {SKETCH_PRECISION}: {HyperLogLog().relative_error:.1%}")
+
+
+if __name__ == "__main__":
+    main()
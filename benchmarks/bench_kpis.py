@@ -0,0 +1,78 @@
+"""
+Microbenchmark of the KPI functions against the previous implementation
+that filtered DataFrames and called nunique.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_kpis
+"""
+import timeit
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import scale
+from data_loader import load_active_opportunities, load_past_awards
+from utils import current_opportunities_kpis, competitor_kpis, contracts_kpis
+
+SCALES = [1, 10, 100]
+
+
+def legacy_current_opportunities_kpis(data: pd.DataFrame):
+    total_opportunities = data["Notice_ID"].nunique()
+    days_to_respond = data["Days_to_ResponseDeadline"].mean()
+    count_positive_ecs = len(data[data["Score_Mapped"] == "Positive"])
+    count_green = len(data[data['DaysRemainingCode'] == "Green"])
+    return total_opportunities, days_to_respond, count_positive_ecs, count_green
+
+
+def legacy_competitor_kpis(data: pd.DataFrame):
+    total_past_awards = data["generated_internal_id"].nunique()
+    six_million_above = len(data[
+                                (data["AwardAmount_Binned"] == "6-12 million") |
+                                (data["AwardAmount_Binned"] == "12+ million")])
+    award_amount = data["Award Amount"].sum()
+    return total_past_awards, six_million_above, award_amount
+
+
+def legacy_contracts_kpis(data: pd.DataFrame):
+    contracts_count = data["generated_internal_id"].nunique()
+    total_offers = data['number_of_offers_received'].sum()
+    filtered_records = data[
+        (data['number_of_offers_received'] > 0)
+        | (data['number_of_offers_received'].notna())
+        ]
+    num_unique_contracts = len(filtered_records['generated_internal_id'].unique())
+    if num_unique_contracts == 0:
+        average_offers_per_contract = 0
+    else:
+        average_offers_per_contract = total_offers / num_unique_contracts
+    contracts_value = data["Award Amount"].sum()
+    return contracts_count, average_offers_per_contract, contracts_value
+
+
+def bench(function, data, repeat=5):
+    return min(timeit.repeat(lambda: function(data), number=1, repeat=repeat)) * 1000
+
+
+def main():
+    cases = [
+        ("current_opportunities_kpis", load_active_opportunities(), "Notice_ID",
+         current_opportunities_kpis, legacy_current_opportunities_kpis),
+        ("competitor_kpis", load_past_awards(), "generated_internal_id",
+         competitor_kpis, legacy_competitor_kpis),
+        ("contracts_kpis", load_past_awards(), "generated_internal_id",
+         contracts_kpis, legacy_contracts_kpis),
+    ]
+    print(f"{'function':<28}{'scale':>6}{'rows':>10}{'legacy ms':>12}{'fused ms':>10}{'speedup':>9}")
+    for name, data, key, fused, legacy in cases:
+        for factor in SCALES:
+            scaled = scale(data, factor, key)
+            np.testing.assert_allclose(fused(scaled), legacy(scaled))
+            legacy_ms, fused_ms = bench(legacy, scaled), bench(fused, scaled)
+            print(f"{name:<28}{factor:>6}{len(scaled):>10}{legacy_ms:>12.2f}{fused_ms:>10.2f}"
+                  f"{legacy_ms / fused_ms:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Peak memory of loading synthetic past awards in full against streaming them with a filter selection.
+
+Each load runs in its own process, whose peak resident set size is reported. Run from the repository root:
+
+    python -m benchmarks.bench_memory
+    python -m benchmarks.bench_memory --rows 1000000
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from data_loader import parse_past_awards, stream_past_awards
+from benchmarks.synthetic import write_synthetic_past_awards
+
+ROWS = [1_000_000, 10_000_000]
+
+# a typical Forecast Recompetes selection
+SELECTION = {"Contract Status": ["Active"], "Months Until Contract Ends": ["0-3 months"]}
+
+
+def measure(mode: str, path: str):
+    """
+    Load the file once and print the number of rows, the load time and the peak RSS of the process.
+    """
+    start = time.perf_counter()
+    if mode == "full":
+        data = parse_past_awards(path)
+    else:
+        data = stream_past_awards(path, SELECTION)
+    elapsed = time.perf_counter() - start
+    # ru_maxrss is in kilobytes on Linux
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(len(data), elapsed, peak)
+
+
+def run(*arguments):
+    # a child inherits the peak RSS of the process it is forked from, so the parent stays small
+    # and the synthetic file is generated in a child as well
+    return subprocess.run([sys.executable, "-m", "benchmarks.bench_memory", *arguments],
+                          check=True, capture_output=True, text=True).stdout.split()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=ROWS)
+    parser.add_argument("--measure", nargs=2, metavar=("MODE", "PATH"), help=argparse.SUPPRESS)
+    parser.add_argument("--generate", nargs=2, metavar=("ROWS", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.measure:
+        measure(*args.measure)
+        return
+    if args.generate:
+        write_synthetic_past_awards(args.generate[1], int(args.generate[0]))
+        return
+
+    print(f"{'rows':>10}{'mode':>8}{'kept':>10}{'seconds':>10}{'peak MB':>10}")
+    for rows in args.rows:
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "PastAwards.csv")
+            run("--generate", str(rows), path)
+            for mode in ["full", "stream"]:
+                kept, seconds, peak = run("--measure", mode, path)
+                print(f"{rows:>10}{mode:>8}{kept:>10}{float(seconds):>10.1f}{float(peak):>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
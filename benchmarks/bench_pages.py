@@ -0,0 +1,247 @@
+"""
+Headless benchmark of the page pipelines on synthetic datasets of growing size: load, filter with representative
+sidebar selections, KPIs, aggregations (from the rollup cubes and from the rows) and the chart and table figures,
+with the peak memory of each size. Results can be saved as a baseline, which a later run compares against and fails
+on regressions.
+
+Each size runs in its own process. The synthetic CSV files are generated once into data/synthetic/ and reused.
+Run from the repository root:
+
+    python -m benchmarks.bench_pages
+    python -m benchmarks.bench_pages --rows 10000 100000 1000000 10000000
+    python -m benchmarks.bench_pages --save
+    python -m benchmarks.bench_pages --compare
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+from aggregations import current_opportunities_aggregates, competitor_aggregates, forecast_aggregates, \
+    current_opportunities_cube_aggregates, competitor_cube_aggregates, forecast_cube_aggregates
+from benchmarks.synthetic import write_synthetic_active_opportunities, write_synthetic_past_awards
+from data_loader import load_active_opportunities, load_past_awards, load_active_opportunities_facets, \
+    load_past_awards_facets, load_active_opportunities_cube, load_past_awards_cube
+from page_models import CHARTS, TABLES
+from profiling import PROFILER
+from utils import current_opportunities_kpis, competitor_kpis, contracts_kpis
+
+ROWS = [10_000, 100_000, 1_000_000]
+DATA_DIRECTORY = "./data/synthetic"
+BASELINE_PATH = "./benchmarks/baselines/pages.json"
+
+# a stage regresses when it is this much slower than its baseline, and by more than the noise floor in ms
+TIME_TOLERANCE = 0.5
+NOISE_MS = 5.0
+# the peak memory of a size regresses when it is this much larger than its baseline
+MEMORY_TOLERANCE = 0.2
+
+# runs of every page and selection, the fastest is kept
+REPEAT = 5
+
+# no selection, and a typical one of a few values in two filters
+SELECTIONS = {
+    "Current Opportunities": {
+        "all": {},
+        "typical": {"Type": ["Solicitation", "Combined Synopsis/Solicitation"], "DaysRemainingCode": ["Green"]},
+    },
+    "Competitor Info": {
+        "all": {},
+        "typical": {"Awarding Agency": ["Department of Defense"], "Contract Status": ["Active"]},
+    },
+    "Forecast Recompetes": {
+        "all": {},
+        "typical": {"Contract Status": ["Active"], "Months Until Contract Ends": ["0-3 months", "3-6 months"]},
+    },
+}
+
+# rows of the first page of the tables
+TABLE_PAGE_SIZE = 50
+
+# KPIs and aggregations from the rows and from the cube of every page
+PIPELINES = {
+    "Current Opportunities": (current_opportunities_kpis, current_opportunities_aggregates,
+                              current_opportunities_cube_aggregates),
+    "Competitor Info": (competitor_kpis, competitor_aggregates, competitor_cube_aggregates),
+    "Forecast Recompetes": (contracts_kpis, forecast_aggregates, forecast_cube_aggregates),
+}
+
+
+def dataset_paths(directory: str, rows: int):
+    """
+    :return: Paths of the synthetic ActiveOpportunities and PastAwards CSV files of a size.
+    """
+    return (os.path.join(directory, f"ActiveOpportunities-{rows}.csv"),
+            os.path.join(directory, f"PastAwards-{rows}.csv"))
+
+
+def generate(directory: str, rows: int):
+    """
+    Write the synthetic CSV files of a size, unless they exist.
+    """
+    os.makedirs(directory, exist_ok=True)
+    for path, write in zip(dataset_paths(directory, rows),
+                           [write_synthetic_active_opportunities, write_synthetic_past_awards]):
+        if not os.path.exists(path):
+            # written next to the final path, an interrupted run never leaves a truncated file behind
+            os.replace(write(path + ".tmp", rows), path)
+
+
+def stage_times(run: dict):
+    """
+    :return: Dictionary of the time in ms of every stage of a profiled run, summing repeated stages.
+    """
+    times = {}
+    for record in run["stages"]:
+        times[record["stage"]] = times.get(record["stage"], 0.0) + record["seconds"] * 1000
+    return times
+
+
+def run_pages(active_opportunities_path: str, past_awards_path: str, repeat: int = REPEAT):
+    """
+    Time the pipeline of every page and selection.
+
+    :return: Dictionary of the fastest time in ms of every "page / selection / stage".
+    """
+    PROFILER.enabled = True
+    PROFILER.begin()
+    with PROFILER.stage("load"):
+        load_active_opportunities(active_opportunities_path)
+        load_past_awards(past_awards_path)
+    with PROFILER.stage("index"):
+        facets = {"Current Opportunities": load_active_opportunities_facets(active_opportunities_path),
+                  "Competitor Info": load_past_awards_facets(past_awards_path)}
+        cubes = {"Current Opportunities": load_active_opportunities_cube(active_opportunities_path),
+                 "Competitor Info": load_past_awards_cube(past_awards_path)}
+    facets["Forecast Recompetes"] = facets["Competitor Info"]
+    cubes["Forecast Recompetes"] = cubes["Competitor Info"]
+    results = {f"Load / {stage}": ms for stage, ms in stage_times(PROFILER.end()).items()}
+
+    for page, selections in SELECTIONS.items():
+        kpis, row_aggregates, cube_aggregates = PIPELINES[page]
+        builder, columns = TABLES[page]
+        for name, selection in selections.items():
+            for _ in range(repeat):
+                PROFILER.begin()
+                with PROFILER.stage("filter"):
+                    filtered = facets[page].select(selection)
+                with PROFILER.stage("kpis"):
+                    kpis(filtered)
+                with PROFILER.stage("aggregate rows"):
+                    row_aggregates(filtered)
+                with PROFILER.stage("aggregate cube"):
+                    aggregates = cube_aggregates(cubes[page], selection, lambda: filtered)
+                with PROFILER.stage("figures"):
+                    # serialized as for the browser
+                    for key, chart, arguments in CHARTS[page]:
+                        chart(data=aggregates[key], **arguments).to_json()
+                with PROFILER.stage("table"):
+                    builder(data=filtered, columns=columns, page=0, page_size=TABLE_PAGE_SIZE).to_json()
+                for stage, ms in stage_times(PROFILER.end()).items():
+                    key = f"{page} / {name} / {stage}"
+                    results[key] = min(results.get(key, ms), ms)
+    return results
+
+
+def measure(rows: int, directory: str):
+    """
+    Time the pages on the synthetic data of a size and print the results and the peak RSS as JSON.
+    """
+    start = time.perf_counter()
+    times = run_pages(*dataset_paths(directory, rows))
+    # ru_maxrss is in kilobytes on Linux
+    print(json.dumps({"rows": rows, "seconds": time.perf_counter() - start, "peak_mb":
+                      resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, "ms": times}))
+
+
+def run(rows: int, directory: str):
+    # a fresh process per size, so the peak RSS is that of the size alone; the data source is always the CSV files
+    environment = {key: value for key, value in os.environ.items()
+                   if not key.startswith(("FOAM_SHARED_DATA", "FOAM_STREAMING_LOAD", "FOAM_BACKEND",
+                                          "FOAM_PROFILE"))}
+    output = subprocess.run([sys.executable, "-m", "benchmarks.bench_pages", "--measure", str(rows),
+                             "--data", directory], check=True, capture_output=True, text=True, env=environment)
+    return json.loads(output.stdout.splitlines()[-1])
+
+
+def compare(result: dict, baseline: dict, time_tolerance: float, memory_tolerance: float):
+    """
+    :return: List of the regressions of a size against its baseline, as messages. Stages timed on one side only
+        count as regressions too, the baseline then has to be saved again.
+    """
+    regressions = []
+    for key in baseline["ms"].keys() - result["ms"].keys():
+        regressions.append(f"{result['rows']} rows, {key}: in the baseline but not measured")
+    for key, ms in result["ms"].items():
+        expected = baseline["ms"].get(key)
+        if expected is None:
+            regressions.append(f"{result['rows']} rows, {key}: measured but not in the baseline")
+        elif ms > expected * (1 + time_tolerance) and ms - expected > NOISE_MS:
+            regressions.append(f"{result['rows']} rows, {key}: {ms:.1f} ms against {expected:.1f} ms")
+    if result["peak_mb"] > baseline["peak_mb"] * (1 + memory_tolerance):
+        regressions.append(f"{result['rows']} rows, peak memory: {result['peak_mb']:.0f} MB "
+                           f"against {baseline['peak_mb']:.0f} MB")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=ROWS, help="sizes of both datasets")
+    parser.add_argument("--data", default=DATA_DIRECTORY, help="directory of the synthetic CSV files")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="JSON file of the baseline results")
+    parser.add_argument("--save", action="store_true", help="save the results as the baseline")
+    parser.add_argument("--compare", action="store_true", help="exit with an error on regressions against "
+                                                               "the baseline")
+    parser.add_argument("--time-tolerance", type=float, default=TIME_TOLERANCE)
+    parser.add_argument("--memory-tolerance", type=float, default=MEMORY_TOLERANCE)
+    parser.add_argument("--measure", type=int, metavar="ROWS", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.measure:
+        measure(args.measure, args.data)
+        return
+
+    if args.compare and not os.path.exists(args.baseline):
+        parser.error(f"no baseline at {args.baseline} to compare against, save one first with --save")
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            baseline = {result["rows"]: result for result in json.load(file)["results"]}
+
+    results, regressions = [], []
+    for rows in args.rows:
+        generate(args.data, rows)
+        result = run(rows, args.data)
+        results.append(result)
+        expected = baseline.get(rows)
+        print(f"\n{rows} rows: {result['seconds']:.1f}s, peak {result['peak_mb']:.0f} MB"
+              + (f" (baseline {expected['peak_mb']:.0f} MB)" if expected else ""))
+        print(f"  {'stage':<56}{'ms':>10}{'baseline':>10}{'ratio':>7}")
+        for key, ms in result["ms"].items():
+            before = expected["ms"].get(key) if expected else None
+            print(f"  {key:<56}{ms:>10.1f}" + (f"{before:>10.1f}{ms / before:>7.2f}" if before else ""))
+        if args.compare:
+            regressions += compare(result, expected, args.time_tolerance, args.memory_tolerance) if expected \
+                else [f"{rows} rows: measured but not in the baseline"]
+    if args.compare:
+        regressions += [f"{rows} rows: in the baseline but not measured"
+                        for rows in sorted(baseline.keys() - set(args.rows))]
+
+    if args.save:
+        # the sizes measured replace theirs in the baseline, the others are kept
+        saved = {**baseline, **{result["rows"]: result for result in results}}
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline + ".tmp", "w") as file:
+            json.dump({"python": sys.version.split()[0], "results": [saved[rows] for rows in sorted(saved)]}, file,
+                      indent=1)
+        os.replace(args.baseline + ".tmp", args.baseline)
+        print(f"\nBaseline saved to {args.baseline}")
+    if regressions:
+        print("\nRegressions:\n  " + "\n  ".join(regressions))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Benchmark of the parallel aggregations and figures of the past award pages on synthetic datasets: the rerun time
+of the aggregations and of the figures of Competitor Info and Forecast Recompetes on all rows, one task after the
+other, on the thread pool and on the process pool, against the sum of the single tasks and the slowest of them.
+
+Each mode runs in its own process, configured through its environment. The synthetic CSV files are shared with the
+page benchmark. Run from the repository root:
+
+    python -m benchmarks.bench_parallel
+    python -m benchmarks.bench_parallel --rows 5000000 --workers 8
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import timeit
+from functools import partial
+
+from aggregations import competitor_aggregates, forecast_aggregates, group_aggregate, COMPETITOR_GROUPS, \
+    FORECAST_GROUPS
+from benchmarks.bench_pages import dataset_paths, generate, DATA_DIRECTORY
+from data_loader import load_past_awards
+from page_models import CHARTS, COMPETITOR_INFO, FORECAST_RECOMPETES
+from parallel import run_tasks
+from utils import competitor_kpis, contracts_kpis
+
+ROWS = 1_000_000
+REPEAT = 5
+
+# aggregation of the rows, its groups and KPI function of every page
+PAGES = {
+    COMPETITOR_INFO: (competitor_aggregates, COMPETITOR_GROUPS, competitor_kpis),
+    FORECAST_RECOMPETES: (forecast_aggregates, FORECAST_GROUPS, contracts_kpis),
+}
+
+
+def best_ms(function, repeat: int = REPEAT):
+    return min(timeit.repeat(function, number=1, repeat=repeat)) * 1000
+
+
+def measure(rows: int, directory: str):
+    """
+    Time the tasks of the pages on the synthetic past awards of a size, and print the results as JSON.
+    """
+    data = load_past_awards(dataset_paths(directory, rows)[1])
+    results = {}
+    for page, (aggregate, groups, kpis) in PAGES.items():
+        tasks = {"kpis": partial(kpis, data)}
+        tasks.update({name: partial(group_aggregate, data, by, aggregations)
+                      for name, (by, aggregations) in groups.items()})
+        aggregates = aggregate(data)
+        # the builders are timed without the figure cache, which would answer every repeat
+        figures = {name: partial(builder, data=aggregates[name], **arguments)
+                   for name, builder, arguments in CHARTS[page]}
+        results[page] = {
+            "aggregate tasks": {name: best_ms(task) for name, task in tasks.items()},
+            "aggregate": best_ms(partial(aggregate, data)),
+            "figure tasks": {name: best_ms(figure) for name, figure in figures.items()},
+            "figures": best_ms(partial(run_tasks, figures)),
+        }
+    print(json.dumps(results))
+
+
+def run(rows: int, directory: str, environment: dict):
+    output = subprocess.run([sys.executable, "-m", "benchmarks.bench_parallel", "--measure", str(rows),
+                             "--data", directory], check=True, capture_output=True, text=True,
+                            env={**{key: value for key, value in os.environ.items()
+                                    if not key.startswith("FOAM_")}, **environment})
+    return json.loads(output.stdout.splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=ROWS, help="size of the synthetic past awards")
+    parser.add_argument("--data", default=DATA_DIRECTORY, help="directory of the synthetic CSV files")
+    parser.add_argument("--workers", type=int, default=4, help="threads and processes of the parallel modes")
+    parser.add_argument("--measure", type=int, metavar="ROWS", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.measure:
+        measure(args.measure, args.data)
+        return
+
+    generate(args.data, args.rows)
+    workers = str(args.workers)
+    modes = {
+        "sequential": run(args.rows, args.data, {}),
+        "threads": run(args.rows, args.data, {"FOAM_PARALLEL_WORKERS": workers}),
+        "processes": run(args.rows, args.data, {"FOAM_PARALLEL_WORKERS": workers,
+                                                "FOAM_PARALLEL_PROCESSES": workers, "FOAM_PROCESS_MIN_ROWS": "1"}),
+    }
+    print(f"{args.rows} past awards, all rows selected, {args.workers} workers, times in ms")
+    print(f"  {'page / work':<36}{'sum':>9}{'slowest':>9}" + "".join(f"{mode:>12}" for mode in modes))
+    for page in PAGES:
+        single = modes["sequential"][page]
+        for label, tasks, total in [("aggregations", "aggregate tasks", "aggregate"),
+                                    ("figures", "figure tasks", "figures")]:
+            times = single[tasks].values()
+            print(f"  {page + ' / ' + label:<36}{sum(times):>9.1f}{max(times):>9.1f}"
+                  + "".join(f"{result[page][total]:>12.1f}" for result in modes.values()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Keyword search over the opportunity texts: the inverted index against a str.contains scan,
+on the active opportunities repeated to 100k+ notices.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_search
+"""
+import re
+import time
+import timeit
+
+import numpy as np
+
+from benchmarks.synthetic import scale
+from data_loader import load_active_opportunities, ACTIVE_OPPORTUNITIES_SEARCH
+from search import SearchIndex, TOKEN_PATTERN
+
+SCALES = [1, 100, 410]
+QUERIES = ["software", "cloud services", "cyber*", "information technology services", "data analytics"]
+
+
+def scan(text, query: str):
+    """
+    Rows holding every word of the query, by scanning the lower-cased texts with regular expressions.
+    """
+    mask = np.ones(len(text), dtype=bool)
+    for word in re.findall(TOKEN_PATTERN + r"\*?", query.lower()):
+        pattern = r"(?<![a-z0-9])" + (word[:-1] if word.endswith("*") else word + r"(?![a-z0-9])")
+        mask &= text.str.contains(pattern, regex=True).values
+    return np.flatnonzero(mask)
+
+
+def main():
+    print(f"{'scale':>6}{'notices':>10}{'build s':>9}  {'query':<34}{'hits':>7}{'scan ms':>10}{'index ms':>10}")
+    for factor in SCALES:
+        data = scale(load_active_opportunities(), factor, "Notice_ID")
+        start = time.perf_counter()
+        index = SearchIndex(data, ACTIVE_OPPORTUNITIES_SEARCH)
+        build_s = time.perf_counter() - start
+        text = data[ACTIVE_OPPORTUNITIES_SEARCH[0]].astype(object).fillna("").astype(str)
+        for column in ACTIVE_OPPORTUNITIES_SEARCH[1:]:
+            text = text + " " + data[column].astype(object).fillna("").astype(str)
+        text = text.str.lower()
+        for query in QUERIES:
+            rows, _ = index.search(query)
+            expected = scan(text, query)
+            assert np.array_equal(np.sort(rows), expected), query
+            scan_ms = min(timeit.repeat(lambda: scan(text, query), number=1, repeat=3)) * 1000
+            index_ms = min(timeit.repeat(lambda: index.search(query), number=1, repeat=5)) * 1000
+            print(f"{factor:>6}{len(data):>10}{build_s:>9.2f}  {query:<34}{len(rows):>7}{scan_ms:>10.2f}"
+                  f"{index_ms:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Load time and memory of several server workers holding synthetic past awards, each parsing its own copy
+against all of them mapping the copy published to a shared data root.
+
+The workers run at the same time and report, once all of them are loaded and have built the rollup cube,
+their resident set size and the part of it not shared with any other process. Run from the repository root:
+
+    python -m benchmarks.bench_shared_data
+    python -m benchmarks.bench_shared_data --rows 1000000 --workers 8
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.synthetic import write_synthetic_past_awards
+from data_loader import read_past_awards, load_past_awards, load_past_awards_cube, dataset_name, PAST_AWARDS_KEYS
+from distinct import encode_keys
+from shared_data import publish
+
+ROWS = 1_000_000
+WORKERS = 4
+
+
+def smaps_rollup():
+    """
+    :return: Dictionary of the memory totals of the process in MB, from /proc/self/smaps_rollup.
+    """
+    totals = {}
+    with open("/proc/self/smaps_rollup") as file:
+        for line in file:
+            fields = line.split()
+            if len(fields) == 3 and fields[2] == "kB":
+                totals[fields[0].rstrip(":")] = int(fields[1]) / 1024
+    return totals
+
+
+def measure(path: str):
+    """
+    Load the past awards and their cube, wait for the other workers, then print the load time,
+    the RSS and the private memory of the process.
+    """
+    start = time.perf_counter()
+    load_past_awards(path)
+    load_past_awards_cube(path)
+    elapsed = time.perf_counter() - start
+    print("ready", flush=True)
+    sys.stdin.readline()
+    memory = smaps_rollup()
+    print(elapsed, memory["Rss"], memory["Private_Clean"] + memory["Private_Dirty"], flush=True)
+
+
+def run_workers(path: str, workers: int, root: str = ""):
+    """
+    :return: List of the (load s, RSS MB, private MB) of the workers.
+    """
+    environment = dict(os.environ, FOAM_SHARED_DATA=root)
+    processes = [subprocess.Popen([sys.executable, "-m", "benchmarks.bench_shared_data", "--measure", path],
+                                  stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, env=environment)
+                 for _ in range(workers)]
+    for process in processes:
+        assert process.stdout.readline().strip() == "ready"
+    results = [process.communicate("\n")[0].split() for process in processes]
+    return [tuple(float(value) for value in result) for result in results]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=ROWS)
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--measure", metavar="PATH", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.measure:
+        measure(args.measure)
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = write_synthetic_past_awards(os.path.join(directory, "PastAwards.csv"), args.rows)
+        root = os.path.join(directory, "shared")
+        start = time.perf_counter()
+        publish(encode_keys(read_past_awards(path), PAST_AWARDS_KEYS), root, dataset_name(path))
+        print(f"published {args.rows} rows in {time.perf_counter() - start:.1f}s")
+
+        print(f"{'mode':<8}{'workers':>8}{'load s':>8}{'RSS MB':>9}{'private MB':>12}{'total private MB':>18}")
+        for mode, shared_root in [("parse", ""), ("shared", root)]:
+            results = run_workers(path, args.workers, shared_root)
+            load_s = max(result[0] for result in results)
+            rss = sum(result[1] for result in results) / len(results)
+            private = sum(result[2] for result in results)
+            print(f"{mode:<8}{args.workers:>8}{load_s:>8.2f}{rss:>9.0f}{private / len(results):>12.0f}"
+                  f"{private:>18.0f}")
+
+
+if __name__ == "__main__":
+    main()
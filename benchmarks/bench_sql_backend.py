@@ -0,0 +1,39 @@
+"""
+Timings of the SQL backend against the pandas path, on the aggregates of every page without filters.
+Their equivalence is checked by tests/test_sql_backend.py. Run from the repository root:
+
+    python -m benchmarks.bench_sql_backend
+"""
+import os
+import tempfile
+import timeit
+
+from aggregations import current_opportunities_aggregates, competitor_aggregates, forecast_aggregates
+from data_loader import load_active_opportunities_facets, load_past_awards_facets
+from sql_backend import SqlBackend, build_database
+
+PAGES = [
+    (load_active_opportunities_facets, current_opportunities_aggregates, "current_opportunities_aggregates"),
+    (load_past_awards_facets, competitor_aggregates, "competitor_aggregates"),
+    (load_past_awards_facets, forecast_aggregates, "forecast_aggregates"),
+]
+
+
+def bench(function, repeat=5):
+    return min(timeit.repeat(function, number=1, repeat=repeat)) * 1000
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        backend = SqlBackend(build_database(os.path.join(directory, "foam.sqlite")))
+        print(f"{'aggregates':<36}{'pandas ms':>10}{'sqlite ms':>10}")
+        for load_facets, aggregate, name in PAGES:
+            facets = load_facets()
+            selection = {column: [] for column in facets.options}
+            pandas_ms = bench(lambda: aggregate(facets.select(selection)))
+            sqlite_ms = bench(lambda: getattr(backend, name)(selection))
+            print(f"{name:<36}{pandas_ms:>10.2f}{sqlite_ms:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
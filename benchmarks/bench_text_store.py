@@ -0,0 +1,51 @@
+"""
+Parse time and memory of the active opportunities with and without the text store,
+on the CSV file repeated to larger sizes in a temporary directory.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_text_store
+"""
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.synthetic import scale
+from data_loader import read_active_opportunities, compile_text_store, parse_active_opportunities, \
+    load_opportunity_descriptions, clear_cache, ACTIVE_OPPORTUNITIES_PATH, ACTIVE_OPPORTUNITIES_TEXT
+
+SCALES = [1, 10, 100]
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+def main():
+    print(f"{'scale':>6}{'rows':>9}{'full s':>8}{'full MB':>9}{'eager s':>9}{'eager MB':>10}{'lookup ms':>11}")
+    source = parse_active_opportunities(ACTIVE_OPPORTUNITIES_PATH)
+    with tempfile.TemporaryDirectory() as directory:
+        for factor in SCALES:
+            path = os.path.join(directory, f"ActiveOpportunities-{factor}.csv")
+            data = scale(source, factor, "Notice_ID").drop(columns="DaysRemainingColor")
+            data.to_csv(path, index=False)
+            full, full_s = timed(lambda: read_active_opportunities(path))
+            compile_text_store(path, parse_active_opportunities, *ACTIVE_OPPORTUNITIES_TEXT)
+            eager, eager_s = timed(lambda: read_active_opportunities(path))
+            assert "DescriptionText" not in eager.columns and len(eager) == len(full)
+
+            keys = list(full["Notice_ID"].sample(10, random_state=0))
+            clear_cache()
+            texts, lookup_s = timed(lambda: load_opportunity_descriptions(keys, path))
+            expected = full.set_index("Notice_ID").loc[keys, "DescriptionText"].astype(object)
+            assert np.array_equal(texts.fillna("").values, expected.fillna("").values)
+            print(f"{factor:>6}{len(full):>9}{full_s:>8.2f}{full.memory_usage(deep=True).sum() / 1e6:>9.1f}"
+                  f"{eager_s:>9.2f}{eager.memory_usage(deep=True).sum() / 1e6:>10.1f}{lookup_s * 1000:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Synthetic datasets of any size, resampled from the rows of data/ActiveOpportunities.csv and data/PastAwards.csv.
+
+Resampling keeps the columns, the value sets of the filter and group-by columns and their frequencies; every row
+gets a distinct key. Scaled datasets repeat the rows with distinct keys, and grown datasets also give some columns
+new values in every copy, so that their cardinalities grow with the number of rows. Random sidebar selections over
+their filter options, and the comparison of the answers of two paths, drive the equivalence tests and the benchmarks.
+"""
+import numpy as np
+import pandas as pd
+
+from data_loader import ACTIVE_OPPORTUNITIES_PATH, ACTIVE_OPPORTUNITIES_COLUMNS, PAST_AWARDS_PATH
+
+# characters kept of the description of a synthetic opportunity, the full texts (4 kB on average) would make
+# files of millions of notices too large to generate, the text store benchmark measures them instead
+DESCRIPTION_CHARS = 300
+
+# columns given new values by the grown datasets
+ACTIVE_OPPORTUNITIES_GROWN = ["Posted_Date", "NAICSCodeDesc"]
+PAST_AWARDS_GROWN = ["Recipient Name", "naics_description"]
+
+
+def synthetic_past_awards(rows: int, seed: int = 0, path: str = PAST_AWARDS_PATH, first_id: int = 0):
+    """
+    Resample the past awards to a given number of rows, giving every row a distinct award id.
+
+    :param rows: Number of rows.
+    :param seed: Seed of the random sampling.
+    :param path: Path of the PastAwards CSV file sampled from.
+    :param first_id: Number of the award id of the first row.
+    :return: DataFrame with the columns of the PastAwards CSV file.
+    """
+    source = pd.read_csv(path)
+    sample = source.take(np.random.default_rng(seed).integers(0, len(source), rows)).reset_index(drop=True)
+    ids = pd.Series(np.arange(first_id, first_id + rows)).astype(str)
+    sample["generated_internal_id"] = "SYN_" + ids
+    sample["Award ID"] = "SYN" + ids
+    return sample
+
+
+def synthetic_active_opportunities(rows: int, seed: int = 0, path: str = ACTIVE_OPPORTUNITIES_PATH,
+                                   first_id: int = 0, description_chars: int = DESCRIPTION_CHARS):
+    """
+    Resample the active opportunities to a given number of rows, giving every row a distinct notice id.
+
+    :param rows: Number of rows.
+    :param seed: Seed of the random sampling.
+    :param path: Path of the ActiveOpportunities CSV file sampled from.
+    :param first_id: Number of the notice id of the first row.
+    :param description_chars: Characters kept of the DescriptionText of a row.
+    :return: DataFrame with the columns of the ActiveOpportunities CSV file used by the dashboard.
+    """
+    source = pd.read_csv(path, usecols=ACTIVE_OPPORTUNITIES_COLUMNS)
+    source["DescriptionText"] = source["DescriptionText"].str.slice(0, description_chars)
+    sample = source.take(np.random.default_rng(seed).integers(0, len(source), rows)).reset_index(drop=True)
+    ids = "syn" + pd.Series(np.arange(first_id, first_id + rows)).astype(str)
+    sample["Notice_ID"] = ids
+    sample["Description link"] = "https://sam.gov/opp/" + ids + "/view"
+    return sample
+
+
+def scale(data: pd.DataFrame, factor: int, key: str):
+    """
+    Repeat a dataset, giving every copy distinct keys so the distinct counts grow with it.
+    """
+    copies = []
+    for i in range(factor):
+        copy = data.copy()
+        copy[key] = copy[key].astype(str) + f"-{i}"
+        copies.append(copy)
+    return pd.concat(copies, ignore_index=True)
+
+
+def grow(data: pd.DataFrame, factor: int, key: str, columns: list):
+    """
+    Repeat a dataset, giving every copy distinct keys and new values of some columns: labels suffixed with the
+    number of the copy, and dates moved past those of the previous copy.
+
+    :param data: DataFrame to repeat.
+    :param factor: Number of copies.
+    :param key: Key column, suffixed in every copy.
+    :param columns: Label or date columns given new values in every copy but the first.
+    :return: DataFrame of factor times the rows, the categorical columns among columns still categorical.
+    """
+    copies = []
+    for number in range(factor):
+        copy = data.copy()
+        copy[key] = copy[key].astype(str) + f"-{number}"
+        for column in columns if number else []:
+            values = data[column]
+            if pd.api.types.is_datetime64_any_dtype(values):
+                copy[column] = values + (values.max() - values.min() + pd.Timedelta(days=1)) * number
+            else:
+                # missing labels stay missing
+                copy[column] = values.astype(str).where(values.notna()) + f" #{number}"
+        copies.append(copy)
+    grown = pd.concat(copies, ignore_index=True)
+    for column in columns:
+        if isinstance(data[column].dtype, pd.CategoricalDtype):
+            grown[column] = grown[column].astype("category")
+    return grown
+
+
+def random_selection(options: dict, rng):
+    """
+    Select up to three values in up to two random filter columns.
+
+    :param options: Mapping of filter column to its options.
+    :param rng: random.Random drawing the selection.
+    :return: Mapping of every filter column to the list of selected values.
+    """
+    selection = {column: [] for column in options}
+    for column in rng.sample(sorted(options), rng.randint(0, 2)):
+        selection[column] = rng.sample(options[column], min(len(options[column]), rng.randint(1, 3)))
+    return selection
+
+
+def assert_same(expected, actual, label: str):
+    """
+    Assert that two answers of a page aggregation are equal, up to floating point rounding.
+
+    :param expected: DataFrame or sequence of KPIs of the pandas path.
+    :param actual: The same from the path under test.
+    :param label: Name of the compared answer in the failure message.
+    """
+    if isinstance(expected, pd.DataFrame):
+        # the pandas path keeps the row labels of the filtered frame, only the rows and their order matter
+        # pandas groups an empty frame into int8 category codes whatever the number of categories, the codes of
+        # empty columns are left out while their dtypes are still compared
+        pd.testing.assert_frame_equal(expected.reset_index(drop=True), actual.reset_index(drop=True),
+                                      check_exact=False, check_categorical=not expected.empty, obj=label)
+    else:
+        np.testing.assert_allclose(np.array(expected, dtype=float), np.array(actual, dtype=float), err_msg=label)
+
+
+def _write_chunks(generate, output: str, rows: int, seed: int, chunk_rows: int):
+    for start in range(0, rows, chunk_rows):
+        chunk = generate(min(chunk_rows, rows - start), seed=seed + start, first_id=start)
+        chunk.to_csv(output, mode="w" if start == 0 else "a", header=start == 0, index=False)
+    return output
+
+
+def write_synthetic_past_awards(output: str, rows: int, seed: int = 0, chunk_rows: int = 1_000_000):
+    """
+    Write synthetic past awards to a CSV file in chunks, without holding all of them in memory.
+
+    :param output: Path of the CSV file to write.
+    :param rows: Number of rows.
+    :param seed: Seed of the random sampling.
+    :param chunk_rows: Number of rows generated at a time.
+    :return: Path of the written file.
+    """
+    return _write_chunks(synthetic_past_awards, output, rows, seed, chunk_rows)
+
+
+def write_synthetic_active_opportunities(output: str, rows: int, seed: int = 0, chunk_rows: int = 1_000_000):
+    """
+    Write synthetic active opportunities to a CSV file in chunks, without holding all of them in memory.
+
+    :param output: Path of the CSV file to write.
+    :param rows: Number of rows.
+    :param seed: Seed of the random sampling.
+    :param chunk_rows: Number of rows generated at a time.
+    :return: Path of the written file.
+    """
+    return _write_chunks(synthetic_active_opportunities, output, rows, seed, chunk_rows)
@@ -0,0 +1,96 @@
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    Thread-safe mapping with a bounded number of entries, and optionally a bounded total size,
+    evicting the least recently used entries first.
+    """
+
+    def __init__(self, maxsize: int = 128, maxbytes: int = None, sizeof=None):
+        """
+        :param maxsize: Maximum number of entries kept.
+        :param maxbytes: Maximum total size of the values kept, None for no limit.
+        :param sizeof: Function giving the size in bytes of a value, required with maxbytes.
+        """
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.sizeof = sizeof
+        self.hits = 0
+        self.misses = 0
+        self.nbytes = 0
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        """
+        Look up an entry and mark it as recently used.
+
+        :param key: Key of the entry.
+        :param default: Value returned when the key is missing.
+        :return: The cached value or the default.
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        """
+        Store an entry, evicting the least recently used ones beyond the size limit.
+
+        :param key: Key of the entry.
+        :param value: Value to store.
+        """
+        size = self.sizeof(value) if self.sizeof is not None else 0
+        with self._lock:
+            self.nbytes += size - self._sizes.get(key, 0)
+            self._entries[key] = value
+            self._sizes[key] = size
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize or (
+                    self.maxbytes is not None and self.nbytes > self.maxbytes and len(self._entries) > 1):
+                evicted, _ = self._entries.popitem(last=False)
+                self.nbytes -= self._sizes.pop(evicted)
+
+    def get_or_compute(self, key, compute):
+        """
+        Return the cached value of a key, computing and storing it on a miss.
+
+        :param key: Key of the entry.
+        :param compute: Callable without arguments producing the value.
+        :return: The cached or computed value.
+        """
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        """
+        Drop all entries and reset the counters.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self.nbytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """
+        :return: Dictionary with the hit and miss counts, the number of entries and their total size.
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries), "maxsize": self.maxsize,
+                    "nbytes": self.nbytes, "maxbytes": self.maxbytes}
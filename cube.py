@@ -0,0 +1,247 @@
+import numpy as np
+import pandas as pd
+
+from distinct import HyperLogLog, estimate, hash_values
+
+# filter dimensions of the cubes, the group-by columns of the charts (the groups in aggregations),
+# and the columns counted and summed per cell
+ACTIVE_OPPORTUNITIES_CUBE = {
+    "dimensions": ["Awarding_Agency", "Type", "Score", "Set_Aside_Type", "DaysRemainingCode", "Score_Mapped"],
+    "groupings": [["Type"], ["Awarding_Agency"], ["Posted_Date"], ["NAICSCodeDesc"]],
+    "counts": ["Notice_ID", "Days_to_ResponseDeadline"],
+    "sums": ["Days_to_ResponseDeadline"],
+    "distinct": "Notice_ID",
+}
+PAST_AWARDS_CUBE = {
+    "dimensions": ["Awarding Agency", "Recipient Name", "Contract Award Type", "Contract Status",
+                   "AwardAmount_Binned", "Months Until Contract Ends"],
+    "groupings": [["Recipient Name"], ["Awarding Agency"], ["naics_description", "Awarding Agency"],
+                  ["Months Until Contract Ends", "Recipient Name"], ["Contract Duration (Years)", "Recipient Name"]],
+    "counts": ["generated_internal_id", "Award ID", "number_of_offers_received"],
+    "sums": ["Award Amount", "number_of_offers_received"],
+    "distinct": "generated_internal_id",
+}
+
+
+class RollupCube:
+    """
+    Counts and sums of a dataset over the cross product of its filter and chart dimensions.
+
+    Each cell holds the rows sharing one combination of dimension values (missing values included):
+    the number of rows, the number of non-missing values of the counted columns and the sums of the
+    summed columns. Means are a sum divided by a count. Any filter selection and grouping over the
+    dimensions is then answered from the cells, in time proportional to their number.
+
+    Distinct keys cannot be added up across cells unless they are unique. Otherwise the cells can
+    keep HyperLogLog sketches of their keys, merged over a selection into an estimated count.
+    """
+
+    def __init__(self, data: pd.DataFrame, dimensions: list, counts: list, sums: list, distinct: str = None,
+                 sketch_precision: int = None):
+        """
+        Build the cube.
+
+        :param data: DataFrame to roll up.
+        :param dimensions: Columns the cells are keyed on.
+        :param counts: Columns whose non-missing values are counted.
+        :param sums: Numeric columns summed, missing values skipped.
+        :param distinct: Key column whose distinct values are counted by the KPIs. They can be counted
+                         from the cells only when the column has no duplicated or missing values.
+        :param sketch_precision: Precision of the sketches of the distinct key kept per cell, over all rows
+                                 and over the rows of each counted column with a value. None for no sketches,
+                                 which are only built when the key is not unique.
+        """
+        self.dimensions = dimensions
+        self.distinct = distinct
+        self.dtypes = {column: data[column].dtype for column in dimensions + sums}
+        self.values = {}
+        codes = {}
+        for column in dimensions:
+            if isinstance(data[column].dtype, pd.CategoricalDtype):
+                codes[column] = data[column].cat.codes.values
+                self.values[column] = data[column].cat.categories
+            else:
+                codes[column], self.values[column] = pd.factorize(data[column], sort=True)
+
+        measures = {"rows": np.ones(len(data), dtype=np.int64)}
+        for column in counts:
+            measures[f"count:{column}"] = data[column].notna().values.astype(np.int64)
+        for column in sums:
+            values = data[column].values
+            measures[f"sum:{column}"] = np.where(np.isnan(values), 0, values) if values.dtype.kind == "f" else values
+        frame = pd.DataFrame({**codes, **measures})
+        grouped = frame.groupby(dimensions, sort=False)
+        self.cells = grouped.sum().reset_index()
+        self.distinct_exact = distinct is not None and data[distinct].notna().all() and data[distinct].is_unique
+
+        self.sketches = {}
+        if distinct is not None and not self.distinct_exact and sketch_precision:
+            keyed = data[distinct].notna().values
+            index, rank = HyperLogLog.buckets(hash_values(data[distinct].values), sketch_precision)
+            # one row of registers per cell, filled through a flat view
+            slot = grouped.ngroup().values.astype(np.intp) * (1 << sketch_precision) + index
+            for measure, rows in [("rows", keyed)] + [(f"count:{column}", keyed & data[column].notna().values)
+                                                      for column in counts if column != distinct]:
+                registers = np.zeros((len(self.cells), 1 << sketch_precision), dtype=np.uint8)
+                np.maximum.at(registers.reshape(-1), slot[rows], rank[rows])
+                self.sketches[measure] = registers
+
+    def __len__(self):
+        return len(self.cells)
+
+    def _matches(self, column: str, values: list):
+        selected = self.values[column].get_indexer(pd.Index(list(values)))
+        return np.isin(self.cells[column].values, selected[selected >= 0])
+
+    def mask(self, selection: dict):
+        """
+        :param selection: Mapping of dimension to the list of selected values, empty lists are not filtered.
+        :return: Boolean array of the cells matching every selected dimension.
+        """
+        mask = np.ones(len(self.cells), dtype=bool)
+        for column, values in selection.items():
+            if values:
+                mask &= self._matches(column, values)
+        return mask
+
+    def total(self, selection: dict, measure: str, where: dict = None):
+        """
+        :param selection: Mapping of dimension to the list of selected values.
+        :param measure: Name of a cell measure, e.g. 'rows', 'count:Notice_ID' or 'sum:Award Amount'.
+        :param where: Further mapping of dimension to the values the rows must hold, on top of the selection.
+        :return: Sum of the measure over the selected cells.
+        """
+        return self.cells[measure].values[self._selected(selection, where)].sum()
+
+    def _selected(self, selection: dict, where: dict = None):
+        mask = self.mask(selection)
+        for column, values in (where or {}).items():
+            mask &= self._matches(column, values)
+        return mask
+
+    @property
+    def counts_distinct(self):
+        """
+        :return: Whether distinct keys can be counted from the cells, exactly or from sketches.
+        """
+        return self.distinct_exact or bool(self.sketches)
+
+    def count_distinct(self, selection: dict, measure: str = "rows", where: dict = None):
+        """
+        Number of distinct keys of the selected rows: exact when the key is unique,
+        else estimated from the sketches of the selected cells.
+
+        :param selection: Mapping of dimension to the list of selected values.
+        :param measure: 'rows' for every row, or 'count:<column>' for the rows where the column has a value.
+        :param where: Further mapping of dimension to the values the rows must hold, on top of the selection.
+        :return: Distinct count, within the error bounds of HyperLogLog when estimated.
+        """
+        if self.distinct_exact:
+            # every key is one row
+            return self.total(selection, f"count:{self.distinct}" if measure == "rows" else measure, where)
+        registers = self.sketches[measure][self._selected(selection, where)]
+        return estimate(registers.max(axis=0)) if len(registers) else 0
+
+    def aggregate(self, selection: dict, by: list, aggregations: dict):
+        """
+        Aggregate the selected rows per key, like a groupby with observed=True followed by sort_index.
+
+        :param selection: Mapping of dimension to the list of selected values.
+        :param by: Dimensions to group by.
+        :param aggregations: Mapping of column to 'count', 'sum' or 'mean'.
+        :return: DataFrame with the keys and aggregated columns, one row per key in key order.
+        """
+        mask = self.mask(selection)
+        codes = [self.cells[column].values[mask] for column in by]
+        # rows with a missing key are left out of the groups
+        keyed = np.logical_and.reduce([code >= 0 for code in codes])
+        sizes = [len(self.values[column]) for column in by]
+        # one flat key per combination, in key order, the cells of a key summed by bincount
+        keys, groups = np.unique(np.ravel_multi_index([code[keyed] for code in codes], sizes), return_inverse=True)
+        measures = {f"{prefix}:{column}" for column, function in aggregations.items()
+                    for prefix in {"count": ["count"], "sum": ["sum"], "mean": ["sum", "count"]}[function]}
+        grouped = {measure: np.bincount(groups, weights=self.cells[measure].values[mask][keyed], minlength=len(keys))
+                   for measure in measures}
+
+        data = pd.DataFrame(index=pd.RangeIndex(len(keys)))
+        for column, code in zip(by, np.unravel_index(keys, sizes)):
+            if isinstance(self.dtypes[column], pd.CategoricalDtype):
+                data[column] = pd.Categorical.from_codes(code, dtype=self.dtypes[column])
+            else:
+                data[column] = self.values[column].take(code)
+        for column, function in aggregations.items():
+            if function == "count":
+                data[column] = grouped[f"count:{column}"].astype(np.int64)
+            elif function == "sum":
+                data[column] = grouped[f"sum:{column}"].astype(self.dtypes[column])
+            else:
+                total, count = grouped[f"sum:{column}"], grouped[f"count:{column}"]
+                data[column] = np.divide(total, count, out=np.full(len(total), np.nan), where=count > 0)
+        return data
+
+
+class RollupCubes:
+    """
+    Rollup cubes of a dataset: one over the filter dimensions, answering the KPIs, and one per chart grouping
+    over the filter dimensions plus the chart's own columns.
+
+    A single cube over every filter and chart column is nearly one cell per row as soon as a chart groups by
+    dates, recipients or NAICS descriptions, since their combinations multiply. Each rollup only multiplies
+    the filter dimensions by one grouping, and groupings within the filter dimensions share the KPI cube.
+    """
+
+    def __init__(self, data: pd.DataFrame, dimensions: list, groupings: list, counts: list, sums: list,
+                 distinct: str = None, sketch_precision: int = None):
+        """
+        Build the cubes.
+
+        :param data: DataFrame to roll up.
+        :param dimensions: Filter columns, every cube is keyed on them.
+        :param groupings: Lists of group-by columns of the charts.
+        :param counts: Columns whose non-missing values are counted.
+        :param sums: Numeric columns summed, missing values skipped.
+        :param distinct: Key column whose distinct values are counted by the KPIs, see RollupCube.
+        :param sketch_precision: Precision of the sketches of the distinct key kept per cell of the KPI cube,
+                                 see RollupCube.
+        """
+        self.dimensions = dimensions
+        self.kpis = RollupCube(data, dimensions, counts, sums, distinct, sketch_precision)
+        # rollups by the columns they add to the filter dimensions
+        self.rollups = {frozenset(): self.kpis}
+        for by in groupings:
+            extra = [column for column in by if column not in dimensions]
+            if frozenset(extra) not in self.rollups:
+                self.rollups[frozenset(extra)] = RollupCube(data, dimensions + extra, counts, sums)
+
+    def __len__(self):
+        return sum(len(cube) for cube in self.rollups.values())
+
+    @property
+    def counts_distinct(self):
+        """
+        :return: Whether distinct keys can be counted from the cells, exactly or from sketches.
+        """
+        return self.kpis.counts_distinct
+
+    def total(self, selection: dict, measure: str, where: dict = None):
+        """
+        Sum of a measure over the selected cells of the KPI cube, see RollupCube.total.
+        """
+        return self.kpis.total(selection, measure, where)
+
+    def count_distinct(self, selection: dict, measure: str = "rows", where: dict = None):
+        """
+        Number of distinct keys of the selected rows from the KPI cube, see RollupCube.count_distinct.
+        """
+        return self.kpis.count_distinct(selection, measure, where)
+
+    def aggregate(self, selection: dict, by: list, aggregations: dict):
+        """
+        Aggregate the selected rows per key from the rollup of the grouping, see RollupCube.aggregate.
+
+        :raise KeyError: When the cubes have no rollup of the grouping.
+        """
+        extra = frozenset(column for column in by if column not in self.dimensions)
+        if extra not in self.rollups:
+            raise KeyError(f"No rollup groups by {by}, it must be one of the groupings of the cubes.")
+        return self.rollups[extra].aggregate(selection, by, aggregations)
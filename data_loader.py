@@ -0,0 +1,711 @@
+import argparse
+import csv
+import io
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from award_store import build_store, matching_partitions, read_manifest, read_store, update_store, ROW_COLUMN
+from caching import LRUCache
+from cube import RollupCubes, ACTIVE_OPPORTUNITIES_CUBE, PAST_AWARDS_CUBE
+from distinct import encode_keys
+from facets import FacetIndex
+from search import SearchIndex
+from shared_data import attach, publish, read_pointer, pointer_path
+from schema import ACTIVE_OPPORTUNITIES_SCHEMA, PAST_AWARDS_SCHEMA, apply_schema
+from text_store import TextStore, build_text_store, read_text_manifest
+from utils import preprocess_color_info
+
+try:
+    import pyarrow  # noqa: F401 (parquet engine)
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+ACTIVE_OPPORTUNITIES_PATH = "./data/ActiveOpportunities.csv"
+PAST_AWARDS_PATH = "./data/PastAwards.csv"
+
+# columns used by the dashboard views
+ACTIVE_OPPORTUNITIES_COLUMNS = ["Awarding_Agency", "Title", "DescriptionText", "Type",
+                                "Score", "Set_Aside_Type",
+                                "DaysRemainingCode", "Notice_ID", "Score_Mapped",
+                                "Days_to_ResponseDeadline", "Posted_Date",
+                                "NAICSCodeDesc", "Description link"]
+PAST_AWARDS_COLUMNS = ["Award ID", "Awarding Agency", "Recipient Name",
+                       "Contract Award Type", "Contract Status", "naics_description",
+                       "AwardAmount_Binned", "generated_internal_id", "Award Amount",
+                       "Description", "Start Date", "End Date", "Last Modified Date",
+                       "Months Until Contract Ends", "PastAwards_URL",
+                       "number_of_offers_received", "Contract Duration (Years)"]
+
+# filter columns of the sidebar
+ACTIVE_OPPORTUNITIES_FACETS = ["Awarding_Agency", "Type", "Score", "Set_Aside_Type", "DaysRemainingCode"]
+PAST_AWARDS_FACETS = ["Awarding Agency", "Recipient Name", "Contract Award Type", "Contract Status",
+                      "AwardAmount_Binned", "Months Until Contract Ends"]
+
+# text columns of the keyword search of the active opportunities
+ACTIVE_OPPORTUNITIES_SEARCH = ["Title", "DescriptionText", "NAICSCodeDesc"]
+
+# wide text columns kept out of the loaded frames once a text store is compiled, with the keys addressing them
+ACTIVE_OPPORTUNITIES_TEXT = ("Notice_ID", ["DescriptionText"])
+PAST_AWARDS_TEXT = ("generated_internal_id", ["Description"])
+
+# bumped whenever the snapshot layout changes, so snapshots written by older versions are ignored
+SNAPSHOT_VERSION = 2
+
+# rows of the past awards CSV parsed at a time by the streaming loader
+PAST_AWARDS_CHUNK_SIZE = 100_000
+
+# stream the past awards from disk per filter selection instead of keeping the whole file in memory,
+# for award histories too large for every server worker to hold
+STREAMING_LOAD = os.environ.get("FOAM_STREAMING_LOAD", "") == "1"
+
+# keys counted by the distinct-count KPIs, encoded as integer ids in the frames held in memory
+ACTIVE_OPPORTUNITIES_KEYS = ["Notice_ID"]
+PAST_AWARDS_KEYS = ["generated_internal_id"]
+
+# precision of the HyperLogLog sketches kept per cube cell when a key is not unique, 0 to count the rows instead
+DISTINCT_SKETCH_PRECISION = int(os.environ.get("FOAM_DISTINCT_SKETCH", "0"))
+
+# directory of the datasets published by `python data_loader.py publish`, mapped by every server
+# worker instead of parsing its own copy, empty to parse the CSV files in each worker
+SHARED_DATA_ROOT = os.environ.get("FOAM_SHARED_DATA", "")
+
+ACTIVE_OPPORTUNITIES_DATE_COLUMNS = ["Posted_Date"]
+PAST_AWARDS_DATE_COLUMNS = ["Start Date", "End Date", "Last Modified Date"]
+
+# process-wide cache shared by every session of the streamlit server
+_cache = {}
+_cache_lock = threading.Lock()
+
+# filtered past awards of the last few selections when streaming, kept small to bound memory
+_filtered_cache = LRUCache(maxsize=4)
+
+
+def file_signature(path: str):
+    """
+    Identify the current version of a file on disk.
+
+    :param path: Path of the file.
+    :return: A tuple of (absolute path, modification time in ns, size in bytes).
+    """
+    stat = os.stat(path)
+    return os.path.abspath(path), stat.st_mtime_ns, stat.st_size
+
+
+def dataset_name(path: str):
+    """
+    :param path: Path of a CSV file.
+    :return: Name of its dataset in the shared data root, the file name without extension.
+    """
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def data_version(path: str):
+    """
+    Identify the current version of the data of a file.
+
+    With a shared data root, the data is the version published for the file, identified by
+    its pointer, which is replaced on each publication. Otherwise it is the file itself.
+
+    :param path: Path of the source file.
+    :return: A tuple starting with the absolute path of the file.
+    """
+    if SHARED_DATA_ROOT:
+        stat = os.stat(pointer_path(SHARED_DATA_ROOT, dataset_name(path)))
+        return os.path.abspath(path), "shared", stat.st_mtime_ns, stat.st_ino
+    return file_signature(path)
+
+
+def _cached(kind: str, path: str, builder):
+    """
+    Return the value built for the current version of a file, building it at most once.
+
+    Entries are keyed on the data version of the file, so a modified file or a new publication
+    is picked up on the next call and the stale entry for the same file is dropped.
+
+    :param kind: Name of the cached object, e.g. 'active_opportunities'.
+    :param path: Path of the source file.
+    :param builder: Callable without arguments producing the value.
+    :return: The cached value.
+    """
+    key = (kind,) + data_version(path)
+    with _cache_lock:
+        if key in _cache:
+            return _cache[key]
+    value = builder()
+    with _cache_lock:
+        for stale in [k for k in _cache if k[:2] == key[:2] and k != key]:
+            del _cache[stale]
+        _cache[key] = value
+    return value
+
+
+def clear_cache():
+    """
+    Drop every cached dataset.
+    """
+    with _cache_lock:
+        _cache.clear()
+    _filtered_cache.clear()
+
+
+def snapshot_path(path: str):
+    """
+    Location of the columnar snapshot compiled from a CSV file.
+
+    :param path: Path of the CSV file.
+    :return: Path of the parquet snapshot next to the CSV file.
+    """
+    return f"{os.path.splitext(path)[0]}.v{SNAPSHOT_VERSION}.parquet"
+
+
+def has_fresh_snapshot(path: str):
+    """
+    Check whether a snapshot exists for a CSV file and is not older than it.
+
+    :param path: Path of the CSV file.
+    :return: True if the snapshot can be read instead of the CSV file.
+    """
+    snapshot = snapshot_path(path)
+    if not HAS_PYARROW or not os.path.exists(snapshot):
+        return False
+    return os.stat(snapshot).st_mtime_ns >= os.stat(path).st_mtime_ns
+
+
+def store_path(path: str):
+    """
+    Location of the partitioned store compiled from the past awards CSV file.
+
+    :param path: Path of the CSV file.
+    :return: Path of the store directory next to the CSV file.
+    """
+    return f"{os.path.splitext(path)[0]}.store"
+
+
+def fresh_store_manifest(path: str):
+    """
+    Manifest of the partitioned store of a CSV file, if it was compiled from the current version of the file.
+
+    :param path: Path of the CSV file.
+    :return: The manifest, or None when the store is missing or stale.
+    """
+    if not HAS_PYARROW:
+        return None
+    manifest = read_manifest(store_path(path))
+    if manifest is None or manifest["source"] != list(file_signature(path)[1:]):
+        return None
+    return manifest
+
+
+def text_store_path(path: str):
+    """
+    Location of the text store compiled from a CSV file.
+
+    :param path: Path of the CSV file.
+    :return: Path of the store directory next to the CSV file.
+    """
+    return f"{os.path.splitext(path)[0]}.text"
+
+
+def fresh_text_store_manifest(path: str):
+    """
+    Manifest of the text store of a CSV file, if it was compiled from the current version of the file.
+
+    :param path: Path of the CSV file.
+    :return: The manifest, or None when the store is missing or stale.
+    """
+    manifest = read_text_manifest(text_store_path(path))
+    if manifest is None or manifest["source"] != list(file_signature(path)[1:]):
+        return None
+    return manifest
+
+
+def eager_columns(path: str, columns: list):
+    """
+    :param path: Path of the CSV file.
+    :param columns: Columns used by the dashboard views.
+    :return: The columns to load, without those held by a fresh text store.
+    """
+    manifest = fresh_text_store_manifest(path)
+    if manifest is None:
+        return columns
+    return [column for column in columns if column not in manifest["columns"]]
+
+
+def parse_active_opportunities(path: str = ACTIVE_OPPORTUNITIES_PATH, columns: list = ACTIVE_OPPORTUNITIES_COLUMNS):
+    """
+    Parse the active opportunities CSV into a typed DataFrame.
+
+    :param path: Path of the ActiveOpportunities CSV file.
+    :param columns: Columns to parse.
+    :return: DataFrame with parsed dates, categoricals and the days remaining color column.
+    """
+    data = pd.read_csv(path, usecols=columns)
+    for column in ACTIVE_OPPORTUNITIES_DATE_COLUMNS:
+        data[column] = pd.to_datetime(data[column])
+    return apply_schema(preprocess_color_info(data), ACTIVE_OPPORTUNITIES_SCHEMA)
+
+
+def parse_past_awards(path: str = PAST_AWARDS_PATH, columns: list = PAST_AWARDS_COLUMNS):
+    """
+    Parse the past awards CSV into a typed DataFrame.
+
+    :param path: Path of the PastAwards CSV file.
+    :param columns: Columns to parse.
+    :return: DataFrame with parsed dates and categoricals.
+    """
+    data = pd.read_csv(path, usecols=columns)
+    for column in PAST_AWARDS_DATE_COLUMNS:
+        data[column] = pd.to_datetime(data[column])
+    return apply_schema(data, PAST_AWARDS_SCHEMA)
+
+
+def read_active_opportunities(path: str = ACTIVE_OPPORTUNITIES_PATH):
+    """
+    Read active opportunities from the compiled snapshot when it is up to date, else from the CSV.
+    The text columns of a fresh text store are left out.
+
+    :param path: Path of the ActiveOpportunities CSV file.
+    :return: Typed DataFrame of active opportunities.
+    """
+    columns = eager_columns(path, ACTIVE_OPPORTUNITIES_COLUMNS)
+    if has_fresh_snapshot(path):
+        # parquet keeps string categoricals only, the schema restores the numeric ones
+        data = pd.read_parquet(snapshot_path(path), columns=columns + ["DaysRemainingColor"])
+        return apply_schema(data, ACTIVE_OPPORTUNITIES_SCHEMA)
+    return parse_active_opportunities(path, columns)
+
+
+def read_past_awards(path: str = PAST_AWARDS_PATH):
+    """
+    Read past awards from the compiled snapshot when it is up to date, else from the partitioned store
+    when it is, else from the CSV. The text columns of a fresh text store are left out.
+
+    :param path: Path of the PastAwards CSV file.
+    :return: Typed DataFrame of past awards.
+    """
+    columns = eager_columns(path, PAST_AWARDS_COLUMNS)
+    if has_fresh_snapshot(path):
+        return apply_schema(pd.read_parquet(snapshot_path(path), columns=columns), PAST_AWARDS_SCHEMA)
+    manifest = fresh_store_manifest(path)
+    if manifest is not None:
+        # a store refreshed by partitions holds the rows of its removed snapshot
+        data = read_store(store_path(path), manifest=manifest)
+        return data[[column for column in data.columns if column in columns]]
+    return parse_past_awards(path, columns)
+
+
+def _selection_mask(data: pd.DataFrame, selection: dict):
+    """
+    :param data: DataFrame holding the selection columns.
+    :param selection: Mapping of column name to the list of selected values, empty lists are not filtered.
+    :return: Boolean array of the rows matching every selected column.
+    """
+    mask = np.ones(len(data), dtype=bool)
+    for column, values in selection.items():
+        if values:
+            mask &= data[column].isin(values).values
+    return mask
+
+
+def stream_past_awards(path: str = PAST_AWARDS_PATH, selection: dict = None,
+                       chunksize: int = PAST_AWARDS_CHUNK_SIZE):
+    """
+    Read the past awards matching a filter selection without holding the whole file in memory.
+
+    A fresh partitioned store is read from the partitions that can match only, and a fresh
+    snapshot is scanned with the selection pushed down to the parquet reader. Otherwise
+    the CSV is parsed chunk by chunk: each chunk is projected to the dashboard columns, filtered,
+    and only its matching rows get their dates parsed and are kept. The categorical schema is
+    applied once at the end, so the categories of all chunks agree.
+
+    :param path: Path of the PastAwards CSV file.
+    :param selection: Mapping of column name to the list of selected values, None to read every row.
+    :param chunksize: Number of CSV rows parsed at a time.
+    :return: Typed DataFrame of the matching past awards.
+    """
+    selection = {column: list(values) for column, values in (selection or {}).items() if values}
+    manifest = fresh_store_manifest(path)
+    if manifest is not None:
+        return read_store(store_path(path), selection, manifest)
+    columns = eager_columns(path, PAST_AWARDS_COLUMNS)
+    if has_fresh_snapshot(path):
+        filters = [(column, "in", values) for column, values in selection.items()]
+        data = pd.read_parquet(snapshot_path(path), columns=columns, filters=filters or None)
+        return apply_schema(data, PAST_AWARDS_SCHEMA)
+
+    chunks = []
+    for chunk in pd.read_csv(path, usecols=columns, chunksize=chunksize):
+        chunk = chunk[_selection_mask(chunk, selection)]
+        for column in PAST_AWARDS_DATE_COLUMNS:
+            chunk[column] = pd.to_datetime(chunk[column])
+        chunks.append(chunk)
+    return apply_schema(pd.concat(chunks, ignore_index=True), PAST_AWARDS_SCHEMA)
+
+
+def scan_past_awards_options(path: str = PAST_AWARDS_PATH, chunksize: int = PAST_AWARDS_CHUNK_SIZE):
+    """
+    Sidebar options of the past awards, gathered chunk by chunk from the filter columns only.
+
+    :param path: Path of the PastAwards CSV file.
+    :param chunksize: Number of CSV rows parsed at a time.
+    :return: Mapping of filter column to its values, in the same order as FacetIndex.options.
+    """
+    values = {column: set() for column in PAST_AWARDS_FACETS}
+    for chunk in pd.read_csv(path, usecols=PAST_AWARDS_FACETS, chunksize=chunksize):
+        for column in PAST_AWARDS_FACETS:
+            values[column].update(chunk[column].dropna().unique())
+    options = {}
+    for column, present in values.items():
+        categories = apply_schema(pd.DataFrame({column: list(present)}), PAST_AWARDS_SCHEMA)[column].cat.categories
+        options[column] = [value for value in categories if value in present]
+    return options
+
+
+def load_past_awards_options(path: str = PAST_AWARDS_PATH):
+    """
+    Sidebar options of the past awards when streaming, scanned once per file version.
+
+    :param path: Path of the PastAwards CSV file.
+    :return: Mapping of filter column to its values.
+    """
+    return _cached("past_awards_options", path, lambda: scan_past_awards_options(path))
+
+
+def load_filtered_past_awards(selection: dict, path: str = PAST_AWARDS_PATH):
+    """
+    Past awards matching a filter selection when streaming, kept for the few most recent selections.
+    The returned DataFrame is shared and must not be modified.
+
+    :param selection: Mapping of column name to the list of selected values.
+    :param path: Path of the PastAwards CSV file.
+    :return: Typed DataFrame of the matching past awards.
+    """
+    selected = tuple(sorted((column, tuple(sorted(values, key=str))) for column, values in selection.items() if values))
+    manifest = fresh_store_manifest(path)
+    if manifest is None:
+        version = file_signature(path)
+    else:
+        # rows read from the store only change with the partitions they come from
+        version = (os.path.abspath(store_path(path)),) + tuple(
+            partition["version"] for partition in matching_partitions(manifest, dict(selected)))
+    return _filtered_cache.get_or_compute((version, selected), lambda: stream_past_awards(path, selection))
+
+
+def load_active_opportunities_facets(path: str = ACTIVE_OPPORTUNITIES_PATH):
+    """
+    Facet index over the sidebar filters of the active opportunities, built once per file version.
+
+    :param path: Path of the ActiveOpportunities CSV file.
+    :return: FacetIndex of the active opportunities.
+    """
+    return _cached("active_opportunities_facets", path,
+                   lambda: FacetIndex(load_active_opportunities(path), ACTIVE_OPPORTUNITIES_FACETS))
+
+
+def load_past_awards_facets(path: str = PAST_AWARDS_PATH):
+    """
+    Facet index over the sidebar filters of the past awards, built once per file version.
+
+    :param path: Path of the PastAwards CSV file.
+    :return: FacetIndex of the past awards.
+    """
+    return _cached("past_awards_facets", path,
+                   lambda: FacetIndex(load_past_awards(path), PAST_AWARDS_FACETS))
+
+
+def load_active_opportunities_texts(path: str = ACTIVE_OPPORTUNITIES_PATH):
+    """
+    Text store of the active opportunities, opened once per file version. Texts are read on demand.
+
+    :param path: Path of the ActiveOpportunities CSV file.
+    :return: TextStore, or None when no fresh store was compiled and the texts are in the loaded frame.
+    """
+    return _cached("active_opportunities_texts", path, lambda: _open_text_store(path))
+
+
+def load_past_awards_texts(path: str = PAST_AWARDS_PATH):
+    """
+    Text store of the past awards, opened once per file version. Texts are read on demand.
+
+    :param path: Path of the PastAwards CSV file.
+    :return: TextStore, or None when no fresh store was compiled and the texts are in the loaded frame.
+    """
+    return _cached("past_awards_texts", path, lambda: _open_text_store(path))
+
+
+def _open_text_store(path: str):
+    manifest = fresh_text_store_manifest(path)
+    return None if manifest is None else TextStore(text_store_path(path), manifest)
+
+
+def load_opportunity_descriptions(notice_ids: list, path: str = ACTIVE_OPPORTUNITIES_PATH):
+    """
+    Descriptions of some opportunities, read from the text store when there is one.
+
+    :param notice_ids: Notice_ID of the opportunities.
+    :param path: Path of the ActiveOpportunities CSV file.
+    :return: Series of the DescriptionText of the opportunities indexed by Notice_ID, None when missing.
+    """
+    store = load_active_opportunities_texts(path)
+    if store is not None:
+        return store.lookup("DescriptionText", notice_ids)
+    data = load_active_opportunities(path)
+    positions = pd.Index(data["Notice_ID"].astype(object)).get_indexer(notice_ids)
+    texts = data["DescriptionText"].astype(object).values.take(np.maximum(positions, 0))
+    # unknown notices and empty descriptions alike, as the text store answers them
+    return pd.Series(np.where((positions >= 0) & pd.notna(texts), texts, None), index=list(notice_ids),
+                     name="DescriptionText")
+
+
+def load_active_opportunities_search(path: str = ACTIVE_OPPORTUNITIES_PATH):
+    """
+    Keyword search index over the texts of the active opportunities, built once per file version.
+
+    :param path: Path of the ActiveOpportunities CSV file.
+    :return: SearchIndex of the active opportunities.
+    """
+    return _cached("active_opportunities_search", path,
+                   lambda: SearchIndex(load_active_opportunities(path), ACTIVE_OPPORTUNITIES_SEARCH,
+                                       texts=load_active_opportunities_texts(path)))
+
+
+def load_active_opportunities_cube(path: str = ACTIVE_OPPORTUNITIES_PATH):
+    """
+    Rollup cubes of the active opportunities, built once per file version.
+
+    :param path: Path of the ActiveOpportunities CSV file.
+    :return: RollupCubes of the active opportunities.
+    """
+    return _cached("active_opportunities_cube", path,
+                   lambda: RollupCubes(load_active_opportunities(path), **ACTIVE_OPPORTUNITIES_CUBE,
+                                       sketch_precision=DISTINCT_SKETCH_PRECISION or None))
+
+
+def load_past_awards_cube(path: str = PAST_AWARDS_PATH):
+    """
+    Rollup cubes of the past awards, built once per file version.
+
+    :param path: Path of the PastAwards CSV file.
+    :return: RollupCubes of the past awards.
+    """
+    return _cached("past_awards_cube", path, lambda: RollupCubes(load_past_awards(path), **PAST_AWARDS_CUBE,
+                                                                 sketch_precision=DISTINCT_SKETCH_PRECISION or None))
+
+
+def compile_snapshot(path: str, parser):
+    """
+    Convert a CSV file into a typed parquet snapshot.
+
+    The snapshot is written to a temporary file first and moved into place,
+    so a running dashboard never reads a partially written snapshot.
+
+    :param path: Path of the CSV file.
+    :param parser: Function parsing the CSV file into a typed DataFrame.
+    :return: Path of the written snapshot.
+    """
+    if not HAS_PYARROW:
+        raise ImportError("pyarrow is required to compile snapshots")
+    snapshot = snapshot_path(path)
+    temporary = snapshot + ".tmp"
+    parser(path).to_parquet(temporary, index=False)
+    os.replace(temporary, snapshot)
+    return snapshot
+
+
+def compile_snapshots(active_opportunities_path: str = ACTIVE_OPPORTUNITIES_PATH,
+                      past_awards_path: str = PAST_AWARDS_PATH):
+    """
+    Compile the snapshots of both datasets.
+
+    :param active_opportunities_path: Path of the ActiveOpportunities CSV file.
+    :param past_awards_path: Path of the PastAwards CSV file.
+    :return: List of written snapshot paths.
+    """
+    return [compile_snapshot(active_opportunities_path, parse_active_opportunities),
+            compile_snapshot(past_awards_path, parse_past_awards)]
+
+
+def compile_store(path: str = PAST_AWARDS_PATH):
+    """
+    Write the past awards as a store partitioned by End Date quarter and awarding agency.
+
+    :param path: Path of the PastAwards CSV file.
+    :return: Path of the written store.
+    """
+    if not HAS_PYARROW:
+        raise ImportError("pyarrow is required to compile the award store")
+    root = store_path(path)
+    build_store(read_past_awards(path), root, list(file_signature(path)[1:]))
+    return root
+
+
+def compile_text_store(path: str, parser, key: str, columns: list):
+    """
+    Move the text columns of a CSV file to a text store, after which they are no longer loaded with the others.
+
+    :param path: Path of the CSV file.
+    :param parser: Function parsing the CSV file into a typed DataFrame.
+    :param key: Column identifying the rows.
+    :param columns: Text columns to store.
+    :return: Path of the written store.
+    """
+    root = text_store_path(path)
+    build_text_store(parser(path), root, key, columns, list(file_signature(path)[1:]))
+    return root
+
+
+def compile_text_stores(active_opportunities_path: str = ACTIVE_OPPORTUNITIES_PATH,
+                        past_awards_path: str = PAST_AWARDS_PATH):
+    """
+    Compile the text stores of both datasets.
+
+    :param active_opportunities_path: Path of the ActiveOpportunities CSV file.
+    :param past_awards_path: Path of the PastAwards CSV file.
+    :return: List of written store paths.
+    """
+    return [compile_text_store(active_opportunities_path, parse_active_opportunities, *ACTIVE_OPPORTUNITIES_TEXT),
+            compile_text_store(past_awards_path, parse_past_awards, *PAST_AWARDS_TEXT)]
+
+
+def publish_shared_datasets(root: str, active_opportunities_path: str = ACTIVE_OPPORTUNITIES_PATH,
+                            past_awards_path: str = PAST_AWARDS_PATH):
+    """
+    Publish to the shared data root the datasets whose CSV file changed since their last publication.
+
+    :param root: Directory of the published datasets.
+    :param active_opportunities_path: Path of the ActiveOpportunities CSV file.
+    :param past_awards_path: Path of the PastAwards CSV file.
+    :return: List of written paths.
+    """
+    os.makedirs(root, exist_ok=True)
+    written = []
+    for path, reader, keys in [(active_opportunities_path, read_active_opportunities, ACTIVE_OPPORTUNITIES_KEYS),
+                               (past_awards_path, read_past_awards, PAST_AWARDS_KEYS)]:
+        source = list(file_signature(path)[1:])
+        pointer = read_pointer(root, dataset_name(path))
+        if pointer is None or pointer["source"] != source:
+            written.append(publish(encode_keys(reader(path), keys), root, dataset_name(path), source))
+    return written
+
+
+def _parse_rows(parser, header: list, rows: list, columns: list):
+    # rows of the CSV file parsed on their own, typed like the whole file
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    writer.writerows(rows)
+    buffer.seek(0)
+    return parser(buffer, columns)
+
+
+def refresh_store(path: str, parser, key: str, changes: dict):
+    """
+    Rewrite the partitions of the store of a CSV file that held or receive the rows changed by a refresh,
+    leaving the other partitions, and the filtered rows cached from them, as they are.
+
+    :param path: Path of the CSV file, already changed.
+    :param parser: Function parsing the CSV file into a typed DataFrame.
+    :param key: Column identifying the rows.
+    :param changes: Changed rows from upsert_csv, its store being fresh before the change.
+    :return: List of the rewritten partition paths.
+    """
+    root = store_path(path)
+    columns = [column for column in read_manifest(root)["columns"] if column != ROW_COLUMN]
+    removed = _parse_rows(parser, changes["header"], changes["removed"], columns)
+    added = _parse_rows(parser, changes["header"], changes["added"], columns)
+    touched = update_store(root, removed, added, key, list(file_signature(path)[1:]))
+    return [os.path.join(root, relative) for relative in touched]
+
+
+def recompile(path: str, parser, key: str = None, changes: dict = None):
+    """
+    Compile again the snapshot, the store and the text store of a CSV file that changed,
+    those that were compiled before.
+
+    With the rows changed by a refresh, a fresh store before the change only has the partitions of
+    those rows rewritten. It then holds every row, and its snapshot, which would be written whole
+    again, is removed instead.
+
+    :param path: Path of the CSV file.
+    :param parser: Function parsing the CSV file into a typed DataFrame.
+    :param key: Column identifying the rows, with changes.
+    :param changes: Changed rows from upsert_csv, None to compile the store whole again.
+    :return: List of written paths.
+    """
+    written = []
+    partitioned = HAS_PYARROW and changes is not None and read_manifest(store_path(path)) is not None
+    if partitioned:
+        written.extend(refresh_store(path, parser, key, changes))
+        if os.path.exists(snapshot_path(path)):
+            os.remove(snapshot_path(path))
+    elif HAS_PYARROW and os.path.exists(snapshot_path(path)):
+        written.append(compile_snapshot(path, parser))
+    if HAS_PYARROW and not partitioned and os.path.exists(store_path(path)):
+        written.append(compile_store(path))
+    manifest = read_text_manifest(text_store_path(path))
+    if manifest is not None:
+        written.append(compile_text_store(path, parser, manifest["key"], manifest["columns"]))
+    return written
+
+
+def load_active_opportunities(path: str = ACTIVE_OPPORTUNITIES_PATH):
+    """
+    Active opportunities, parsed once per file version and shared across sessions, or mapped from
+    the shared data root when one is set, grouping the columns by dtype.
+    The returned DataFrame is shared and must not be modified.
+
+    :param path: Path of the ActiveOpportunities CSV file.
+    :return: DataFrame of active opportunities, with the keys encoded as categoricals.
+    """
+    if SHARED_DATA_ROOT:
+        return _cached("active_opportunities", path, lambda: attach(SHARED_DATA_ROOT, dataset_name(path)))
+    return _cached("active_opportunities", path,
+                   lambda: encode_keys(read_active_opportunities(path), ACTIVE_OPPORTUNITIES_KEYS))
+
+
+def load_past_awards(path: str = PAST_AWARDS_PATH):
+    """
+    Past awards, parsed once per file version and shared across sessions, or mapped from
+    the shared data root when one is set, grouping the columns by dtype.
+    The returned DataFrame is shared and must not be modified.
+
+    :param path: Path of the PastAwards CSV file.
+    :return: DataFrame of past awards, with the keys encoded as categoricals.
+    """
+    if SHARED_DATA_ROOT:
+        return _cached("past_awards", path, lambda: attach(SHARED_DATA_ROOT, dataset_name(path)))
+    return _cached("past_awards", path, lambda: encode_keys(read_past_awards(path), PAST_AWARDS_KEYS))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="F.O.A.M data tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("compile", help="convert the CSV files into typed parquet snapshots, the partitioned "
+                                         "award store and the text stores")
+    publishing = commands.add_parser("publish", help="publish the datasets to the shared data root mapped by "
+                                                     "the server workers")
+    publishing.add_argument("--root", default=SHARED_DATA_ROOT or "./data/shared",
+                            help="shared data root, FOAM_SHARED_DATA of the workers")
+    publishing.add_argument("--watch", type=float, default=None,
+                            help="keep running and publish again the datasets whose CSV file changed, "
+                                 "checking every this many seconds")
+    args = parser.parse_args()
+
+    if args.command == "compile":
+        for written in compile_snapshots():
+            print(f"Snapshot written to {written}")
+        print(f"Award store written to {compile_store()}")
+        for written in compile_text_stores():
+            print(f"Text store written to {written}")
+    elif args.command == "publish":
+        while True:
+            for written in publish_shared_datasets(args.root):
+                print(f"Published {written}")
+            if args.watch is None:
+                break
+            time.sleep(args.watch)
@@ -0,0 +1,137 @@
+import numpy as np
+import pandas as pd
+
+# below this many codes per id, sorting the codes is cheaper than a bitmap over every id
+SPARSE_RATIO = 64
+
+# default precision of the sketches: 2**10 one-byte registers, about 3% standard error
+SKETCH_PRECISION = 10
+
+
+def encode_keys(data: pd.DataFrame, columns: list):
+    """
+    Replace key columns by categoricals, so each key gets a dense integer id (its category code)
+    once at load time and distinct counts become counts of ids.
+
+    :param data: DataFrame holding the key columns.
+    :param columns: Names of the key columns.
+    :return: DataFrame with the key columns as categoricals.
+    """
+    return data.astype({column: "category" for column in columns if column in data.columns})
+
+
+def count_distinct_codes(codes: np.ndarray, cardinality: int):
+    """
+    Exact number of distinct ids, missing values (-1) left out.
+
+    The ids are marked in a bitmap of all ids and the marks counted, or sorted
+    when there are far fewer codes than ids.
+
+    :param codes: Integer ids in [0, cardinality), -1 for missing values.
+    :param cardinality: Number of possible ids.
+    :return: Number of distinct ids.
+    """
+    codes = codes[codes >= 0]
+    if len(codes) * SPARSE_RATIO < cardinality:
+        return len(np.unique(codes))
+    seen = np.zeros(cardinality, dtype=bool)
+    seen[codes] = True
+    return int(np.count_nonzero(seen))
+
+
+def hash_values(values):
+    """
+    :param values: Array of values, categoricals are hashed once per category.
+    :return: Array of 64-bit hashes.
+    """
+    if isinstance(values, pd.Categorical):
+        return pd.util.hash_array(np.asarray(values.categories)).take(values.codes)
+    return pd.util.hash_array(np.asarray(values))
+
+
+class HyperLogLog:
+    """
+    HyperLogLog sketch of the distinct values of a column.
+
+    Each of the 2**precision one-byte registers keeps the longest run of leading zeros seen
+    among the hashes routed to it. The estimate has a relative standard error of about
+    1.04 / sqrt(2**precision), e.g. 3.3% at precision 10 and 1.6% at precision 12, and stays
+    within three standard errors in 99.7% of cases. Below 2.5 * 2**precision distinct values,
+    linear counting is used, which is nearly exact for small counts. Sketches of disjoint
+    or overlapping rows merge by an element-wise maximum, so rollups can keep one per cell.
+    """
+
+    def __init__(self, precision: int = SKETCH_PRECISION, registers: np.ndarray = None):
+        """
+        :param precision: Number of bits of the hash choosing the register, between 4 and 16.
+        :param registers: Registers of an existing sketch, empty registers when None.
+        """
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8) if registers is None else registers
+
+    @property
+    def relative_error(self):
+        """
+        :return: Relative standard error of the estimate.
+        """
+        return 1.04 / np.sqrt(len(self.registers))
+
+    @staticmethod
+    def buckets(hashes: np.ndarray, precision: int):
+        """
+        Register and rank of each hash.
+
+        :param hashes: Array of 64-bit hashes.
+        :param precision: Precision of the sketch.
+        :return: Tuple of the register indexes and the ranks, one plus the number of leading zeros
+                 of the remaining bits.
+        """
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        bits = 64 - precision
+        rest = hashes & np.uint64((1 << bits) - 1)
+        # frexp gives the bit length exactly on the 32-bit halves
+        high = np.frexp((rest >> np.uint64(32)).astype(np.float64))[1]
+        low = np.frexp((rest & np.uint64(0xFFFFFFFF)).astype(np.float64))[1]
+        length = np.where(high > 0, high + 32, low)
+        return (hashes >> np.uint64(bits)).astype(np.intp), (bits - length + 1).astype(np.uint8)
+
+    def add(self, hashes: np.ndarray):
+        """
+        Add hashed values to the sketch.
+
+        :param hashes: Array of 64-bit hashes, see hash_values.
+        :return: The sketch.
+        """
+        index, rank = self.buckets(hashes, self.precision)
+        np.maximum.at(self.registers, index, rank)
+        return self
+
+    def merge(self, other):
+        """
+        Add the values of another sketch of the same precision.
+
+        :param other: HyperLogLog to merge.
+        :return: The sketch.
+        """
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def estimate(self):
+        """
+        :return: Estimated number of distinct values added.
+        """
+        return estimate(self.registers)
+
+
+def estimate(registers: np.ndarray):
+    """
+    :param registers: Registers of a HyperLogLog sketch.
+    :return: Estimated number of distinct values.
+    """
+    m = len(registers)
+    alpha = 0.7213 / (1 + 1.079 / m)
+    raw = alpha * m * m / np.sum(np.ldexp(1.0, -registers.astype(np.int32)))
+    zeros = np.count_nonzero(registers == 0)
+    if raw <= 2.5 * m and zeros:
+        return int(round(m * np.log(m / zeros)))
+    return int(round(raw))
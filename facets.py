@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+
+
+class FacetIndex:
+    """
+    Inverted index from the values of categorical filter columns to the rows holding them.
+
+    Each value is stored either as a packed bitmap over all rows or as a sorted array of
+    row positions, whichever is smaller. A selection ORs the values within a facet,
+    ANDs the facets together and takes the matching rows in a single step.
+    """
+
+    def __init__(self, data: pd.DataFrame, columns: list):
+        """
+        Build the index.
+
+        :param data: DataFrame whose filter columns are categoricals.
+        :param columns: Names of the filter columns to index.
+        """
+        self.data = data
+        self.size = len(data)
+        self.bitmaps = {}
+        self.postings = {}
+        self.options = {}
+        for column in columns:
+            self._index_column(column)
+
+    def _index_column(self, column: str):
+        codes = self.data[column].cat.codes.values
+        categories = self.data[column].cat.categories
+        counts = np.bincount(codes[codes >= 0], minlength=len(categories))
+        order = np.argsort(codes, kind="stable")
+        # row positions of each code are contiguous in the stable sort, missing values (-1) come first
+        bounds = np.concatenate([[0], np.cumsum(counts)]) + np.count_nonzero(codes < 0)
+
+        bitmaps, postings = {}, {}
+        for code, value in enumerate(categories):
+            if counts[code] == 0:
+                continue
+            # 4 bytes per posting against one bit per row
+            if counts[code] * 32 > self.size:
+                bitmaps[value] = self._pack(codes == code)
+            else:
+                postings[value] = order[bounds[code]:bounds[code + 1]]
+        self.bitmaps[column] = bitmaps
+        self.postings[column] = postings
+        self.options[column] = list(categories[counts > 0])
+
+    def _pack(self, flags: np.ndarray):
+        # bitmaps are padded to whole 64-bit words so they can be scanned word by word
+        padded = np.zeros(-(-self.size // 64) * 64, dtype=bool)
+        padded[:len(flags)] = flags
+        return np.packbits(padded)
+
+    def _facet_mask(self, column: str, values: list):
+        mask = np.zeros(-(-self.size // 64) * 8, dtype=np.uint8)
+        positions = []
+        for value in values:
+            if value in self.bitmaps[column]:
+                mask |= self.bitmaps[column][value]
+            elif value in self.postings[column]:
+                positions.append(self.postings[column][value])
+        if positions:
+            positions = np.concatenate(positions)
+            if len(positions) * 64 > self.size:
+                flags = np.zeros(len(mask) * 8, dtype=bool)
+                flags[positions] = True
+                mask |= np.packbits(flags)
+            else:
+                np.bitwise_or.at(mask, positions >> 3, (0x80 >> (positions & 7)).astype(np.uint8))
+        return mask
+
+    def positions(self, selection: dict):
+        """
+        Row positions matching a filter selection.
+
+        :param selection: Mapping of column name to the list of selected values,
+                          columns with an empty list are not filtered.
+        :return: Sorted array of row positions, or None when nothing is selected.
+        """
+        mask = None
+        for column, values in selection.items():
+            if not values:
+                continue
+            facet_mask = self._facet_mask(column, values)
+            mask = facet_mask if mask is None else mask & facet_mask
+        if mask is None:
+            return None
+        # expand only the non-empty words of the bitmap instead of scanning one byte per row
+        words = np.flatnonzero(mask.view(np.uint64))
+        hits = np.flatnonzero(np.unpackbits(mask.reshape(-1, 8)[words], axis=1).view(bool))
+        return (words[hits >> 6] << 6) + (hits & 63)
+
+    def select(self, selection: dict):
+        """
+        Rows matching a filter selection.
+
+        :param selection: Mapping of column name to the list of selected values.
+        :return: DataFrame with the matching rows, the indexed DataFrame itself when nothing is selected.
+                 It may be shared and must not be modified.
+        """
+        positions = self.positions(selection)
+        if positions is None:
+            return self.data
+        return self.data.take(positions)
@@ -0,0 +1,51 @@
+import hashlib
+import json
+
+import pandas as pd
+import plotly.graph_objects as go
+
+from caching import LRUCache
+
+# serialized figures shared by all sessions, bounded by the total size of their JSON
+FIGURE_CACHE = LRUCache(maxsize=1024, maxbytes=64 * 1024 * 1024, sizeof=len)
+
+
+def content_hash(data: pd.DataFrame):
+    """
+    Hash of the content of a DataFrame: column names, dtypes, index and values.
+
+    :param data: DataFrame to hash.
+    :return: Hexadecimal digest.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr([(column, str(dtype)) for column, dtype in data.dtypes.items()]).encode())
+    digest.update(pd.util.hash_pandas_object(data, index=True).values.tobytes())
+    return digest.hexdigest()
+
+
+def cached_spec(builder, data: pd.DataFrame, **kwargs):
+    """
+    JSON of a figure, built only when the same builder was not called with the same data and arguments before.
+
+    :param builder: Chart builder from utils, called as builder(data=data, **kwargs).
+    :param data: Aggregated data of the chart.
+    :param kwargs: Other arguments of the builder.
+    :return: JSON string of the Plotly figure.
+    """
+    key = (builder.__name__, content_hash(data), repr(sorted(kwargs.items())))
+    spec = FIGURE_CACHE.get(key)
+    if spec is None:
+        spec = builder(data=data, **kwargs).to_json()
+        FIGURE_CACHE.put(key, spec)
+    return spec
+
+
+def figure_from_spec(spec: str):
+    """
+    Rebuild a figure from its JSON without validation: the JSON was produced by a validated figure.
+
+    :param spec: JSON string returned by cached_spec.
+    :return: Plotly Figure object.
+    """
+    return go.Figure(json.loads(spec), _validate=False)
+
@@ -0,0 +1,646 @@
+import argparse
+import csv
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from data_loader import parse_active_opportunities, parse_past_awards, recompile, fresh_store_manifest
+from sql_backend import build_database, DATABASE_PATH
+
+USASPENDING_URL = "https://api.usaspending.gov/api/v2/search/spending_by_award/"
+SAM_URL = "https://api.sam.gov/prod/opportunities/v1/search/"
+
+PAGE_SIZE = 100
+
+USASPENDING_PARAMS = {
+    "filters": {
+        "time_period": [{"start_date": "2019-01-01"}],
+        "award_type_codes": ["IDV_A", "IDV_B", "IDV_B_A", "IDV_B_B", "IDV_B_C"],
+    },
+    "fields": ["Award ID", "Awarding Agency", "Recipient Name",
+               "Contract Award Type", "Contract Status", "naics_description",
+               "AwardAmount_Binned", "generated_internal_id", "Award Amount",
+               "Description", "Start Date", "End Date", "Last Modified Date",
+               "Months Until Contract Ends", "PastAwards_URL",
+               "number_of_offers_received", "Contract Duration (Years)"],
+    "sort": "Recipient Name",
+    "order": "desc",
+}
+
+# SAM.gov opportunity fields and the column each one is written to in ActiveOpportunities.csv
+SAM_COLUMNS = {
+    "noticeId": "Notice_ID", "title": "Title", "solicitationNumber": "Solicitation_Number",
+    "postedDate": "Posted_Date", "responseDeadline": "Response_Deadline", "naicsCode": "NAICS_Code",
+    "description": "Description", "type": "Type", "setAsideType": "Set_Aside_Type",
+    "activeStatus": "Active_Status", "awardingAgency": "Awarding_Agency",
+    "awardingAgencyCode": "Awarding_Agency_Code", "classificationCode": "Classification_Code",
+    "pointOfContact": "Point_of_Contact", "archiveDate": "Archive_Date", "officeZipcode": "Office_Zipcode",
+    "officeCity": "Office_City", "officeCountryCode": "Office_Country_Code", "officeState": "Office_State",
+    "performanceCityCode": "Performance_City_Code", "performanceCityName": "Performance_City_Name",
+    "performanceStateName": "Performance_State_Name", "performanceZipcode": "Performance_Zipcode",
+    "daysToResponseDeadline": "Days_to_ResponseDeadline", "descriptionLink": "Description link",
+    "naics2022Code": "2022 NAICS Code", "naics2022Title": "2022 NAICS Title",
+    "descriptionText": "DescriptionText", "score": "Score", "scoreMapped": "Score_Mapped",
+    "shortDescription": "ShortDescription", "naicsCodeDesc": "NAICSCodeDesc",
+    "daysRemainingCode": "DaysRemainingCode",
+}
+
+# responses worth retrying: rate limited or a temporary server failure
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class RateLimiter:
+    """
+    Thread-safe limiter spacing calls evenly to at most a given number per second.
+    """
+
+    def __init__(self, rate: float):
+        """
+        :param rate: Maximum number of calls per second, None or 0 for no limit.
+        """
+        self.interval = 1 / rate if rate else 0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Block until the next call is allowed.
+        """
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(self._next, now)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class HttpClient:
+    """
+    HTTP client shared by the fetch threads: one keep-alive session per thread,
+    a common rate limit and retries with exponential backoff.
+    """
+
+    def __init__(self, rate: float = 5, retries: int = 5, backoff: float = 1, timeout: float = 60,
+                 pool_size: int = 10):
+        """
+        :param rate: Maximum number of requests per second over all threads.
+        :param retries: Number of retries of a failed request.
+        :param backoff: Delay in seconds before the first retry, doubled on each retry.
+        :param timeout: Timeout of a request in seconds.
+        :param pool_size: Number of connections kept open per host.
+        """
+        self.limiter = RateLimiter(rate)
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self._local = threading.local()
+
+    def session(self):
+        """
+        :return: The requests Session of the calling thread.
+        """
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            self._local.session = session
+        return session
+
+    def request_json(self, method: str, url: str, **kwargs):
+        """
+        Send a request and decode its JSON response, retrying connection errors,
+        timeouts and the statuses in RETRY_STATUSES.
+
+        :param method: HTTP method.
+        :param url: URL of the endpoint.
+        :param kwargs: Other arguments of requests.Session.request.
+        :return: Decoded JSON body.
+        """
+        for attempt in range(self.retries + 1):
+            self.limiter.acquire()
+            delay = self.backoff * 2 ** attempt
+            try:
+                response = self.session().request(method, url, timeout=self.timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.retries:
+                    raise
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt == self.retries:
+                    response.raise_for_status()
+                    return response.json()
+                retry_after = response.headers.get("Retry-After", "")
+                if retry_after.isdigit():
+                    delay = max(delay, int(retry_after))
+            time.sleep(delay)
+
+
+class UsaSpendingSource:
+    """
+    Past awards pages of the USAspending spending_by_award search.
+    """
+
+    name = "past_awards"
+
+    def __init__(self, client: HttpClient, url: str = USASPENDING_URL, params: dict = None,
+                 page_size: int = PAGE_SIZE):
+        """
+        :param client: HTTP client.
+        :param url: URL of the search endpoint.
+        :param params: Search body without the page and limit.
+        :param page_size: Number of awards per page.
+        """
+        self.client = client
+        self.url = url
+        self.params = USASPENDING_PARAMS if params is None else params
+        self.page_size = page_size
+        self.columns = list(self.params["fields"])
+
+    def fetch(self, page: int):
+        """
+        :param page: Page number, starting at 0.
+        :return: List of awards of the page.
+        """
+        body = dict(self.params, page=page + 1, limit=self.page_size)
+        return self.client.request_json("POST", self.url, json=body)["results"]
+
+    def row(self, record: dict):
+        """
+        :param record: Award returned by the API.
+        :return: Row of the CSV file.
+        """
+        return record
+
+
+class SamSource:
+    """
+    Active opportunities pages of the SAM.gov opportunities search.
+    """
+
+    name = "active_opportunities"
+
+    def __init__(self, client: HttpClient, api_key: str, url: str = SAM_URL, params: dict = None,
+                 page_size: int = PAGE_SIZE):
+        """
+        :param client: HTTP client.
+        :param api_key: SAM.gov API key.
+        :param url: URL of the search endpoint.
+        :param params: Other query parameters of the search.
+        :param page_size: Number of opportunities per page.
+        """
+        self.client = client
+        self.api_key = api_key
+        self.url = url
+        self.params = {} if params is None else params
+        self.page_size = page_size
+        self.columns = list(SAM_COLUMNS.values())
+
+    def fetch(self, page: int):
+        """
+        :param page: Page number, starting at 0.
+        :return: List of opportunities of the page.
+        """
+        query = dict(self.params, api_key=self.api_key, limit=self.page_size, start=page * self.page_size)
+        return self.client.request_json("GET", self.url, params=query)["opportunities"]
+
+    def row(self, record: dict):
+        """
+        :param record: Opportunity returned by the API.
+        :return: Row of the CSV file.
+        """
+        return {column: record.get(field) for field, column in SAM_COLUMNS.items()}
+
+
+class Checkpoint:
+    """
+    Progress of an ingestion run saved as JSON next to the output file:
+    the next page to fetch, the number of rows written and the size of the partial file at that point.
+    """
+
+    def __init__(self, path: str, fingerprint: str):
+        """
+        :param path: Path of the checkpoint file.
+        :param fingerprint: Identifies the query, a checkpoint of another query is not resumed.
+        """
+        self.path = path
+        self.fingerprint = fingerprint
+
+    def load(self):
+        """
+        :return: Saved progress of the same query, or None.
+        """
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path) as file:
+            state = json.load(file)
+        return state if state.get("fingerprint") == self.fingerprint else None
+
+    def save(self, next_page: int, rows: int, offset: int):
+        """
+        Atomically replace the saved progress.
+
+        :param next_page: First page not written yet.
+        :param rows: Number of rows written.
+        :param offset: Size in bytes of the partial file.
+        """
+        temporary = self.path + ".tmp"
+        with open(temporary, "w") as file:
+            json.dump({"fingerprint": self.fingerprint, "next_page": next_page, "rows": rows, "offset": offset},
+                      file)
+        os.replace(temporary, self.path)
+
+    def remove(self):
+        """
+        Delete the checkpoint once the run is complete.
+        """
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class CsvChunkWriter:
+    """
+    Appends rows to a CSV file in chunks, writing the header on the first chunk.
+    """
+
+    def __init__(self, path: str, columns: list, offset: int = 0):
+        """
+        :param path: Path of the CSV file.
+        :param columns: Column names, in order.
+        :param offset: Size of the valid part of an existing file; anything after it is discarded.
+        """
+        self.path = path
+        self.columns = columns
+        self.buffer = []
+        mode = "r+" if offset else "w"
+        self._file = open(path, mode, newline="", encoding="utf-8")
+        self._file.seek(offset)
+        self._file.truncate()
+        self._writer = csv.DictWriter(self._file, fieldnames=columns, extrasaction="ignore")
+        if not offset:
+            self._writer.writeheader()
+
+    def write(self, rows: list):
+        """
+        Buffer rows until the next flush.
+
+        :param rows: List of row dictionaries.
+        """
+        self.buffer.extend(rows)
+
+    def flush(self):
+        """
+        Write the buffered rows to disk.
+
+        :return: Size of the file in bytes.
+        """
+        self._writer.writerows(self.buffer)
+        self.buffer = []
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        return self._file.tell()
+
+    def close(self):
+        self._file.close()
+
+
+def query_fingerprint(source):
+    """
+    :param source: Page source.
+    :return: Hash of the source name, URL, parameters and page size.
+    """
+    query = json.dumps([source.name, source.url, source.params, source.page_size], sort_keys=True)
+    return hashlib.sha1(query.encode()).hexdigest()
+
+
+def ingest(source, path: str, workers: int = 4, chunk_rows: int = 5000, resume: bool = True):
+    """
+    Download every page of a source into a CSV file.
+
+    Pages are fetched concurrently, a few pages ahead of the last one written, and written in order.
+    Rows are appended to `<path>.partial` in chunks, each followed by a checkpoint, so an interrupted
+    run resumes from the last written chunk. The complete file is moved to the path at the end.
+    The last page is the first one holding fewer rows than the page size.
+
+    :param source: Page source, e.g. UsaSpendingSource or SamSource.
+    :param path: Path of the CSV file to write.
+    :param workers: Number of concurrent requests.
+    :param chunk_rows: Number of rows written between checkpoints.
+    :param resume: Continue an interrupted run of the same query instead of starting over.
+    :return: Number of rows written.
+    """
+    partial = path + ".partial"
+    checkpoint = Checkpoint(path + ".checkpoint.json", query_fingerprint(source))
+    state = checkpoint.load() if resume and os.path.exists(partial) else None
+    page = state["next_page"] if state else 0
+    rows = state["rows"] if state else 0
+    writer = CsvChunkWriter(partial, source.columns, offset=state["offset"] if state else 0)
+    if not state:
+        checkpoint.save(page, rows, writer.flush())
+
+    pending = {}
+    next_submit = page
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            while True:
+                # keep every worker busy with the pages following the next one to write
+                while next_submit < page + workers:
+                    pending[next_submit] = pool.submit(source.fetch, next_submit)
+                    next_submit += 1
+                records = pending.pop(page).result()
+                writer.write([source.row(record) for record in records])
+                rows += len(records)
+                page += 1
+                last = len(records) < source.page_size
+                if last or len(writer.buffer) >= chunk_rows:
+                    checkpoint.save(page, rows, writer.flush())
+                if last:
+                    break
+    finally:
+        for future in pending.values():
+            future.cancel()
+        writer.close()
+
+    os.replace(partial, path)
+    checkpoint.remove()
+    return rows
+
+
+def ingest_past_awards(path: str = "./data/PastAwards.csv", workers: int = 4, rate: float = 5,
+                       resume: bool = True):
+    """
+    Download the past awards from USAspending.
+
+    :param path: Path of the CSV file to write.
+    :param workers: Number of concurrent requests.
+    :param rate: Maximum number of requests per second.
+    :param resume: Continue an interrupted run.
+    :return: Number of awards written.
+    """
+    client = HttpClient(rate=rate, pool_size=workers)
+    return ingest(UsaSpendingSource(client), path, workers=workers, resume=resume)
+
+
+def ingest_active_opportunities(api_key: str, path: str = "./data/ActiveOpportunities.csv", workers: int = 4,
+                                rate: float = 5, resume: bool = True):
+    """
+    Download the active opportunities from SAM.gov.
+
+    :param api_key: SAM.gov API key.
+    :param path: Path of the CSV file to write.
+    :param workers: Number of concurrent requests.
+    :param rate: Maximum number of requests per second.
+    :param resume: Continue an interrupted run.
+    :return: Number of opportunities written.
+    """
+    client = HttpClient(rate=rate, pool_size=workers)
+    return ingest(SamSource(client, api_key), path, workers=workers, resume=resume)
+
+
+class Watermark:
+    """
+    Date up to which a dataset has been refreshed, saved as JSON next to the dataset.
+    """
+
+    def __init__(self, path: str):
+        """
+        :param path: Path of the dataset.
+        """
+        self.path = path + ".watermark.json"
+
+    def load(self):
+        """
+        :return: ISO date of the last refresh, or None.
+        """
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path) as file:
+            return json.load(file)["watermark"]
+
+    def save(self, watermark: str):
+        """
+        :param watermark: ISO date the dataset is refreshed up to.
+        """
+        temporary = self.path + ".tmp"
+        with open(temporary, "w") as file:
+            json.dump({"watermark": watermark}, file)
+        os.replace(temporary, self.path)
+
+
+def read_csv_rows(path: str):
+    """
+    Read a CSV file as text, keeping every value and duplicated column names as they are.
+
+    :param path: Path of the CSV file.
+    :return: Tuple of the header and the list of rows.
+    """
+    with open(path, newline="", encoding="utf-8") as file:
+        reader = csv.reader(file)
+        header = next(reader, [])
+        return header, list(reader)
+
+
+def latest_date(path: str, column: str):
+    """
+    Most recent date of a column of a stored dataset, used as the watermark of its first refresh.
+
+    :param path: Path of the CSV file.
+    :param column: Name of the ISO date column.
+    :return: ISO date, or None when the file or the column is missing or empty.
+    """
+    if not os.path.exists(path):
+        return None
+    header, rows = read_csv_rows(path)
+    if column not in header:
+        return None
+    position = header.index(column)
+    return max((row[position][:10] for row in rows if row[position]), default=None)
+
+
+def upsert_csv(path: str, delta_path: str, key: str, expired=None, changes: dict = None):
+    """
+    Merge downloaded rows into a stored CSV file, matching rows on a key column.
+
+    Columns of the delta replace the same columns of the stored row, the other columns are kept.
+    Rows with a new key are appended. The file is only rewritten when its content changes,
+    so the caches and snapshot keyed on its modification time stay valid otherwise.
+
+    :param path: Path of the stored CSV file, created if missing.
+    :param delta_path: Path of the CSV file of downloaded rows.
+    :param key: Name of the key column, present in both files.
+    :param expired: Function telling from the header and a row whether the row is dropped, or None.
+    :param changes: Dictionary filled with the header of the file, the 'removed' rows as they were stored,
+                    updated or dropped, and the 'added' rows as they are now stored, updated or inserted,
+                    in file order. None to only count them.
+    :return: Dictionary with the number of inserted, updated and expired rows.
+    """
+    delta_header, delta_rows = read_csv_rows(delta_path)
+    header, rows = read_csv_rows(path) if os.path.exists(path) else (delta_header, [])
+    positions = [(header.index(column), index) for index, column in enumerate(delta_header) if column in header]
+    key_position, delta_key_position = header.index(key), delta_header.index(key)
+    row_of_key = {row[key_position]: index for index, row in enumerate(rows)}
+    # stored row of every changed key before the refresh, None for inserted keys
+    previous = {}
+
+    stats = {"inserted": 0, "updated": 0, "expired": 0}
+    for delta_row in delta_rows:
+        index = row_of_key.get(delta_row[delta_key_position])
+        row = [""] * len(header) if index is None else rows[index]
+        updated = list(row)
+        for position, delta_position in positions:
+            updated[position] = delta_row[delta_position]
+        if index is None:
+            row_of_key[delta_row[delta_key_position]] = len(rows)
+            rows.append(updated)
+            previous[delta_row[delta_key_position]] = None
+            stats["inserted"] += 1
+        elif updated != row:
+            rows[index] = updated
+            previous.setdefault(delta_row[delta_key_position], row)
+            stats["updated"] += 1
+    if expired is not None:
+        kept = []
+        for row in rows:
+            if not expired(header, row):
+                kept.append(row)
+            elif row[key_position] not in previous:
+                previous[row[key_position]] = row
+        stats["expired"] = len(rows) - len(kept)
+        rows = kept
+
+    if changes is not None:
+        changes["header"] = header
+        changes["removed"] = [row for row in previous.values() if row is not None]
+        changes["added"] = [row for row in rows if row[key_position] in previous]
+    if any(stats.values()):
+        temporary = path + ".tmp"
+        with open(temporary, "w", newline="", encoding="utf-8") as file:
+            writer = csv.writer(file)
+            writer.writerow(header)
+            writer.writerows(rows)
+        os.replace(temporary, path)
+    return stats
+
+
+def deadline_passed(today: str):
+    """
+    :param today: ISO date of the refresh.
+    :return: Function telling whether the response deadline of an opportunity row is before the date.
+    """
+    def expired(header: list, row: list):
+        deadline = row[header.index("Response_Deadline")][:10]
+        return bool(deadline) and deadline < today
+    return expired
+
+
+def refresh(source, path: str, key: str, today: str, expired=None, parser=None, workers: int = 4):
+    """
+    Download the rows changed since a date and upsert them into a stored dataset.
+
+    The delta is downloaded with ingest, so an interrupted refresh resumes too.
+    When the dataset changed, its compiled snapshot and store, and the SQL database if there is one,
+    are compiled again; a store that was fresh only has the partitions of the changed rows rewritten.
+    Unchanged datasets keep their file, snapshot, store and cached frames.
+
+    :param source: Page source restricted to the changed rows.
+    :param path: Path of the stored CSV file.
+    :param key: Name of the key column.
+    :param today: ISO date of this refresh, saved as the new watermark.
+    :param expired: Function telling whether a row is dropped, see upsert_csv.
+    :param parser: Parser of the dataset, used to compile its snapshot and store.
+    :param workers: Number of concurrent requests.
+    :return: Dictionary with the number of inserted, updated and expired rows.
+    """
+    delta_path = path + ".delta.csv"
+    ingest(source, delta_path, workers=workers)
+    # the partitions of a store are only updated from the rows it was compiled from
+    partitioned = parser is not None and fresh_store_manifest(path) is not None
+    changes = {}
+    stats = upsert_csv(path, delta_path, key, expired, changes)
+    os.remove(delta_path)
+    if any(stats.values()) and parser is not None:
+        recompile(path, parser, key, changes if partitioned else None)
+    if any(stats.values()) and os.path.exists(DATABASE_PATH):
+        build_database()
+    Watermark(path).save(today)
+    return stats
+
+
+def refresh_past_awards(path: str = "./data/PastAwards.csv", workers: int = 4, rate: float = 5):
+    """
+    Download the awards modified since the last refresh and upsert them on generated_internal_id.
+
+    :param path: Path of the stored CSV file.
+    :param workers: Number of concurrent requests.
+    :param rate: Maximum number of requests per second.
+    :return: Dictionary with the number of inserted and updated awards.
+    """
+    today = date.today().isoformat()
+    since = Watermark(path).load() or latest_date(path, "Last Modified Date") or "2019-01-01"
+    filters = dict(USASPENDING_PARAMS["filters"],
+                   time_period=[{"start_date": since, "end_date": today, "date_type": "last_modified_date"}])
+    source = UsaSpendingSource(HttpClient(rate=rate, pool_size=workers), params=dict(USASPENDING_PARAMS,
+                                                                                     filters=filters))
+    return refresh(source, path, "generated_internal_id", today, parser=parse_past_awards,
+                   workers=workers)
+
+
+def refresh_active_opportunities(api_key: str, path: str = "./data/ActiveOpportunities.csv", workers: int = 4,
+                                 rate: float = 5):
+    """
+    Download the opportunities posted since the last refresh, upsert them on Notice_ID
+    and drop the opportunities whose response deadline has passed.
+
+    :param api_key: SAM.gov API key.
+    :param path: Path of the stored CSV file.
+    :param workers: Number of concurrent requests.
+    :param rate: Maximum number of requests per second.
+    :return: Dictionary with the number of inserted, updated and expired opportunities.
+    """
+    today = date.today().isoformat()
+    since = Watermark(path).load() or latest_date(path, "Posted_Date") or today
+    # the search filters on the posting date only, with dates written as MM/dd/yyyy
+    params = {"postedFrom": date.fromisoformat(since).strftime("%m/%d/%Y"),
+              "postedTo": date.fromisoformat(today).strftime("%m/%d/%Y")}
+    source = SamSource(HttpClient(rate=rate, pool_size=workers), api_key, params=params)
+    return refresh(source, path, "Notice_ID", today, expired=deadline_passed(today),
+                   parser=parse_active_opportunities, workers=workers)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Download the F.O.A.M datasets")
+    parser.add_argument("dataset", choices=["past-awards", "active-opportunities"])
+    parser.add_argument("--output", help="path of the CSV file, defaults to the file read by the dashboard")
+    parser.add_argument("--workers", type=int, default=4, help="number of concurrent requests")
+    parser.add_argument("--rate", type=float, default=5, help="maximum number of requests per second")
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint of an interrupted run")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only download the rows changed since the last refresh and merge them in")
+    args = parser.parse_args()
+
+    options = dict(workers=args.workers, rate=args.rate)
+    if args.output:
+        options["path"] = args.output
+    if args.incremental:
+        if args.dataset == "past-awards":
+            stats = refresh_past_awards(**options)
+        else:
+            stats = refresh_active_opportunities(os.environ["SAM_API_KEY"], **options)
+        print(", ".join(f"{count} {change}" for change, count in stats.items()))
+    else:
+        options["resume"] = not args.restart
+        if args.dataset == "past-awards":
+            count = ingest_past_awards(**options)
+        else:
+            count = ingest_active_opportunities(os.environ["SAM_API_KEY"], **options)
+        print(f"{count} rows downloaded")
@@ -0,0 +1,310 @@
+from aggregations import cached_aggregates, current_opportunities_aggregates, current_opportunities_cube_aggregates, \
+    competitor_aggregates, competitor_cube_aggregates, forecast_aggregates, forecast_cube_aggregates
+from data_loader import load_active_opportunities, load_past_awards_options, load_filtered_past_awards, \
+    load_active_opportunities_facets, load_past_awards_facets, load_active_opportunities_cube, \
+    load_past_awards_cube, load_active_opportunities_search, file_signature, data_version, \
+    ACTIVE_OPPORTUNITIES_PATH, PAST_AWARDS_PATH, STREAMING_LOAD
+from profiling import PROFILER
+from sql_backend import load_backend, SQL_BACKEND, DATABASE_PATH
+from utils import current_opportunities_kpis, paginate, bar_scatter_chart, bar_chart, scatter_plot, pie_chart, \
+    table_chart, binned_scatter_plot, binned_bar_chart, opportunities_table, awards_table, forecast_table
+
+HOME_PAGE = "Home Page"
+CURRENT_OPPORTUNITIES = "Current Opportunities"
+COMPETITOR_INFO = "Competitor Info"
+FORECAST_RECOMPETES = "Forecast Recompetes"
+
+# filter columns of the sidebar of every page, the keys of its selection
+FILTERS = {
+    CURRENT_OPPORTUNITIES: ["Awarding_Agency", "Type", "Score", "Set_Aside_Type", "DaysRemainingCode"],
+    COMPETITOR_INFO: ["Awarding Agency", "Recipient Name", "Contract Award Type", "Contract Status",
+                      "AwardAmount_Binned"],
+    FORECAST_RECOMPETES: ["Awarding Agency", "Recipient Name", "Contract Status", "Months Until Contract Ends"],
+}
+
+# names of the KPIs of every page, in the order of its KPIs tuple
+KPIS = {
+    HOME_PAGE: ["total_opportunities", "days_to_respond", "count_positive_ecs", "count_green"],
+    CURRENT_OPPORTUNITIES: ["total_opportunities", "days_to_respond", "count_positive_ecs", "count_green"],
+    COMPETITOR_INFO: ["total_past_awards", "six_million_above", "award_amount"],
+    FORECAST_RECOMPETES: ["contracts_count", "average_offers_per_contract", "contracts_value"],
+}
+
+# table of every page: builder from utils and the columns shown
+TABLES = {
+    CURRENT_OPPORTUNITIES: (opportunities_table,
+                            ["Awarding_Agency", "Title", "Type", "Posted_Date", "Days_to_ResponseDeadline",
+                             "Description link", "NAICSCodeDesc", "Set_Aside_Type", "Score"]),
+    COMPETITOR_INFO: (awards_table,
+                      ["Award ID", "Awarding Agency", "Recipient Name", "AwardAmount_Binned", "Award Amount",
+                       "Start Date", "End Date", "Last Modified Date", "Months Until Contract Ends",
+                       "PastAwards_URL"]),
+    FORECAST_RECOMPETES: (forecast_table,
+                          ["Award ID", "Awarding Agency", "Recipient Name", "naics_description", "Award Amount",
+                           "Start Date", "End Date", "Last Modified Date", "Months Until Contract Ends",
+                           "PastAwards_URL"]),
+}
+# columns read for the table rows besides the shown ones: the row color and the key of the description
+TABLE_EXTRA_COLUMNS = {
+    CURRENT_OPPORTUNITIES: ["DaysRemainingColor", "Notice_ID"],
+    COMPETITOR_INFO: [],
+    FORECAST_RECOMPETES: [],
+}
+
+# charts of every page, in order: name of the aggregated frame, builder from utils and its other arguments
+CHARTS = {
+    CURRENT_OPPORTUNITIES: [
+        ("opp_by_type", bar_scatter_chart,
+         dict(bar_X="Type", bar_Y="Notice_ID", bar_name="Number of Opportunities", scatter_X="Type",
+              scatter_Y="Days_to_ResponseDeadline", scatter_name="Avg. Days to Respond to Deadline",
+              title="OPPORTUNITY BY TYPE")),
+        ("opp_by_agency", bar_chart,
+         dict(y="Awarding_Agency", x="Notice_ID", orient="h", title="OPPORTUNITY BY AWARDING AGENCIES",
+              text="Notice_ID", pre_hover_text="Number of Opportunities")),
+        ("opp_by_posted_date", scatter_plot,
+         dict(x="Posted_Date", y="Notice_ID", title="OPPORTUNITY POSTED BY MONTH", name="Opportunity Count",
+              text="Notice_ID")),
+        ("avg_days_to_response_NAICS", bar_chart,
+         dict(y="NAICSCodeDesc", x="Days_to_ResponseDeadline", orient="h",
+              title="AVG. DAYS TO RESPONSE TO DEADLINE BY NAICS", text="Days_to_ResponseDeadline",
+              pre_hover_text="Avg. Days to Response")),
+    ],
+    COMPETITOR_INFO: [
+        ("awards_by_recipient", pie_chart,
+         dict(values="Number of Awards", names="Recipient Name", title="NUMBER OF PAST AWARDS BY RECIPIENTS",
+              text_info="percent+value")),
+        ("awards_amount_by_recipient", pie_chart,
+         dict(values="Award Amount", names="Recipient Name", title="PAST AWARDS AMOUNT BY RECIPIENTS",
+              text_info="percent")),
+        ("award_amount_df", table_chart, dict(title="PAST AWARDS AMOUNT BY AWARDING AGENCY")),
+        ("award_amount_by_recp_naics_df", table_chart, dict(title="PAST AWARDS AMOUNT BY NAICS AND RECIPIENT")),
+    ],
+    FORECAST_RECOMPETES: [
+        ("award_amount_by_months", binned_scatter_plot,
+         dict(x="Months Until Contract Ends", y="Award Amount", color="Recipient Name",
+              title="AWARD AMOUNT BY MONTHS UNTIL CONTRACT ENDS")),
+        ("award_amount_by_duration", binned_bar_chart,
+         dict(x="Contract Duration (Years)", y="Award Amount", color="Recipient Name",
+              title="AWARD AMOUNT BY CONTRACT DURATION (Years)")),
+    ],
+}
+
+
+class Datasets:
+    """
+    What the pages are computed from: the SQL backend, or the frames held in memory with their
+    facet indexes, rollup cubes and search index. Past awards are only indexed when they are not streamed.
+    """
+
+    def __init__(self, backend=None, active_opportunities=None, opportunity_facets=None, opportunity_cube=None,
+                 opportunity_search=None, award_facets=None, award_cube=None, opportunity_options=None,
+                 award_options=None):
+        self.backend = backend
+        self.active_opportunities = active_opportunities
+        self.opportunity_facets = opportunity_facets
+        self.opportunity_cube = opportunity_cube
+        self.opportunity_search = opportunity_search
+        self.award_facets = award_facets
+        self.award_cube = award_cube
+        # mapping of filter column to its values, the options of the sidebar
+        self.opportunity_options = opportunity_options
+        self.award_options = award_options
+
+
+def datasets_version():
+    """
+    Version of the data the pages are computed from, without loading it.
+
+    :return: Hashable version, changing whenever a dataset is refreshed.
+    """
+    if SQL_BACKEND:
+        return file_signature(DATABASE_PATH)
+    return data_version(ACTIVE_OPPORTUNITIES_PATH), data_version(PAST_AWARDS_PATH)
+
+
+def load_datasets():
+    """
+    Datasets of the current data version, each loaded once and shared by every session.
+
+    :return: Datasets instance.
+    """
+    if SQL_BACKEND:
+        backend = load_backend()
+        return Datasets(backend=backend, opportunity_options=backend.options["active_opportunities"],
+                        award_options=backend.options["past_awards"])
+    opportunity_facets = load_active_opportunities_facets()
+    datasets = Datasets(active_opportunities=load_active_opportunities(), opportunity_facets=opportunity_facets,
+                        opportunity_cube=load_active_opportunities_cube(),
+                        opportunity_search=load_active_opportunities_search(),
+                        opportunity_options=opportunity_facets.options)
+    if STREAMING_LOAD:
+        datasets.award_options = load_past_awards_options()
+    else:
+        datasets.award_facets = load_past_awards_facets()
+        datasets.award_options = datasets.award_facets.options
+        datasets.award_cube = load_past_awards_cube()
+    return datasets
+
+
+class PageModel:
+    """
+    Everything a page shows for a filter selection but the table page: KPIs, aggregated chart data
+    and the selected rows the table pages are sliced from. Its DataFrames are shared and must not be modified.
+    """
+
+    def __init__(self, page: str, selection: dict, row_count: int, kpis: tuple, charts: dict = None,
+                 rows=None, table: str = None, query: str = ""):
+        """
+        :param page: Name of the page.
+        :param selection: Mapping of column name to the list of selected values.
+        :param row_count: Number of selected rows.
+        :param kpis: Tuple of the KPIs of the page.
+        :param charts: Mapping of chart data name to aggregated DataFrame, as named in CHARTS.
+        :param rows: Selected rows, None with the SQL backend.
+        :param table: Table of the SQL backend the rows come from.
+        :param query: Keyword search of the rows, empty for none.
+        """
+        self.page = page
+        self.selection = selection
+        self.row_count = row_count
+        self.kpis = kpis
+        self.charts = charts or {}
+        self.rows = rows
+        self.table = table
+        self.query = query
+
+
+def _model(page: str, selection: dict, row_count: int, aggregates: dict, rows, table: str, query: str = ""):
+    charts = {name: data for name, data in aggregates.items() if name != "kpis"}
+    return PageModel(page, selection, row_count, aggregates["kpis"], charts, rows, table, query)
+
+
+def _select_past_awards(datasets: Datasets, selection: dict):
+    # streamed from disk when the past awards are not held in memory
+    if datasets.award_facets is None:
+        return load_filtered_past_awards(selection)
+    return datasets.award_facets.select(selection)
+
+
+def home_page(datasets: Datasets):
+    """
+    :param datasets: Datasets of the pages.
+    :return: PageModel of the Home Page, KPIs of every active opportunity.
+    """
+    if datasets.backend is not None:
+        kpis = datasets.backend.current_opportunities_kpis({})
+    else:
+        kpis = current_opportunities_kpis(datasets.active_opportunities)
+    # the first KPI is the number of opportunities
+    return PageModel(HOME_PAGE, {}, kpis[0], kpis)
+
+
+def current_opportunities_page(datasets: Datasets, selection: dict, query: str = ""):
+    """
+    :param datasets: Datasets of the pages.
+    :param selection: Mapping of column name to the list of selected values.
+    :param query: Keyword search, the matching opportunities being listed best match first. Ignored by the
+                  SQL backend.
+    :return: PageModel of the Current Opportunities page.
+    """
+    backend = datasets.backend
+    query = "" if backend is not None else query
+    with PROFILER.stage("filter"):
+        if backend is not None:
+            rows = None
+            row_count = backend.row_count("active_opportunities", selection)
+        elif query:
+            # best matches first, within the rows of the filters
+            positions, _ = datasets.opportunity_search.search(query,
+                                                              datasets.opportunity_facets.positions(selection))
+            rows = datasets.active_opportunities.take(positions)
+            row_count = len(rows)
+        else:
+            rows = datasets.opportunity_facets.select(selection)
+            row_count = len(rows)
+    with PROFILER.stage("aggregate"):
+        if backend is not None:
+            aggregates = cached_aggregates(backend.version, CURRENT_OPPORTUNITIES, selection,
+                                           lambda: backend.current_opportunities_aggregates(selection))
+        elif query:
+            aggregates = cached_aggregates(data_version(ACTIVE_OPPORTUNITIES_PATH),
+                                           f"{CURRENT_OPPORTUNITIES} / {query.lower()}", selection,
+                                           lambda: current_opportunities_aggregates(rows))
+        else:
+            aggregates = cached_aggregates(data_version(ACTIVE_OPPORTUNITIES_PATH), CURRENT_OPPORTUNITIES,
+                                           selection,
+                                           lambda: current_opportunities_cube_aggregates(datasets.opportunity_cube,
+                                                                                         selection, lambda: rows))
+    return _model(CURRENT_OPPORTUNITIES, selection, row_count, aggregates, rows, "active_opportunities", query)
+
+
+def _past_awards_page(datasets: Datasets, page: str, selection: dict, backend_aggregates, row_aggregates,
+                      cube_aggregates):
+    backend = datasets.backend
+    with PROFILER.stage("filter"):
+        if backend is not None:
+            rows = None
+            row_count = backend.row_count("past_awards", selection)
+        else:
+            rows = _select_past_awards(datasets, selection)
+            row_count = len(rows)
+    with PROFILER.stage("aggregate"):
+        if backend is not None:
+            aggregates = cached_aggregates(backend.version, page, selection, lambda: backend_aggregates(selection))
+        elif datasets.award_cube is not None:
+            aggregates = cached_aggregates(data_version(PAST_AWARDS_PATH), page, selection,
+                                           lambda: cube_aggregates(datasets.award_cube, selection, lambda: rows))
+        else:
+            # the streamed rows come straight from the CSV file
+            aggregates = cached_aggregates(file_signature(PAST_AWARDS_PATH), page, selection,
+                                           lambda: row_aggregates(rows))
+    return _model(page, selection, row_count, aggregates, rows, "past_awards")
+
+
+def competitor_page(datasets: Datasets, selection: dict):
+    """
+    :param datasets: Datasets of the pages.
+    :param selection: Mapping of column name to the list of selected values.
+    :return: PageModel of the Competitor Info page.
+    """
+    backend_aggregates = datasets.backend.competitor_aggregates if datasets.backend is not None else None
+    return _past_awards_page(datasets, COMPETITOR_INFO, selection, backend_aggregates, competitor_aggregates,
+                             competitor_cube_aggregates)
+
+
+def forecast_page(datasets: Datasets, selection: dict):
+    """
+    :param datasets: Datasets of the pages.
+    :param selection: Mapping of column name to the list of selected values.
+    :return: PageModel of the Forecast Recompetes page.
+    """
+    backend_aggregates = datasets.backend.forecast_aggregates if datasets.backend is not None else None
+    return _past_awards_page(datasets, FORECAST_RECOMPETES, selection, backend_aggregates, forecast_aggregates,
+                             forecast_cube_aggregates)
+
+
+def table_rows(datasets: Datasets, model: PageModel, page: int = 0, page_size: int = None, sort_by: str = None,
+               ascending: bool = True):
+    """
+    One page of the table of a page model, queried from the SQL backend when it is used.
+
+    :param datasets: Datasets of the pages.
+    :param model: PageModel of the page.
+    :param page: Zero-based number of the page.
+    :param page_size: Number of rows per page, None for all rows.
+    :param sort_by: Column to sort the rows by, None to keep the current order.
+    :param ascending: Sort direction.
+    :return: DataFrame of the rows of the page, with at least the table columns and the extra ones.
+    """
+    columns = TABLES[model.page][1] + TABLE_EXTRA_COLUMNS[model.page]
+    if datasets.backend is not None:
+        return datasets.backend.page(model.table, model.selection, columns, page, page_size, sort_by, ascending)
+    return paginate(model.rows, page, page_size, sort_by, ascending)
+
+
+# page model function of every page with filters
+PAGES = {
+    CURRENT_OPPORTUNITIES: current_opportunities_page,
+    COMPETITOR_INFO: competitor_page,
+    FORECAST_RECOMPETES: forecast_page,
+}
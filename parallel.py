@@ -0,0 +1,74 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from profiling import PROFILER
+
+# threads running the independent aggregations and figures of a page together, 0 to run them one after the other
+PARALLEL_WORKERS = int(os.environ.get("FOAM_PARALLEL_WORKERS", "0"))
+
+# processes grouping the rows of large filtered frames, 0 for none; the rows are copied to them,
+# so they only pay off when grouping takes longer than sending the columns
+PARALLEL_PROCESSES = int(os.environ.get("FOAM_PARALLEL_PROCESSES", "0"))
+
+# filtered rows from which the row aggregations go to the processes
+PROCESS_MIN_ROWS = int(os.environ.get("FOAM_PROCESS_MIN_ROWS", "500000"))
+
+_pools = {}
+_pools_lock = threading.Lock()
+_local = threading.local()
+
+
+def _mark_worker():
+    _local.worker = True
+
+
+def _pool(kind: str):
+    with _pools_lock:
+        if kind not in _pools:
+            if kind == "process":
+                # spawned, forking the threads of the streamlit server could copy held locks
+                _pools[kind] = ProcessPoolExecutor(max_workers=PARALLEL_PROCESSES,
+                                                   mp_context=multiprocessing.get_context("spawn"))
+            else:
+                _pools[kind] = ThreadPoolExecutor(max_workers=PARALLEL_WORKERS, thread_name_prefix="foam-task",
+                                                  initializer=_mark_worker)
+        return _pools[kind]
+
+
+def _attached(context, task):
+    # stages timed by the task belong to the rerun that submitted it
+    with PROFILER.attach(context):
+        return task()
+
+
+def uses_processes(rows: int):
+    """
+    :param rows: Number of rows read by the tasks, 0 for tasks not reading rows.
+    :return: Whether run_tasks sends tasks reading that many rows to the process pool.
+    """
+    return PARALLEL_PROCESSES > 0 and rows > 0 and rows >= PROCESS_MIN_ROWS
+
+
+def run_tasks(tasks: dict, rows: int = 0):
+    """
+    Run independent tasks, on the thread pool when workers are configured, or on the process pool when they read
+    many rows. Tasks run one after the other without workers, and when called from a worker thread, so that a task
+    never waits on the pool it runs on. The stages profiled by tasks on the thread pool are recorded in the rerun
+    of the caller; those of the processes are not.
+
+    :param tasks: Mapping of name to callable without arguments; tasks sent to processes must be picklable,
+                  e.g. a functools.partial of a module-level function.
+    :param rows: Number of rows read by the tasks, 0 for tasks not reading rows, which always stay in this process.
+    :return: Dictionary of the results, in the order of the tasks whichever finished first.
+             The error of the first failed task, in that order, is raised.
+    """
+    if uses_processes(rows):
+        futures = {name: _pool("process").submit(task) for name, task in tasks.items()}
+    elif PARALLEL_WORKERS > 0 and len(tasks) > 1 and not getattr(_local, "worker", False):
+        context = PROFILER.context()
+        futures = {name: _pool("thread").submit(_attached, context, task) for name, task in tasks.items()}
+    else:
+        return {name: task() for name, task in tasks.items()}
+    return {name: future.result() for name, future in futures.items()}
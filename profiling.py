@@ -0,0 +1,241 @@
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+
+# record the stages of every rerun, shown in a sidebar panel and exported below
+PROFILE = os.environ.get("FOAM_PROFILE", "") == "1"
+
+# JSON lines file receiving one record per rerun, empty for none
+PROFILE_LOG = os.environ.get("FOAM_PROFILE_LOG", "")
+
+# file rewritten after every rerun with the stage histograms in the Prometheus text format,
+# e.g. for the textfile collector of the node exporter, empty for none
+PROFILE_METRICS = os.environ.get("FOAM_PROFILE_METRICS", "")
+
+# upper bounds of the latency buckets, in seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# reruns kept for the debug panel
+RECENT_RUNS = 50
+
+
+class Histogram:
+    """
+    Latency histogram of a stage, with fixed bucket bounds, and the total payload size of the stage.
+    """
+
+    def __init__(self, bounds=LATENCY_BUCKETS):
+        """
+        :param bounds: Increasing upper bounds of the buckets, in seconds, the last bucket being unbounded.
+        """
+        self.bounds = np.asarray(bounds, dtype=np.float64)
+        self.counts = np.zeros(len(self.bounds) + 1, dtype=np.int64)
+        self.count = 0
+        self.sum = 0.0
+        self.nbytes = 0
+
+    def observe(self, seconds: float, nbytes: int = None):
+        """
+        :param seconds: Latency of one run of the stage.
+        :param nbytes: Payload size of that run, None when not measured.
+        """
+        self.counts[np.searchsorted(self.bounds, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.nbytes += nbytes or 0
+
+    def quantile(self, q: float):
+        """
+        :param q: Quantile between 0 and 1.
+        :return: Upper bound of the bucket holding the quantile, inf in the last bucket, nan without runs.
+        """
+        if not self.count:
+            return float("nan")
+        bucket = int(np.searchsorted(np.cumsum(self.counts), q * self.count))
+        return float(self.bounds[bucket]) if bucket < len(self.bounds) else float("inf")
+
+
+class Profiler:
+    """
+    Timings of the stages of a rerun, e.g. load, filter or the figure of a chart, and their
+    histograms per page and stage over the life of the process.
+
+    A rerun runs in one thread, from begin() to end(): the stages timed in between are kept in
+    order, with their nesting depth, and only added to the histograms when the rerun ends and
+    its page is known. Tasks it hands to other threads attach to it to have their stages recorded too.
+    Outside a rerun, and when disabled, stages are not timed at all.
+    """
+
+    def __init__(self, enabled: bool = PROFILE, bounds=LATENCY_BUCKETS, log_path: str = PROFILE_LOG,
+                 metrics_path: str = PROFILE_METRICS):
+        """
+        :param enabled: Whether stages are timed.
+        :param bounds: Upper bounds of the latency buckets, in seconds.
+        :param log_path: JSON lines file receiving the reruns, empty for none.
+        :param metrics_path: File rewritten with the histograms in the Prometheus text format, empty for none.
+        """
+        self.enabled = enabled
+        self.bounds = bounds
+        self.log_path = log_path
+        self.metrics_path = metrics_path
+        self.histograms = {}
+        self.recent = deque(maxlen=RECENT_RUNS)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def begin(self):
+        """
+        Start timing a rerun in the current thread, dropping a rerun left unfinished.
+        """
+        if self.enabled:
+            self._local.run = {"page": None, "start": time.perf_counter(), "stages": []}
+            self._local.depth = 0
+
+    def set_page(self, page: str):
+        """
+        :param page: Page of the current rerun, the histograms are kept per page.
+        """
+        run = getattr(self._local, "run", None)
+        if run is not None:
+            run["page"] = page
+
+    def context(self):
+        """
+        :return: The rerun of the current thread and its stage depth, to attach to another thread, None outside a rerun.
+        """
+        run = getattr(self._local, "run", None) if self.enabled else None
+        return None if run is None else (run, self._local.depth)
+
+    @contextmanager
+    def attach(self, context):
+        """
+        Time the stages of the block as stages of the rerun of another thread, e.g. of the thread that submitted
+        the block to a pool. They are nested in the stage that thread was in.
+
+        :param context: Value of context() in the other thread, None to time nothing.
+        """
+        previous = getattr(self._local, "run", None), getattr(self._local, "depth", 0)
+        self._local.run, self._local.depth = context or (None, 0)
+        try:
+            yield
+        finally:
+            self._local.run, self._local.depth = previous
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Time the block as a stage of the current rerun.
+
+        :param name: Name of the stage.
+        :return: Context manager yielding the record of the stage, whose "bytes" can be set to its payload size.
+        """
+        run = getattr(self._local, "run", None) if self.enabled else None
+        if run is None:
+            yield {}
+            return
+        record = {"stage": name, "depth": self._local.depth, "seconds": None, "bytes": None}
+        run["stages"].append(record)
+        self._local.depth += 1
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["seconds"] = time.perf_counter() - start
+            self._local.depth -= 1
+
+    def end(self):
+        """
+        Finish the rerun of the current thread: add its stages to the histograms and export it.
+
+        :return: Dictionary of the rerun, with its page, total time and list of stages, or None outside a rerun.
+        """
+        run = getattr(self._local, "run", None)
+        if run is None:
+            return None
+        self._local.run = None
+        page = run["page"] or "none"
+        summary = {"time": time.time(), "page": page, "seconds": time.perf_counter() - run.pop("start"),
+                   "stages": [record for record in run["stages"] if record["seconds"] is not None]}
+        with self._lock:
+            for record in summary["stages"]:
+                key = (page, record["stage"])
+                if key not in self.histograms:
+                    self.histograms[key] = Histogram(self.bounds)
+                self.histograms[key].observe(record["seconds"], record["bytes"])
+            self.recent.append(summary)
+            if self.log_path:
+                with open(self.log_path, "a") as file:
+                    file.write(json.dumps(summary) + "\n")
+            if self.metrics_path:
+                with open(self.metrics_path + ".tmp", "w") as file:
+                    file.write(self._prometheus())
+                os.replace(self.metrics_path + ".tmp", self.metrics_path)
+        return summary
+
+    def summary(self):
+        """
+        :return: List of dictionaries with the page, stage, run count, mean and 95th percentile latency
+                 in ms and mean payload size of every histogram.
+        """
+        with self._lock:
+            return [{"page": page, "stage": stage, "runs": histogram.count,
+                     "mean ms": histogram.sum / histogram.count * 1000,
+                     "p95 ms": histogram.quantile(0.95) * 1000,
+                     "mean bytes": histogram.nbytes // histogram.count}
+                    for (page, stage), histogram in sorted(self.histograms.items())]
+
+    def prometheus(self):
+        """
+        :return: The histograms in the Prometheus text exposition format.
+        """
+        with self._lock:
+            return self._prometheus()
+
+    def _prometheus(self):
+        lines = ["# HELP foam_stage_seconds Latency of the stages of a dashboard rerun.",
+                 "# TYPE foam_stage_seconds histogram"]
+        payloads = ["# HELP foam_stage_payload_bytes Payload size of the stages of a dashboard rerun.",
+                    "# TYPE foam_stage_payload_bytes counter"]
+        for (page, stage), histogram in sorted(self.histograms.items()):
+            labels = f'page="{_escape(page)}",stage="{_escape(stage)}"'
+            for bound, count in zip(list(histogram.bounds) + ["+Inf"], np.cumsum(histogram.counts)):
+                lines.append(f'foam_stage_seconds_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f"foam_stage_seconds_sum{{{labels}}} {histogram.sum}")
+            lines.append(f"foam_stage_seconds_count{{{labels}}} {histogram.count}")
+            payloads.append(f"foam_stage_payload_bytes_total{{{labels}}} {histogram.nbytes}")
+        return "\n".join(lines + payloads) + "\n"
+
+    def reset(self):
+        """
+        Drop the histograms and the recent reruns.
+        """
+        with self._lock:
+            self.histograms.clear()
+            self.recent.clear()
+
+
+def _escape(value: str):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# process-wide profiler shared by every session of the streamlit server
+PROFILER = Profiler()
+
+
+def profiled(function):
+    """
+    Decorator timing every call of a function as a stage named after it.
+    """
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if not PROFILER.enabled:
+            return function(*args, **kwargs)
+        with PROFILER.stage(function.__name__):
+            return function(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,38 @@
+import pandas as pd
+
+# display order of the binned columns
+AWARD_AMOUNT_BINS = ['0-1 million', '1-6 million', '6-12 million', '12+ million']
+MONTHS_UNTIL_END_BINS = [
+    '0-3 months', '3-6 months', '6-12 months', '12-18 months', '18+ months', 'Contract/s Expired'
+]
+
+# dtypes of the filter and group-by columns, values missing from an ordered category list are read as NaN
+ACTIVE_OPPORTUNITIES_SCHEMA = {
+    "Awarding_Agency": "category",
+    "Type": "category",
+    "Score": "category",
+    "Score_Mapped": "category",
+    "Set_Aside_Type": "category",
+    "DaysRemainingCode": "category",
+    "NAICSCodeDesc": "category",
+}
+PAST_AWARDS_SCHEMA = {
+    "Awarding Agency": "category",
+    "Recipient Name": "category",
+    "Contract Award Type": "category",
+    "Contract Status": "category",
+    "AwardAmount_Binned": pd.CategoricalDtype(AWARD_AMOUNT_BINS, ordered=True),
+    "Months Until Contract Ends": pd.CategoricalDtype(MONTHS_UNTIL_END_BINS, ordered=True),
+    "naics_description": "category",
+}
+
+
+def apply_schema(data: pd.DataFrame, schema: dict):
+    """
+    Cast the columns of a DataFrame to the declared dtypes.
+
+    :param data: DataFrame to convert.
+    :param schema: Mapping of column name to dtype.
+    :return: DataFrame with the declared dtypes.
+    """
+    return data.astype({column: dtype for column, dtype in schema.items() if column in data.columns})
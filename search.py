@@ -0,0 +1,138 @@
+import re
+from itertools import chain
+
+import numpy as np
+import pandas as pd
+
+# words are runs of letters and digits, matched case-insensitively
+TOKEN_PATTERN = r"[a-z0-9]+"
+
+# BM25 parameters: saturation of repeated terms and strength of the length normalization
+K1 = 1.2
+B = 0.75
+
+# rows tokenized at a time while building, bounds the memory of the words of long descriptions
+CHUNK_ROWS = 5_000
+
+
+class SearchIndex:
+    """
+    Inverted index from the words of text columns to the rows holding them, ranked with BM25.
+
+    The words of the columns of a row are pooled into one document. For each word of the sorted
+    vocabulary, the postings hold the rows containing it, in row order, and the number of times
+    it occurs there. A query only reads the postings of its words. The rows are tokenized in chunks,
+    so the words of all the texts are never held at once.
+    """
+
+    def __init__(self, data: pd.DataFrame, columns: list, chunk_rows: int = CHUNK_ROWS, texts=None):
+        """
+        Build the index.
+
+        :param data: DataFrame holding the text columns.
+        :param columns: Names of the text columns to index.
+        :param chunk_rows: Number of rows tokenized at a time, only the postings of the chunks are kept.
+        :param texts: TextStore holding the text columns missing from the data, in the same row order, or None.
+        """
+        self.size = len(data)
+        span = max(self.size, 1)
+        # word ids in order of first appearance, renumbered in word order at the end
+        first_seen = {}
+        pairs, frequencies, lengths = [], [], []
+        for start in range(0, self.size, chunk_rows):
+            part = data.iloc[start:start + chunk_rows]
+            text = None
+            for column in columns:
+                if column in part.columns:
+                    values = part[column].astype(object)
+                else:
+                    values = pd.Series(texts.texts(column, np.arange(start, start + len(part))), dtype=object)
+                values = values.fillna("").astype(str).values
+                text = values if text is None else text + " " + values
+            text = pd.Series(text, dtype=object)
+            tokens = text.str.lower().str.findall(TOKEN_PATTERN)
+            counts = tokens.str.len().values.astype(np.int64)
+            words = np.fromiter(chain.from_iterable(tokens), dtype=object, count=counts.sum())
+            local, uniques = pd.factorize(words)
+            ids = np.array([first_seen.setdefault(word, len(first_seen)) for word in uniques], dtype=np.int64)
+            rows = np.repeat(np.arange(start, start + len(part), dtype=np.int64), counts)
+            # one entry per word and row of the chunk
+            chunk_pairs, chunk_frequencies = np.unique(ids[local] * span + rows, return_counts=True)
+            pairs.append(chunk_pairs)
+            frequencies.append(chunk_frequencies.astype(np.float32))
+            lengths.append(counts)
+
+        self.vocabulary = pd.Index(sorted(first_seen), dtype=object)
+        rank = self.vocabulary.get_indexer(list(first_seen)).astype(np.int64)
+        pairs = np.concatenate(pairs) if pairs else np.empty(0, dtype=np.int64)
+        terms = rank[pairs // span]
+        # postings sorted by word then row
+        order = np.argsort(terms * span + pairs % span, kind="stable")
+        self.rows = (pairs % span)[order].astype(np.int32)
+        self.frequencies = np.concatenate(frequencies)[order] if frequencies else np.empty(0, dtype=np.float32)
+        self.bounds = np.searchsorted(terms[order], np.arange(len(self.vocabulary) + 1))
+
+        lengths = np.concatenate(lengths) if lengths else np.empty(0, dtype=np.int64)
+        documents = np.diff(self.bounds)
+        self.idf = np.log(1 + (self.size - documents + 0.5) / (documents + 0.5))
+        average = lengths.mean() if self.size else 0
+        self.length_norm = K1 * (1 - B + B * lengths / average) if average else np.full(self.size, K1)
+
+    def _term_range(self, word: str):
+        # a trailing * matches every word of the vocabulary starting with the prefix
+        if word.endswith("*"):
+            prefix = word[:-1]
+            return (self.vocabulary.searchsorted(prefix, side="left"),
+                    self.vocabulary.searchsorted(prefix + "\uffff", side="left"))
+        position = self.vocabulary.searchsorted(word)
+        found = position < len(self.vocabulary) and self.vocabulary[position] == word
+        return position, position + 1 if found else position
+
+    def _postings(self, word: str):
+        """
+        :return: Rows holding the word and the BM25 score of the word in each, rows in ascending order.
+        """
+        start, stop = self._term_range(word)
+        slices = [slice(self.bounds[term], self.bounds[term + 1]) for term in range(start, stop)]
+        if not slices:
+            return np.empty(0, dtype=np.int32), np.empty(0)
+        rows = np.concatenate([self.rows[part] for part in slices])
+        frequencies = np.concatenate([self.frequencies[part] for part in slices])
+        idf = np.repeat(self.idf[start:stop], [part.stop - part.start for part in slices])
+        scores = idf * frequencies * (K1 + 1) / (frequencies + self.length_norm[rows])
+        if len(slices) > 1:
+            # rows holding several words of the prefix get the sum of their scores
+            rows, inverse = np.unique(rows, return_inverse=True)
+            scores = np.bincount(inverse, weights=scores)
+        return rows, scores
+
+    def search(self, query: str, positions: np.ndarray = None):
+        """
+        Rows holding every word of a query, best matches first.
+
+        :param query: Words to look for, a word ending with * matches the words it starts.
+        :param positions: Sorted row positions to search in, e.g. the rows of a facet selection,
+                          None to search every row.
+        :return: Tuple of the matching row positions, ranked by decreasing BM25 score then row order,
+                 and their scores.
+        """
+        words = list(dict.fromkeys(re.findall(TOKEN_PATTERN + r"\*?", query.lower())))
+        postings = sorted((self._postings(word) for word in words), key=lambda posting: len(posting[0]))
+        if not postings:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        rows, scores = postings[0]
+        if positions is not None:
+            rows, scores = self._intersect(rows, scores, np.asarray(positions), 0)
+        # the rarest word first, so the candidates only shrink
+        for other_rows, other_scores in postings[1:]:
+            rows, scores = self._intersect(rows, scores, other_rows, other_scores)
+        order = np.lexsort((rows, -scores))
+        return rows[order].astype(np.int64), scores[order]
+
+    @staticmethod
+    def _intersect(rows: np.ndarray, scores: np.ndarray, other_rows: np.ndarray, other_scores):
+        index = np.searchsorted(other_rows, rows)
+        found = other_rows[np.minimum(index, len(other_rows) - 1)] == rows if len(other_rows) else \
+            np.zeros(len(rows), dtype=bool)
+        added = other_scores[index[found]] if isinstance(other_scores, np.ndarray) else other_scores
+        return rows[found], scores[found] + added
@@ -0,0 +1,159 @@
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+except ImportError:  # datasets are only published and attached when pyarrow is installed
+    pa = None
+
+# bumped whenever the layout of a published dataset changes, so workers never map an older layout
+SHARED_LAYOUT_VERSION = 1
+
+MANIFEST = "manifest.json"
+
+# published versions kept on disk, workers still mapping an older one keep it alive until they swap
+KEEP_VERSIONS = 2
+
+
+def pointer_path(root: str, name: str):
+    """
+    :param root: Directory of the published datasets.
+    :param name: Name of the dataset.
+    :return: Path of the file naming the current version of the dataset.
+    """
+    return os.path.join(root, f"{name}.current.json")
+
+
+def _write_arrow(path: str, table):
+    with pa.OSFile(path, "wb") as file:
+        with pa.ipc.new_file(file, table.schema) as writer:
+            writer.write_table(table)
+
+
+def _read_arrow(path: str):
+    # memory-mapped, the Arrow buffers point into the file
+    return pa.ipc.open_file(pa.memory_map(path)).read_all()
+
+
+def publish(data: pd.DataFrame, root: str, name: str, source=None):
+    """
+    Write the typed columns of a dataset as a new version of its shared copy, then make it current.
+
+    Columns of the same numeric or datetime dtype are stored together as one 2-D .npy array, and
+    each categorical as its codes in a .npy array, so workers map them as-is. String columns and
+    the categories are stored as Arrow IPC files. The version is written to its own directory
+    and the pointer to it is replaced in one step, so workers switch from one complete version
+    to the next.
+
+    :param data: Typed DataFrame to publish.
+    :param root: Directory of the published datasets.
+    :param name: Name of the dataset.
+    :param source: JSON-serializable version of the source file, saved in the manifest.
+    :return: Path of the directory of the new version.
+    """
+    directory = f"{name}-{time.time_ns()}"
+    temporary = os.path.join(root, directory + ".tmp")
+    shutil.rmtree(temporary, ignore_errors=True)
+    os.makedirs(temporary)
+
+    columns, blocks, strings = [], {}, []
+    for number, column in enumerate(data.columns):
+        series = data[column]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            np.save(os.path.join(temporary, f"codes-{number}.npy"), series.cat.codes.values)
+            _write_arrow(os.path.join(temporary, f"categories-{number}.arrow"),
+                         pa.table({"categories": pa.array(np.asarray(series.cat.categories))}))
+            columns.append({"name": column, "kind": "category", "number": number,
+                            "ordered": bool(series.cat.ordered)})
+        elif isinstance(series.dtype, np.dtype) and series.dtype.kind in "biufM":
+            blocks.setdefault(series.dtype.str, []).append(column)
+            columns.append({"name": column, "kind": "block", "dtype": series.dtype.str})
+        else:
+            strings.append(column)
+            columns.append({"name": column, "kind": "string"})
+
+    files = {}
+    for number, (dtype, names) in enumerate(blocks.items()):
+        files[dtype] = f"block-{number}.npy"
+        # one row per column, the layout of a pandas block
+        np.save(os.path.join(temporary, files[dtype]), np.stack([data[column].values for column in names]))
+    if strings:
+        _write_arrow(os.path.join(temporary, "strings.arrow"), pa.Table.from_pandas(data[strings], preserve_index=False))
+
+    manifest = {"version": SHARED_LAYOUT_VERSION, "source": source, "rows": len(data), "columns": columns,
+                "blocks": {dtype: {"file": files[dtype], "columns": names} for dtype, names in blocks.items()}}
+    with open(os.path.join(temporary, MANIFEST), "w") as file:
+        json.dump(manifest, file, indent=1)
+    os.replace(temporary, os.path.join(root, directory))
+
+    pointer = pointer_path(root, name)
+    with open(pointer + ".tmp", "w") as file:
+        json.dump({"directory": directory, "source": source}, file)
+    os.replace(pointer + ".tmp", pointer)
+
+    # versions are named by publication time, the oldest ones go first
+    versions = sorted(entry for entry in os.listdir(root) if entry.startswith(f"{name}-")
+                      and not entry.endswith(".tmp") and os.path.isdir(os.path.join(root, entry)))
+    for stale in versions[:-KEEP_VERSIONS]:
+        shutil.rmtree(os.path.join(root, stale), ignore_errors=True)
+    return os.path.join(root, directory)
+
+
+def read_pointer(root: str, name: str):
+    """
+    :param root: Directory of the published datasets.
+    :param name: Name of the dataset.
+    :return: Pointer to the current version, a dictionary with its directory and source, or None.
+    """
+    path = pointer_path(root, name)
+    if not os.path.exists(path):
+        return None
+    with open(path) as file:
+        return json.load(file)
+
+
+def attach(root: str, name: str):
+    """
+    Map the current version of a published dataset.
+
+    The numeric, datetime and categorical code arrays of the DataFrame are read-only views of the
+    mapped files, shared by every process attaching the same version. String columns and the
+    categories are turned into Python objects, held by each process. Columns are grouped by dtype,
+    so they do not keep the order of the published DataFrame.
+
+    :param root: Directory of the published datasets.
+    :param name: Name of the dataset.
+    :return: DataFrame of the dataset, shared and not to be modified.
+    """
+    pointer = read_pointer(root, name)
+    if pointer is None:
+        raise FileNotFoundError(f"no published version of {name} in {root}")
+    directory = os.path.join(root, pointer["directory"])
+    with open(os.path.join(directory, MANIFEST)) as file:
+        manifest = json.load(file)
+    if manifest["version"] != SHARED_LAYOUT_VERSION:
+        raise ValueError(f"{name} was published with an older layout, publish it again")
+
+    frames = []
+    for dtype, block in manifest["blocks"].items():
+        values = np.load(os.path.join(directory, block["file"]), mmap_mode="r")
+        # the transposed 2-D array becomes the block of the DataFrame without a copy
+        frames.append(pd.DataFrame(values.view(np.ndarray).T, columns=block["columns"], copy=False))
+    categoricals = {}
+    for column in manifest["columns"]:
+        if column["kind"] == "category":
+            codes = np.load(os.path.join(directory, f"codes-{column['number']}.npy"), mmap_mode="r")
+            categories = _read_arrow(os.path.join(directory, f"categories-{column['number']}.arrow"))
+            dtype = pd.CategoricalDtype(categories.column("categories").to_pandas().values, ordered=column["ordered"])
+            categoricals[column["name"]] = pd.Categorical.from_codes(codes.view(np.ndarray), dtype=dtype)
+    if categoricals:
+        frames.append(pd.DataFrame(categoricals, copy=False))
+    if any(column["kind"] == "string" for column in manifest["columns"]):
+        frames.append(_read_arrow(os.path.join(directory, "strings.arrow")).to_pandas())
+    return pd.concat(frames, axis=1, copy=False)
+
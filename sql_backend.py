@@ -0,0 +1,373 @@
+import argparse
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+from aggregations import finish_current_opportunities_aggregates, finish_competitor_aggregates, \
+    finish_forecast_aggregates, CURRENT_OPPORTUNITIES_GROUPS, COMPETITOR_GROUPS, FORECAST_GROUPS
+from data_loader import read_active_opportunities, read_past_awards, file_signature, ACTIVE_OPPORTUNITIES_PATH, \
+    PAST_AWARDS_PATH, ACTIVE_OPPORTUNITIES_FACETS, PAST_AWARDS_FACETS, ACTIVE_OPPORTUNITIES_KEYS, PAST_AWARDS_KEYS
+from distinct import encode_keys
+from parallel import run_tasks
+from schema import ACTIVE_OPPORTUNITIES_SCHEMA, PAST_AWARDS_SCHEMA
+
+DATABASE_PATH = "./data/foam.sqlite"
+
+# answer the page queries from the SQLite database instead of the in-memory DataFrames
+SQL_BACKEND = os.environ.get("FOAM_BACKEND", "pandas") == "sqlite"
+
+# table name, schema and filter columns of each dataset
+TABLES = {
+    "active_opportunities": (ACTIVE_OPPORTUNITIES_SCHEMA, ACTIVE_OPPORTUNITIES_FACETS),
+    "past_awards": (PAST_AWARDS_SCHEMA, PAST_AWARDS_FACETS),
+}
+
+
+def _quote(column: str):
+    return '"' + column.replace('"', '""') + '"'
+
+
+def _parameter(value):
+    # sqlite3 binds Python scalars only, categories of integers are numpy integers
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def build_database(path: str = DATABASE_PATH, active_opportunities_path: str = ACTIVE_OPPORTUNITIES_PATH,
+                   past_awards_path: str = PAST_AWARDS_PATH):
+    """
+    Load both datasets into a SQLite database with an index on every filter column.
+
+    Besides the rows, the database records the dtype of every column and the values of the
+    categorical ones, so query results are typed like the DataFrames of the pandas path.
+    The database is written to a temporary file first and moved into place.
+
+    :param path: Path of the database file.
+    :param active_opportunities_path: Path of the ActiveOpportunities CSV file.
+    :param past_awards_path: Path of the PastAwards CSV file.
+    :return: Path of the written database.
+    """
+    temporary = path + ".tmp"
+    if os.path.exists(temporary):
+        os.remove(temporary)
+    connection = sqlite3.connect(temporary)
+    try:
+        connection.execute("CREATE TABLE columns (dataset TEXT, name TEXT, dtype TEXT, position INTEGER)")
+        connection.execute("CREATE TABLE categories (dataset TEXT, name TEXT, value, position INTEGER)")
+        # keys encoded as on the pandas path, so they are recorded and read back as categoricals
+        for table, data in [("active_opportunities", encode_keys(read_active_opportunities(active_opportunities_path),
+                                                                 ACTIVE_OPPORTUNITIES_KEYS)),
+                            ("past_awards", encode_keys(read_past_awards(past_awards_path), PAST_AWARDS_KEYS))]:
+            _, facets = TABLES[table]
+            # categoricals are stored as their values, typed like the categories
+            categorical = [column for column in data.columns if isinstance(data[column].dtype, pd.CategoricalDtype)]
+            data.astype({column: object for column in categorical}).to_sql(table, connection, index=False)
+            for column in facets:
+                connection.execute(f"CREATE INDEX {_quote(table + '_' + column)} ON {table} ({_quote(column)})")
+            connection.executemany("INSERT INTO columns VALUES (?, ?, ?, ?)",
+                                   [(table, column, str(dtype), position)
+                                    for position, (column, dtype) in enumerate(data.dtypes.items())])
+            for column in categorical:
+                codes = data[column].cat.codes.values
+                present = data[column].cat.categories[
+                    np.bincount(codes[codes >= 0], minlength=len(data[column].cat.categories)) > 0]
+                connection.executemany("INSERT INTO categories VALUES (?, ?, ?, ?)",
+                                       [(table, column, _parameter(value), position)
+                                        for position, value in enumerate(present)])
+        connection.commit()
+    finally:
+        connection.close()
+    os.replace(temporary, path)
+    return path
+
+
+class ConnectionPool:
+    """
+    Read-only SQLite connections shared by the sessions of the server, opened on demand up to a maximum.
+    """
+
+    def __init__(self, path: str, size: int = 8):
+        """
+        :param path: Path of the database file.
+        :param size: Maximum number of open connections.
+        """
+        self.path = path
+        self.size = size
+        self._idle = queue.Queue()
+        self._opened = 0
+        self._lock = threading.Lock()
+
+    def _open(self):
+        return sqlite3.connect(f"file:{os.path.abspath(self.path)}?mode=ro", uri=True, check_same_thread=False)
+
+    @contextmanager
+    def connection(self):
+        """
+        Borrow a connection, waiting for one to be returned when all of them are in use.
+        """
+        try:
+            connection = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                opened = self._opened < self.size
+                self._opened += opened
+            connection = self._open() if opened else self._idle.get()
+        try:
+            yield connection
+        finally:
+            self._idle.put(connection)
+
+
+class SqlBackend:
+    """
+    Filtering, KPIs, chart aggregations and table pages of the dashboard answered by SQL queries.
+
+    Every method returns the same values as the pandas path for the same selection: the groups
+    are computed in SQL, typed and put in key order, then finished by the functions of aggregations.
+    """
+
+    def __init__(self, path: str = DATABASE_PATH, pool_size: int = 8):
+        """
+        :param path: Path of the database file.
+        :param pool_size: Maximum number of open connections.
+        """
+        self.path = path
+        self.version = file_signature(path)
+        self.pool = ConnectionPool(path, pool_size)
+        self.dtypes = {}
+        self.options = {}
+        with self.pool.connection() as connection:
+            for table, (schema, facets) in TABLES.items():
+                self.dtypes[table], self.options[table] = self._read_types(connection, table, schema, facets)
+
+    @staticmethod
+    def _read_types(connection, table: str, schema: dict, facets: list):
+        dtypes, present = {}, {}
+        for name, value in connection.execute(
+                "SELECT name, value FROM categories WHERE dataset = ? ORDER BY name, position", (table,)):
+            present.setdefault(name, []).append(value)
+        for name, dtype in connection.execute(
+                "SELECT name, dtype FROM columns WHERE dataset = ? ORDER BY position", (table,)):
+            if dtype == "category":
+                # declared category lists are kept whole, the others are the values of the data
+                declared = schema.get(name)
+                dtype = declared if isinstance(declared, pd.CategoricalDtype) else \
+                    pd.CategoricalDtype(pd.Index(present.get(name, [])))
+            dtypes[name] = dtype
+        # sidebar options, in the same order as FacetIndex.options
+        options = {}
+        for name in facets:
+            values = set(present.get(name, []))
+            options[name] = [value for value in dtypes[name].categories if value in values]
+        return dtypes, options
+
+    def _typed(self, table: str, data: pd.DataFrame):
+        """
+        Cast the columns read from a table back to the dtypes of the DataFrame it was loaded from.
+        """
+        for column in data.columns:
+            dtype = self.dtypes[table].get(column)
+            if dtype is None:
+                continue
+            if str(dtype).startswith("datetime64"):
+                data[column] = pd.to_datetime(data[column])
+            elif dtype == "object":
+                data[column] = data[column].fillna(np.nan)
+            else:
+                data[column] = data[column].astype(dtype)
+        return data
+
+    @staticmethod
+    def _where(selection: dict, conditions: list = ()):
+        clauses, parameters = list(conditions), []
+        for column, values in selection.items():
+            if values:
+                clauses.append(f"{_quote(column)} IN ({', '.join('?' * len(values))})")
+                parameters.extend(_parameter(value) for value in values)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), parameters
+
+    def query(self, sql: str, parameters: list = ()):
+        """
+        :param sql: Parameterized query.
+        :param parameters: Values of the parameters.
+        :return: DataFrame of the result.
+        """
+        with self.pool.connection() as connection:
+            return pd.read_sql_query(sql, connection, params=list(parameters))
+
+    def group(self, table: str, selection: dict, keys: list, aggregations: dict):
+        """
+        Aggregate the selected rows of a table per key, like a groupby with observed=True followed by sort_index.
+
+        :param table: Name of the table.
+        :param selection: Mapping of column name to the list of selected values.
+        :param keys: Group-by columns.
+        :param aggregations: Mapping of column to 'count', 'sum' or 'mean'.
+        :return: DataFrame with the keys and aggregated columns, one row per key in key order.
+        """
+        functions = {"count": "COUNT({})", "sum": "TOTAL({})", "mean": "AVG({})"}
+        where, parameters = self._where(selection, [f"{_quote(key)} IS NOT NULL" for key in keys])
+        columns = ", ".join([_quote(key) for key in keys] + [
+            f"{functions[function].format(_quote(column))} AS {_quote(column)}"
+            for column, function in aggregations.items()])
+        grouped = ", ".join(_quote(key) for key in keys)
+        data = self.query(f"SELECT {columns} FROM {table}{where} GROUP BY {grouped}", parameters)
+        data[keys] = self._typed(table, data[keys].copy())
+        for column, function in aggregations.items():
+            dtype = self.dtypes[table][column]
+            # counts are integers, means floats and sums have the dtype of the column summed
+            data[column] = data[column].astype(
+                np.int64 if function == "count" else np.float64 if function == "mean" else dtype)
+        return data.sort_values(keys, kind="mergesort").reset_index(drop=True)
+
+    def row_count(self, table: str, selection: dict):
+        """
+        :param table: Name of the table.
+        :param selection: Mapping of column name to the list of selected values.
+        :return: Number of selected rows.
+        """
+        where, parameters = self._where(selection)
+        with self.pool.connection() as connection:
+            return connection.execute(f"SELECT COUNT(*) FROM {table}{where}", parameters).fetchone()[0]
+
+    def page(self, table: str, selection: dict, columns: list, page: int = 0, page_size: int = None,
+             sort_by: str = None, ascending: bool = True):
+        """
+        One page of the selected rows, in the order utils.paginate gives: stable, missing values last.
+
+        :param table: Name of the table.
+        :param selection: Mapping of column name to the list of selected values.
+        :param columns: Columns to read.
+        :param page: Zero-based number of the page.
+        :param page_size: Number of rows per page, None for all rows.
+        :param sort_by: Column to sort the rows by, None to keep the file order.
+        :param ascending: Sort direction.
+        :return: Typed DataFrame of the rows of the page.
+        """
+        where, parameters = self._where(selection)
+        order = "rowid"
+        if sort_by is not None:
+            key, dtype = _quote(sort_by), self.dtypes[table][sort_by]
+            if isinstance(dtype, pd.CategoricalDtype) and dtype.ordered:
+                # ordered categories sort in their declared order
+                key = "CASE " + key + " " + " ".join("WHEN ? THEN ?" for _ in dtype.categories) + " END"
+                parameters = parameters + [value for position, category in enumerate(dtype.categories)
+                                           for value in (_parameter(category), position)]
+            order = f"{_quote(sort_by)} IS NULL, {key} {'ASC' if ascending else 'DESC'}, rowid"
+        limit = "" if page_size is None else f" LIMIT {int(page_size)} OFFSET {int(page * page_size)}"
+        selected = ", ".join(_quote(column) for column in columns)
+        return self._typed(table, self.query(f"SELECT {selected} FROM {table}{where} ORDER BY {order}{limit}",
+                                             parameters))
+
+    def current_opportunities_kpis(self, selection: dict):
+        """
+        :param selection: Mapping of column name to the list of selected values.
+        :return: Same tuple as utils.current_opportunities_kpis.
+        """
+        where, parameters = self._where(selection)
+        with self.pool.connection() as connection:
+            total, days, positive, green = connection.execute(
+                'SELECT COUNT(DISTINCT "Notice_ID"), AVG("Days_to_ResponseDeadline"), '
+                'COUNT(CASE WHEN "Score_Mapped" = \'Positive\' THEN 1 END), '
+                'COUNT(CASE WHEN "DaysRemainingCode" = \'Green\' THEN 1 END) '
+                f'FROM active_opportunities{where}', parameters).fetchone()
+        return total, np.nan if days is None else days, positive, green
+
+    def competitor_kpis(self, selection: dict):
+        """
+        :param selection: Mapping of column name to the list of selected values.
+        :return: Same tuple as utils.competitor_kpis.
+        """
+        where, parameters = self._where(selection)
+        with self.pool.connection() as connection:
+            return connection.execute(
+                'SELECT COUNT(DISTINCT "generated_internal_id"), '
+                'COUNT(CASE WHEN "AwardAmount_Binned" IN (\'6-12 million\', \'12+ million\') THEN 1 END), '
+                f'TOTAL("Award Amount") FROM past_awards{where}', parameters).fetchone()
+
+    def contracts_kpis(self, selection: dict):
+        """
+        :param selection: Mapping of column name to the list of selected values.
+        :return: Same tuple as utils.contracts_kpis.
+        """
+        where, parameters = self._where(selection)
+        with self.pool.connection() as connection:
+            count, offers, with_offers, value = connection.execute(
+                'SELECT COUNT(DISTINCT "generated_internal_id"), TOTAL("number_of_offers_received"), '
+                'COUNT(DISTINCT CASE WHEN "number_of_offers_received" IS NOT NULL THEN "generated_internal_id" END), '
+                f'TOTAL("Award Amount") FROM past_awards{where}', parameters).fetchone()
+        return count, offers / with_offers if with_offers else 0, value
+
+    def grouped(self, table: str, selection: dict, groups: dict, kpis):
+        """
+        KPIs and grouped data of a page, the queries running concurrently on the connections of the pool
+        when parallel workers are configured.
+
+        :param table: Name of the table.
+        :param selection: Mapping of column name to the list of selected values.
+        :param groups: Mapping of aggregate name to group-by columns and aggregations.
+        :param kpis: KPI method of the page.
+        :return: Dictionary of the KPIs tuple and the grouped DataFrames, in the order of the groups.
+        """
+        tasks = {"kpis": partial(kpis, selection)}
+        tasks.update({name: partial(self.group, table, selection, by, aggregations)
+                      for name, (by, aggregations) in groups.items()})
+        return run_tasks(tasks)
+
+    def current_opportunities_aggregates(self, selection: dict):
+        """
+        :param selection: Mapping of column name to the list of selected values.
+        :return: Same dictionary as aggregations.current_opportunities_aggregates.
+        """
+        return finish_current_opportunities_aggregates(**self.grouped(
+            "active_opportunities", selection, CURRENT_OPPORTUNITIES_GROUPS, self.current_opportunities_kpis))
+
+    def competitor_aggregates(self, selection: dict):
+        """
+        :param selection: Mapping of column name to the list of selected values.
+        :return: Same dictionary as aggregations.competitor_aggregates.
+        """
+        return finish_competitor_aggregates(**self.grouped("past_awards", selection, COMPETITOR_GROUPS,
+                                                           self.competitor_kpis))
+
+    def forecast_aggregates(self, selection: dict):
+        """
+        :param selection: Mapping of column name to the list of selected values.
+        :return: Same dictionary as aggregations.forecast_aggregates.
+        """
+        return finish_forecast_aggregates(**self.grouped("past_awards", selection, FORECAST_GROUPS,
+                                                         self.contracts_kpis))
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def load_backend(path: str = DATABASE_PATH):
+    """
+    SQL backend of the current version of the database, shared by all sessions.
+
+    :param path: Path of the database file.
+    :return: SqlBackend instance.
+    """
+    global _backend
+    signature = file_signature(path)
+    with _backend_lock:
+        if _backend is None or _backend.version != signature:
+            _backend = SqlBackend(path)
+        return _backend
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="F.O.A.M SQL backend")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("build", help="load the datasets into the SQLite database")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        print(f"Database written to {build_database()}")
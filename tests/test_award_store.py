@@ -0,0 +1,97 @@
+"""
+Refresh of the partitioned award store: the rows changed by an upsert only rewrite the partitions that held or
+receive them, and the store then reads like the changed CSV file.
+"""
+import csv
+import os
+import shutil
+
+import pandas as pd
+import pytest
+
+from award_store import build_store, end_quarter, read_manifest, read_store, update_store, ROW_COLUMN
+from data_loader import PAST_AWARDS_PATH, file_signature, load_filtered_past_awards, parse_past_awards, \
+    read_past_awards, recompile, store_path
+from ingestion import read_csv_rows, upsert_csv
+
+KEY = "generated_internal_id"
+
+
+@pytest.fixture
+def past_awards(tmp_path):
+    path = str(tmp_path / "PastAwards.csv")
+    shutil.copy(PAST_AWARDS_PATH, path)
+    # small partitions, so that the large agencies get files of their own
+    build_store(read_past_awards(path), store_path(path), list(file_signature(path)[1:]), min_rows=100)
+    return path
+
+
+def plain(data: pd.DataFrame):
+    # categories depend on the files read, only the values are compared
+    return data.astype({column: object for column in data.columns if data[column].dtype == "category"})
+
+
+def test_refresh_rewrites_touched_partitions(past_awards, tmp_path):
+    path, root = past_awards, store_path(past_awards)
+    header, rows = read_csv_rows(path)
+    before = read_manifest(root)
+    modified = {partition["path"]: os.stat(os.path.join(root, partition["path"])).st_mtime_ns
+                for partition in before["partitions"]}
+    # an award moved to another quarter, an amended amount, a new award of a new agency,
+    # and the awards ending in March 2015 expired
+    moved, amended, new = list(rows[0]), list(rows[1]), list(rows[2])
+    quarters = set(end_quarter(pd.to_datetime(pd.Series([row[header.index("End Date")] for row in rows[:3]]
+                                                         + ["2031-05-01", "2015-03-01"]))))
+    untouched_agency = next(agency for agency in sorted(before["agencies"])
+                            if not any(agency in partition["values"]["Awarding Agency"]
+                                       and partition["quarter"] in quarters for partition in before["partitions"]))
+    cached = load_filtered_past_awards({"Awarding Agency": [untouched_agency]}, path)
+    moved[header.index("End Date")] = "2031-05-01"
+    amended[header.index("Award Amount")] = "123.45"
+    new[header.index(KEY)], new[header.index("Awarding Agency")] = "CONT_AWD_NEW", "Office of Tests"
+    delta = str(tmp_path / "delta.csv")
+    with open(delta, "w", newline="", encoding="utf-8") as file:
+        csv.writer(file).writerows([header, moved, amended, new])
+    changes = {}
+    stats = upsert_csv(path, delta, KEY, lambda header, row: row[header.index("End Date")].startswith("2015-03"),
+                       changes)
+    assert stats["inserted"] == 1 and stats["updated"] == 2 and stats["expired"] > 0
+    written = recompile(path, parse_past_awards, KEY, changes)
+
+    after = read_manifest(root)
+    touched = {os.path.relpath(written_path, root) for written_path in written}
+    assert 0 < len(touched) < len(before["partitions"]) // 4
+    versions = {partition["path"]: partition["version"] for partition in before["partitions"]}
+    for partition in after["partitions"]:
+        if partition["path"] not in touched:
+            assert partition["version"] == versions[partition["path"]]
+            assert os.stat(os.path.join(root, partition["path"])).st_mtime_ns == modified[partition["path"]]
+    assert not any(untouched_agency in after_partition["values"]["Awarding Agency"]
+                   for after_partition in after["partitions"] if after_partition["path"] in touched)
+
+    columns = [column for column in after["columns"] if column != ROW_COLUMN]
+    expected = parse_past_awards(path, columns)
+    assert after["rows"] == len(expected)
+    pd.testing.assert_frame_equal(plain(read_store(root)), plain(expected))
+    # the selection read from untouched partitions is still cached, the others are read again
+    assert load_filtered_past_awards({"Awarding Agency": [untouched_agency]}, path) is cached
+    selection = {"Awarding Agency": ["Office of Tests", "Department of Defense"]}
+    pd.testing.assert_frame_equal(plain(load_filtered_past_awards(selection, path)),
+                                  plain(expected[expected["Awarding Agency"].isin(selection["Awarding Agency"])]
+                                        .reset_index(drop=True)))
+
+
+def test_empty_store(tmp_path):
+    root = str(tmp_path / "store")
+    data = read_past_awards(PAST_AWARDS_PATH).head(200)
+    empty = data.head(0)
+    build_store(empty, root, None)
+    assert read_manifest(root)["partitions"] == []
+    pd.testing.assert_frame_equal(plain(read_store(root)), plain(empty))
+    # filled by an update, then emptied again by one
+    update_store(root, empty, data, KEY, None)
+    pd.testing.assert_frame_equal(plain(read_store(root)), plain(data))
+    update_store(root, data, empty, KEY, None)
+    assert read_manifest(root)["partitions"] == [] and read_manifest(root)["rows"] == 0
+    pd.testing.assert_frame_equal(plain(read_store(root, {"Awarding Agency": ["Department of Defense"]})),
+                                  plain(empty))
@@ -0,0 +1,47 @@
+"""
+Equivalence of the page aggregations answered from the rollup cubes with the pandas path over the filtered rows,
+for seeded random sidebar selections, on the datasets and on copies scaled up with distinct keys, resampled or grown
+with new dates, recipients and NAICS descriptions.
+"""
+import random
+
+import pytest
+
+from aggregations import current_opportunities_aggregates, competitor_aggregates, forecast_aggregates, \
+    current_opportunities_cube_aggregates, competitor_cube_aggregates, forecast_cube_aggregates
+from benchmarks.synthetic import assert_same, grow, random_selection, scale, ACTIVE_OPPORTUNITIES_GROWN, \
+    PAST_AWARDS_GROWN
+from cube import RollupCubes, ACTIVE_OPPORTUNITIES_CUBE, PAST_AWARDS_CUBE
+from data_loader import load_active_opportunities, load_past_awards, ACTIVE_OPPORTUNITIES_FACETS, \
+    PAST_AWARDS_FACETS
+from facets import FacetIndex
+
+# scaling of the dataset, its scale and number of selections checked
+SCALES = [("resampled", 1, 50), ("resampled", 10, 5), ("grown", 10, 5)]
+
+PAGES = [
+    ("current_opportunities", load_active_opportunities, "Notice_ID", ACTIVE_OPPORTUNITIES_FACETS,
+     ACTIVE_OPPORTUNITIES_CUBE, ACTIVE_OPPORTUNITIES_GROWN, current_opportunities_aggregates,
+     current_opportunities_cube_aggregates),
+    ("competitor", load_past_awards, "generated_internal_id", PAST_AWARDS_FACETS, PAST_AWARDS_CUBE,
+     PAST_AWARDS_GROWN, competitor_aggregates, competitor_cube_aggregates),
+    ("forecast", load_past_awards, "generated_internal_id", PAST_AWARDS_FACETS, PAST_AWARDS_CUBE,
+     PAST_AWARDS_GROWN, forecast_aggregates, forecast_cube_aggregates),
+]
+
+
+@pytest.mark.parametrize("kind, factor, selections", SCALES, ids=[f"{kind} x{factor}" for kind, factor, _ in SCALES])
+@pytest.mark.parametrize("name, load, key, facet_columns, spec, grown, aggregate, cube_aggregate", PAGES,
+                         ids=[page[0] for page in PAGES])
+def test_same_as_rows(name, load, key, facet_columns, spec, grown, aggregate, cube_aggregate, kind, factor,
+                      selections):
+    rng = random.Random(f"{name} {kind} {factor}")
+    data = scale(load(), factor, key) if kind == "resampled" else grow(load(), factor, key, grown)
+    facets = FacetIndex(data, facet_columns)
+    cube = RollupCubes(data, **spec)
+    for _ in range(selections):
+        selection = random_selection(facets.options, rng)
+        expected = aggregate(facets.select(selection))
+        actual = cube_aggregate(cube, selection, lambda: facets.select(selection))
+        for item in expected:
+            assert_same(expected[item], actual[item], f"{name} {item} {selection}")
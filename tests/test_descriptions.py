@@ -0,0 +1,28 @@
+"""
+Descriptions of the opportunities read on demand: the loaded frame and the text store answer alike, with None
+for the empty descriptions and the unknown notices.
+"""
+import pandas as pd
+
+from data_loader import ACTIVE_OPPORTUNITIES_PATH, ACTIVE_OPPORTUNITIES_TEXT, clear_cache, compile_text_store, \
+    load_active_opportunities_texts, load_opportunity_descriptions, parse_active_opportunities
+
+
+def test_missing_descriptions_are_none(tmp_path):
+    path = str(tmp_path / "ActiveOpportunities.csv")
+    data = pd.read_csv(ACTIVE_OPPORTUNITIES_PATH, dtype=str, keep_default_na=False).head(20)
+    data.loc[[3, 7], "DescriptionText"] = ""
+    data.to_csv(path, index=False)
+    notice_ids = list(data["Notice_ID"][[1, 3, 7]]) + ["unknown"]
+
+    clear_cache()
+    assert load_active_opportunities_texts(path) is None
+    from_frame = load_opportunity_descriptions(notice_ids, path)
+    compile_text_store(path, parse_active_opportunities, *ACTIVE_OPPORTUNITIES_TEXT)
+    clear_cache()
+    assert load_active_opportunities_texts(path) is not None
+    from_store = load_opportunity_descriptions(notice_ids, path)
+
+    expected = [data["DescriptionText"][1], None, None, None]
+    assert list(from_frame) == list(from_store) == expected
+    assert list(from_frame.index) == list(from_store.index) == notice_ids
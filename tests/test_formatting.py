@@ -0,0 +1,52 @@
+"""
+The vectorized currency labels must be the labels of format_currency_label, value by value.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import format_currency_label, format_currency_labels
+
+UNITS = [1, 1e3, 1e6, 1e9]
+
+
+def assert_same_labels(values):
+    series = pd.Series(values, dtype=np.float64)
+    pd.testing.assert_series_equal(format_currency_labels(series), series.apply(format_currency_label).astype(object))
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_random_magnitudes(seed):
+    rng = np.random.default_rng(seed)
+    # log-uniform from a thousandth of a cent to beyond the billions, with some negatives
+    values = 10 ** rng.uniform(-5, 13, 20_000) * rng.choice([1, 1, 1, -1], 20_000)
+    assert_same_labels(values)
+    # amounts as they come out of sums of cents
+    assert_same_labels(np.round(values, 2))
+
+
+def test_half_cents():
+    # the first and last cents of the labels of a unit, and a seeded sample of the others
+    cents = np.concatenate([np.arange(0, 1000), np.arange(99_000, 100_000),
+                            np.random.default_rng(0).integers(1000, 99_000, 10_000)])
+    values = np.concatenate([(cents + 0.5) / 100 * unit for unit in UNITS])
+    neighbours = np.concatenate([np.nextafter(values, np.inf), np.nextafter(values, -np.inf)])
+    assert_same_labels(np.concatenate([values, neighbours, -values]))
+
+
+def test_unit_boundaries():
+    bounds = np.array([1e3, 1e6, 1e9, 1e12])
+    values = np.concatenate([bounds, np.nextafter(bounds, 0), np.nextafter(bounds, np.inf),
+                             bounds - 0.005, bounds - 0.004, bounds - 0.006, [0.0, -0.0, 0.004, 0.005, 999.995]])
+    assert_same_labels(np.concatenate([values, -values]))
+
+
+def test_non_finite():
+    assert_same_labels([np.nan, np.inf, -np.inf, 1.5, np.nan, 0.0])
+
+
+def test_index_and_name_kept():
+    series = pd.Series([1234.5, 0.1], index=[7, 3], name="Award Amount")
+    labels = format_currency_labels(series)
+    assert list(labels.index) == [7, 3] and labels.name == "Award Amount"
+    assert list(labels) == ["1.23 K", "0.10"]
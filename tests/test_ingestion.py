@@ -0,0 +1,210 @@
+"""
+Ingestion against a local stand-in of the USAspending and SAM.gov search APIs: an http.server in a thread
+serving paged JSON, with injectable failures.
+"""
+import csv
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+import pytest
+import requests
+
+from ingestion import HttpClient, UsaSpendingSource, SamSource, CsvChunkWriter, Checkpoint, ingest, \
+    query_fingerprint
+
+RECORDS = 95
+PAGE_SIZE = 10
+FIELDS = ["Award ID", "generated_internal_id", "Recipient Name", "Award Amount"]
+
+
+def award(number: int):
+    return {"Award ID": f"A{number}", "generated_internal_id": f"CONT_{number}",
+            "Recipient Name": f"Recipient, {number % 7}", "Award Amount": number * 1.5}
+
+
+def opportunity(number: int):
+    return {"noticeId": f"N{number}", "title": f"Opportunity \"{number}\"", "type": "Solicitation"}
+
+
+class StandIn:
+    """
+    State of the stand-in server: records, delay per request, failures to inject and what was requested.
+    """
+
+    def __init__(self):
+        self.delay = 0.0
+        # page number (from 0) to the list of error statuses answered before the page
+        self.failures = {}
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def answer(self, page: int, records: list):
+        with self.lock:
+            self.requests.append((time.monotonic(), page))
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            failures = self.failures.get(page, [])
+            status = failures.pop(0) if failures else 200
+        try:
+            time.sleep(self.delay)
+            return status, records[page * PAGE_SIZE:(page + 1) * PAGE_SIZE]
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+
+class Handler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def reply(self, status: int, body: dict):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        if status == 429:
+            self.send_header("Retry-After", "0")
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        status, records = self.server.stand_in.answer(body["page"] - 1, [award(n) for n in range(RECORDS)])
+        self.reply(status, {"results": records} if status == 200 else {"error": status})
+
+    def do_GET(self):
+        query = parse_qs(urlsplit(self.path).query)
+        page = int(query["start"][0]) // int(query["limit"][0])
+        status, records = self.server.stand_in.answer(page, [opportunity(n) for n in range(RECORDS)])
+        self.reply(status, {"opportunities": records} if status == 200 else {"error": status})
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    httpd.stand_in = StandIn()
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def url(server, path: str):
+    return f"http://127.0.0.1:{server.server_address[1]}{path}"
+
+
+def usaspending(server, rate: float = 0, retries: int = 3):
+    client = HttpClient(rate=rate, retries=retries, backoff=0.01, timeout=10)
+    return UsaSpendingSource(client, url=url(server, "/usaspending"), params={"fields": FIELDS},
+                             page_size=PAGE_SIZE)
+
+
+def single_pass(path: str, columns: list, rows: list):
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        writer = csv.DictWriter(file, fieldnames=columns, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def read(path: str):
+    with open(path, encoding="utf-8") as file:
+        return file.read()
+
+
+def test_download_equals_single_pass(server, tmp_path):
+    path = str(tmp_path / "PastAwards.csv")
+    assert ingest(usaspending(server), path, workers=4, chunk_rows=15) == RECORDS
+    single_pass(str(tmp_path / "expected.csv"), FIELDS, [award(n) for n in range(RECORDS)])
+    assert read(path) == read(str(tmp_path / "expected.csv"))
+    assert not os.path.exists(path + ".partial") and not os.path.exists(path + ".checkpoint.json")
+
+
+def test_sam_rows(server, tmp_path):
+    client = HttpClient(rate=0, retries=0, timeout=10)
+    source = SamSource(client, "key", url=url(server, "/sam"), page_size=PAGE_SIZE)
+    path = str(tmp_path / "ActiveOpportunities.csv")
+    assert ingest(source, path, workers=3) == RECORDS
+    single_pass(str(tmp_path / "expected.csv"), source.columns,
+                [source.row(opportunity(n)) for n in range(RECORDS)])
+    assert read(path) == read(str(tmp_path / "expected.csv"))
+
+
+def test_pages_fetched_concurrently(server, tmp_path):
+    server.stand_in.delay = 0.05
+    ingest(usaspending(server), str(tmp_path / "PastAwards.csv"), workers=4)
+    assert 1 < server.stand_in.max_in_flight <= 4
+
+
+def test_rate_limit(server, tmp_path):
+    rate = 20
+    ingest(usaspending(server, rate=rate), str(tmp_path / "PastAwards.csv"), workers=4)
+    times = sorted(moment for moment, _ in server.stand_in.requests)
+    # evenly spaced over all threads, with some slack for the clock
+    assert times[-1] - times[0] >= (len(times) - 1) / rate * 0.9
+
+
+def test_retry_on_rate_limit_and_server_errors(server, tmp_path):
+    server.stand_in.failures = {2: [429, 503], 5: [500, 502, 504]}
+    path = str(tmp_path / "PastAwards.csv")
+    assert ingest(usaspending(server, retries=3), path, workers=4) == RECORDS
+    pages = [page for _, page in server.stand_in.requests]
+    assert pages.count(2) == 3 and pages.count(5) == 4
+    single_pass(str(tmp_path / "expected.csv"), FIELDS, [award(n) for n in range(RECORDS)])
+    assert read(path) == read(str(tmp_path / "expected.csv"))
+
+
+def test_client_errors_not_retried(server):
+    server.stand_in.failures = {0: [404]}
+    with pytest.raises(requests.HTTPError):
+        usaspending(server).fetch(0)
+    assert len(server.stand_in.requests) == 1
+
+
+def test_resume_after_failure(server, tmp_path):
+    path = str(tmp_path / "PastAwards.csv")
+    source = usaspending(server, retries=0)
+    # the run dies on page 6, after the chunks of pages 0-1, 2-3 and 4-5 were checkpointed
+    server.stand_in.failures = {6: [500] * 10}
+    with pytest.raises(requests.HTTPError):
+        ingest(source, path, workers=1, chunk_rows=20)
+    state = Checkpoint(path + ".checkpoint.json", query_fingerprint(source)).load()
+    assert state["next_page"] == 6 and state["rows"] == 60
+    assert not os.path.exists(path)
+
+    server.stand_in.failures = {}
+    server.stand_in.requests = []
+    assert ingest(source, path, workers=4, chunk_rows=20) == RECORDS
+    # only the pages after the checkpoint were fetched again
+    assert min(page for _, page in server.stand_in.requests) == 6
+    single_pass(str(tmp_path / "expected.csv"), FIELDS, [award(n) for n in range(RECORDS)])
+    assert read(path) == read(str(tmp_path / "expected.csv"))
+    with open(path, newline="", encoding="utf-8") as file:
+        keys = [row["generated_internal_id"] for row in csv.DictReader(file)]
+    assert len(keys) == len(set(keys)) == RECORDS
+
+
+def test_writer_discards_rows_after_offset(tmp_path):
+    path = str(tmp_path / "chunks.csv")
+    rows = [award(n) for n in range(30)]
+    writer = CsvChunkWriter(path, FIELDS)
+    writer.write(rows[:10])
+    offset = writer.flush()
+    # rows written after the last checkpoint are dropped when the file is reopened at its offset
+    writer.write(rows[10:15])
+    writer.flush()
+    writer.close()
+    writer = CsvChunkWriter(path, FIELDS, offset=offset)
+    writer.write(rows[10:20])
+    writer.flush()
+    writer.write(rows[20:])
+    writer.flush()
+    writer.close()
+    single_pass(str(tmp_path / "expected.csv"), FIELDS, rows)
+    assert read(path) == read(str(tmp_path / "expected.csv"))
@@ -0,0 +1,35 @@
+"""
+Tasks run on the thread pool are profiled as stages of the rerun that submitted them.
+"""
+import threading
+
+import parallel
+from profiling import PROFILER
+
+
+def test_worker_stages_recorded(monkeypatch):
+    monkeypatch.setattr(parallel, "PARALLEL_WORKERS", 2)
+    monkeypatch.setattr(PROFILER, "enabled", True)
+    threads = set()
+
+    def task(name):
+        def run():
+            with PROFILER.stage(name):
+                threads.add(threading.current_thread().name)
+                with PROFILER.stage(f"{name} inner"):
+                    return name
+        return run
+
+    PROFILER.begin()
+    with PROFILER.stage("figures"):
+        results = parallel.run_tasks({name: task(name) for name in ["a", "b", "c"]})
+    summary = PROFILER.end()
+
+    assert results == {"a": "a", "b": "b", "c": "c"}
+    assert all(name.startswith("foam-task") for name in threads)
+    depths = {record["stage"]: record["depth"] for record in summary["stages"]}
+    assert depths == {"figures": 0, "a": 1, "b": 1, "c": 1, "a inner": 2, "b inner": 2, "c inner": 2}
+    assert all(record["seconds"] is not None for record in summary["stages"])
+    # the workers are left outside any rerun
+    assert parallel.run_tasks({"d": task("d"), "e": task("e")}) == {"d": "d", "e": "e"}
+    assert PROFILER.end() is None
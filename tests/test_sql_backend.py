@@ -0,0 +1,47 @@
+"""
+Equivalence of the SQL backend with the pandas path: for seeded random sidebar selections of every page,
+the options, KPIs, chart aggregations, row counts and sorted table pages must be equal.
+"""
+import random
+
+import pytest
+
+from aggregations import current_opportunities_aggregates, competitor_aggregates, forecast_aggregates
+from benchmarks.synthetic import assert_same, random_selection
+from data_loader import load_active_opportunities_facets, load_past_awards_facets
+from sql_backend import SqlBackend, build_database
+from utils import paginate
+
+SELECTIONS = 50
+
+PAGES = [
+    ("active_opportunities", load_active_opportunities_facets, current_opportunities_aggregates,
+     "current_opportunities_aggregates"),
+    ("past_awards", load_past_awards_facets, competitor_aggregates, "competitor_aggregates"),
+    ("past_awards", load_past_awards_facets, forecast_aggregates, "forecast_aggregates"),
+]
+
+
+@pytest.fixture(scope="module")
+def backend(tmp_path_factory):
+    return SqlBackend(build_database(str(tmp_path_factory.mktemp("sql") / "foam.sqlite")))
+
+
+@pytest.mark.parametrize("table, load_facets, aggregate, name", PAGES, ids=[page[3] for page in PAGES])
+def test_same_as_pandas(backend, table, load_facets, aggregate, name):
+    rng = random.Random(name)
+    facets = load_facets()
+    assert backend.options[table] == facets.options
+    for _ in range(SELECTIONS):
+        selection = random_selection(facets.options, rng)
+        filtered = facets.select(selection)
+        expected, actual = aggregate(filtered), getattr(backend, name)(selection)
+        for key in expected:
+            assert_same(expected[key], actual[key], f"{name} {key} {selection}")
+        assert backend.row_count(table, selection) == len(filtered)
+        sort_by = rng.choice([None] + list(filtered.columns))
+        ascending = rng.random() < 0.5
+        columns = list(filtered.columns)
+        assert_same(paginate(filtered, 1, 25, sort_by, ascending)[columns],
+                    backend.page(table, selection, columns, 1, 25, sort_by, ascending),
+                    f"{table} page sorted by {sort_by} {selection}")
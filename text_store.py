@@ -0,0 +1,142 @@
+import json
+import mmap
+import os
+import shutil
+import threading
+
+import numpy as np
+import pandas as pd
+
+# bumped whenever the store layout changes, so stores written by older versions are rebuilt
+TEXT_STORE_VERSION = 1
+
+MANIFEST = "manifest.json"
+
+
+def _write_column(values: pd.Series, prefix: str):
+    # texts are concatenated as UTF-8, row i spans offsets[i]:offsets[i + 1]
+    missing = values.isna().values
+    encoded = [b"" if skip else str(value).encode("utf-8") for value, skip in zip(values.values, missing)]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(text) for text in encoded], out=offsets[1:])
+    with open(prefix + ".bin", "wb") as file:
+        file.writelines(encoded)
+    np.save(prefix + ".offsets.npy", offsets)
+    np.save(prefix + ".missing.npy", missing)
+
+
+def build_text_store(data: pd.DataFrame, root: str, key: str, columns: list, source):
+    """
+    Write text columns to a store of their own, one file of concatenated texts per column
+    with the offsets of the rows, in the row order of the data.
+
+    The store is written next to the root and moved into place, so readers never see a partial store.
+
+    :param data: DataFrame holding the key and text columns.
+    :param root: Directory of the store.
+    :param key: Column identifying the rows, stored like the texts.
+    :param columns: Text columns to store.
+    :param source: JSON-serializable version of the source file, saved in the manifest.
+    :return: The manifest.
+    """
+    temporary = root + ".tmp"
+    shutil.rmtree(temporary, ignore_errors=True)
+    os.makedirs(temporary)
+    files = {}
+    for number, column in enumerate([key] + columns):
+        files[column] = f"column-{number}"
+        _write_column(data[column], os.path.join(temporary, files[column]))
+
+    manifest = {"version": TEXT_STORE_VERSION, "source": source, "rows": len(data), "key": key,
+                "columns": columns, "files": files}
+    with open(os.path.join(temporary, MANIFEST), "w") as file:
+        json.dump(manifest, file, indent=1)
+    shutil.rmtree(root, ignore_errors=True)
+    os.replace(temporary, root)
+    return manifest
+
+
+def read_text_manifest(root: str):
+    """
+    :param root: Directory of the store.
+    :return: The manifest, or None when there is no store of the current version.
+    """
+    path = os.path.join(root, MANIFEST)
+    if not os.path.exists(path):
+        return None
+    with open(path) as file:
+        manifest = json.load(file)
+    return manifest if manifest.get("version") == TEXT_STORE_VERSION else None
+
+
+class TextStore:
+    """
+    Read access to a text store, by row position or by key.
+
+    Nothing is read when the store is opened: the files of a column are memory-mapped on
+    its first read, and only the pages holding the requested rows are then loaded by the OS.
+    """
+
+    def __init__(self, root: str, manifest: dict = None):
+        """
+        :param root: Directory of the store.
+        :param manifest: Manifest of the store, read from disk when None.
+        """
+        self.root = root
+        self.manifest = read_text_manifest(root) if manifest is None else manifest
+        self.key = self.manifest["key"]
+        self.columns = self.manifest["columns"]
+        self._opened = {}
+        self._keys = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self.manifest["rows"]
+
+    def _open(self, column: str):
+        with self._lock:
+            if column not in self._opened:
+                prefix = os.path.join(self.root, self.manifest["files"][column])
+                with open(prefix + ".bin", "rb") as file:
+                    # an empty file cannot be mapped
+                    blob = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(file.fileno()).st_size \
+                        else b""
+                self._opened[column] = (blob, np.load(prefix + ".offsets.npy", mmap_mode="r"),
+                                        np.load(prefix + ".missing.npy", mmap_mode="r"))
+            return self._opened[column]
+
+    def texts(self, column: str, positions):
+        """
+        :param column: Name of a stored column.
+        :param positions: Row positions to read.
+        :return: List of the texts of the rows, None for missing values.
+        """
+        blob, offsets, missing = self._open(column)
+        positions = np.asarray(positions, dtype=np.int64)
+        starts, stops = offsets[positions], offsets[positions + 1]
+        return [None if skip else blob[start:stop].decode("utf-8")
+                for start, stop, skip in zip(starts.tolist(), stops.tolist(), missing[positions].tolist())]
+
+    def positions(self, keys):
+        """
+        :param keys: Keys of rows.
+        :return: Array of the row positions of the keys, -1 for unknown keys.
+        """
+        if self._keys is None:
+            index = pd.Index(self.texts(self.key, np.arange(len(self))))
+            with self._lock:
+                self._keys = index
+        return self._keys.get_indexer(pd.Index([str(key) for key in keys]))
+
+    def lookup(self, column: str, keys):
+        """
+        :param column: Name of a stored column.
+        :param keys: Keys of rows.
+        :return: Series of the texts indexed by the keys, None for missing values and unknown keys.
+        """
+        keys = list(keys)
+        positions = self.positions(keys)
+        found = positions >= 0
+        texts = np.full(len(keys), None, dtype=object)
+        texts[found] = self.texts(column, positions[found])
+        return pd.Series(texts, index=keys, name=column, dtype=object)
@@ -1,8 +1,12 @@
-import datetime
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 import plotly.express as px
 
+from distinct import count_distinct_codes
+from profiling import profiled
+from schema import MONTHS_UNTIL_END_BINS
+
 
 # color palette
 COLORS = [
@@ -18,6 +22,12 @@ COLORS = [
     "#495057",  # Gray
 ]
 
+# lookup tables used to assemble currency labels from whole cents
+_CURRENCY_DIVISORS = np.array([1, 1e3, 1e6, 1e9])
+_CURRENCY_SUFFIXES = ["", " K", " M", " bn"]
+_WHOLE_UNITS = np.array([f"{i}." for i in range(1000)], dtype=object)
+_CENTS_SUFFIXES = np.array([f"{i:02d}{suffix}" for suffix in _CURRENCY_SUFFIXES for i in range(100)], dtype=object)
+
 # html for metric components (card view)
 metric_div_1 = """
     <div data-testid="metric-container" style="background:#708d81;
@@ -68,29 +78,67 @@ def preprocess_color_info(data: pd.DataFrame):
     by mapping a color code.
 
     :param data: DataFrame containing color info with values 'Red', 'Yellow', or 'Green'.
-    :return: DataFrame with an additional info from mapping to
+    :return: New DataFrame with an additional info from mapping to
     color codes '#e76f51' (Red), '#e9c46a' (Yellow), or '#52b788' (Green).
     """
 
-    data["DaysRemainingColor"] = data["DaysRemainingCode"].map({
+    return data.assign(DaysRemainingColor=data["DaysRemainingCode"].map({
         "Red": "#e76f51",
         "Yellow": "#e9c46a",
         "Green": "#52b788"
-    })
-    return data
+    }))
+
+
+def paginate(data: pd.DataFrame, page: int = 0, page_size: int = None, sort_by: str = None, ascending: bool = True):
+    """
+    Slice one page of rows out of a DataFrame, optionally sorted by a column.
+    Only the sort column is sorted, the other columns are read for the rows of the page only.
+
+    :param data: A pandas DataFrame.
+    :param page: Zero-based number of the page.
+    :param page_size: Number of rows per page, None for all rows.
+    :param sort_by: Column to sort the rows by, None to keep the current order.
+    :param ascending: Sort direction.
+    :return: DataFrame with the rows of the page.
+    """
+    if sort_by is None and page_size is None:
+        return data
+    if sort_by is None:
+        order = np.arange(len(data))
+    else:
+        order = data[sort_by].reset_index(drop=True).sort_values(ascending=ascending, kind="mergesort").index.values
+    if page_size is not None:
+        order = order[page * page_size:(page + 1) * page_size]
+    return data.take(order)
 
 
-def opportunities_table(data: pd.DataFrame, columns: list):
+def page_count(row_count: int, page_size: int):
+    """
+    Number of pages needed to show all rows, at least one.
+
+    :param row_count: Number of rows.
+    :param page_size: Number of rows per page.
+    :return: Number of pages.
+    """
+    return max(1, -(-row_count // page_size))
+
+
+@profiled
+def opportunities_table(data: pd.DataFrame, columns: list, page: int = 0, page_size: int = None,
+                        sort_by: str = None, ascending: bool = True):
     """
     Generates a formatted table for displaying government contract opportunities.
 
     :param data: A pandas DataFrame.
     :param columns: A list of column names to include in the table.
+    :param page: Zero-based number of the page to show.
+    :param page_size: Number of rows per page, None for all rows.
+    :param sort_by: Column to sort the rows by, None to keep the current order.
+    :param ascending: Sort direction.
     :return: A Plotly Figure object representing the formatted table.
     """
-    data = format_date_column(data)
-    table_data = data[columns]
-    table_data.rename(columns={
+    data = paginate(data, page, page_size, sort_by, ascending)
+    table_data = format_date_column(data[columns]).rename(columns={
         "Awarding_Agency": "Awarding Agency",
         "Days_to_ResponseDeadline": "Days Remaining",
         "Description link": "URL",
@@ -98,8 +146,8 @@ def opportunities_table(data: pd.DataFrame, columns: list):
         "Set_Aside_Type": "Set Aside",
         "Score": "ECS Rating",
         "Posted_Date": "Posted Date"
-    }, inplace=True)
-    table_data["URL"] = table_data["URL"].apply(lambda x: f"""<a href="{x}">Visit</a>""")
+    })
+    table_data["URL"] = format_url_links(table_data["URL"])
     fig = go.Figure(data=[go.Table(
         columnwidth=[2, 2, 2, 1, 1, 1, 2, 1, 1],
         header=dict(
@@ -122,24 +170,29 @@ def opportunities_table(data: pd.DataFrame, columns: list):
     return fig
 
 
-def forecast_table(data: pd.DataFrame, columns: list):
+@profiled
+def forecast_table(data: pd.DataFrame, columns: list, page: int = 0, page_size: int = None,
+                   sort_by: str = None, ascending: bool = True):
     """
     Generates a formatted table for forecast data.
 
     :param data: DataFrame containing forecast data.
     :param columns: List of column names to include in the table.
+    :param page: Zero-based number of the page to show.
+    :param page_size: Number of rows per page, None for all rows.
+    :param sort_by: Column to sort the rows by, None to keep the current order.
+    :param ascending: Sort direction.
     :return: Plotly figure object representing the formatted table.
     """
-    data = format_date_column(data)
-    table_data = data[columns]
-    table_data.rename(columns={
+    data = paginate(data, page, page_size, sort_by, ascending)
+    table_data = format_date_column(data[columns]).rename(columns={
         "Recipient Name": "Incumbent Name",
         "naics_description": "Description",
         "Award Amount": "Current Award Amount",
         "PastAwards_URL": "URL"
-    }, inplace=True)
-    table_data["Current Award Amount"] = table_data["Current Award Amount"].apply(format_currency_label)
-    table_data["URL"] = table_data["URL"].apply(lambda x: f"""<a href="{x}">Visit</a>""")
+    })
+    table_data["Current Award Amount"] = format_currency_labels(table_data["Current Award Amount"])
+    table_data["URL"] = format_url_links(table_data["URL"])
     fig = go.Figure(data=[go.Table(
         columnwidth=[1, 1, 1, 2, 1, 1, 1, 1, 1, 1],
         header=dict(
@@ -160,22 +213,27 @@ def forecast_table(data: pd.DataFrame, columns: list):
     return fig
 
 
-def awards_table(data: pd.DataFrame, columns: list):
+@profiled
+def awards_table(data: pd.DataFrame, columns: list, page: int = 0, page_size: int = None,
+                 sort_by: str = None, ascending: bool = True):
     """
     Generates a formatted table visualization of awards data.
 
     :param data: DataFrame containing awards data.
     :param columns: List of columns to include in the table.
+    :param page: Zero-based number of the page to show.
+    :param page_size: Number of rows per page, None for all rows.
+    :param sort_by: Column to sort the rows by, None to keep the current order.
+    :param ascending: Sort direction.
     :return: Plotly Figure object representing the awards table.
     """
-    data = format_date_column(data)
-    table_data = data[columns]
-    table_data.rename(columns={
+    data = paginate(data, page, page_size, sort_by, ascending)
+    table_data = format_date_column(data[columns]).rename(columns={
         "AwardAmount_Binned": "Award Size",
         "PastAwards_URL": "URL"
-    }, inplace=True)
-    table_data["Award Amount"] = table_data["Award Amount"].apply(format_currency_label)
-    table_data["URL"] = table_data["URL"].apply(lambda x: f"""<a href="{x}">Visit</a>""")
+    })
+    table_data["Award Amount"] = format_currency_labels(table_data["Award Amount"])
+    table_data["URL"] = format_url_links(table_data["URL"])
     fig = go.Figure(data=[go.Table(
         columnwidth=[1, 1, 1, 1, 1, 1, 1, 1, 1, 1],
         header=dict(
@@ -196,39 +254,84 @@ def awards_table(data: pd.DataFrame, columns: list):
     return fig
 
 
+def _count_distinct(values):
+    """
+    Number of distinct non-missing values of a column array, like nunique without building a Series.
+    Keys encoded as categoricals at load time are counted on their integer ids.
+    """
+    if isinstance(values, pd.Categorical):
+        return count_distinct_codes(values.codes, len(values.categories))
+    uniques = pd.unique(values)
+    return len(uniques) - int(pd.isna(uniques).any())
+
+
+def _count_in(series: pd.Series, values: list):
+    """
+    Number of rows of a column equal to one of the given values, compared on category codes when possible.
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        codes = [series.cat.categories.get_loc(value) for value in values if value in series.cat.categories]
+        return int(np.isin(series.cat.codes.values, codes).sum())
+    return int(np.isin(series.values, values).sum())
+
+
+def _sum(series: pd.Series, dtype=None):
+    """
+    Sum of the non-missing values of a numeric column.
+    """
+    values = series.values
+    if values.dtype.kind == "f":
+        values = np.where(np.isnan(values), 0, values)
+    return values.sum(dtype=dtype)
+
+
+def _mean(series: pd.Series):
+    """
+    Mean of the non-missing values of a numeric column, NaN when there are none.
+    """
+    values = series.values
+    count = len(values) - int(np.isnan(values).sum()) if values.dtype.kind == "f" else len(values)
+    if count == 0:
+        return np.nan
+    return _sum(series, dtype=np.float64) / count
+
+
+@profiled
 def current_opportunities_kpis(data: pd.DataFrame):
     """
     Calculate KPIs for current opportunities.
+    Works on the column arrays directly, without building filtered DataFrames.
 
     :param data: A pandas DataFrame containing the data for current opportunities.
     :return: A tuple containing the total number of opportunities, the average days to respond,
              the count of positive score mappings, and the count of avb opportunities.
     """
-    total_opportunities = data["Notice_ID"].nunique()
-    days_to_respond = data["Days_to_ResponseDeadline"].mean()
-    count_positive_ecs = len(data[data["Score_Mapped"] == "Positive"])
-    count_green = len(data[data['DaysRemainingCode'] == "Green"])
+    total_opportunities = _count_distinct(data["Notice_ID"].values)
+    days_to_respond = _mean(data["Days_to_ResponseDeadline"])
+    count_positive_ecs = _count_in(data["Score_Mapped"], ["Positive"])
+    count_green = _count_in(data["DaysRemainingCode"], ["Green"])
 
     return total_opportunities, days_to_respond, count_positive_ecs, count_green
 
 
+@profiled
 def competitor_kpis(data: pd.DataFrame):
     """
     Calculate KPIs for competitors based on the given data.
+    Works on the column arrays directly, without building filtered DataFrames.
 
     :param data: DataFrame containing competitor data.
     :return: A tuple containing the total number of unique past awards,
              the number of awards with amounts equal to or above six million,
              and the total amount of awards.
     """
-    total_past_awards = data["generated_internal_id"].nunique()
-    six_million_above = len(data[
-                                (data["AwardAmount_Binned"] == "6-12 million") |
-                                (data["AwardAmount_Binned"] == "12+ million")])
-    award_amount = data["Award Amount"].sum()
+    total_past_awards = _count_distinct(data["generated_internal_id"].values)
+    six_million_above = _count_in(data["AwardAmount_Binned"], ["6-12 million", "12+ million"])
+    award_amount = _sum(data["Award Amount"])
     return total_past_awards, six_million_above, award_amount
 
 
+@profiled
 def bar_scatter_chart(data: pd.DataFrame, bar_X: str, bar_Y: str, bar_name: str,
                       scatter_X: str, scatter_Y: str, scatter_name, title):
     """
@@ -279,6 +382,7 @@ def bar_scatter_chart(data: pd.DataFrame, bar_X: str, bar_Y: str, bar_name: str,
     return fig
 
 
+@profiled
 def bar_chart(data: pd.DataFrame, x: str, y: str, orient: str, title: str, text=None, pre_hover_text=None):
     """
     Create a bar chart using Plotly.
@@ -315,6 +419,7 @@ def bar_chart(data: pd.DataFrame, x: str, y: str, orient: str, title: str, text=
     return fig
 
 
+@profiled
 def binned_bar_chart(data: pd.DataFrame, x: str, y: str, color: str, title):
     """
     Create a binned bar chart using Plotly Express.
@@ -327,7 +432,7 @@ def binned_bar_chart(data: pd.DataFrame, x: str, y: str, color: str, title):
     :return: A Plotly Figure object representing the binned bar chart.
     """
     data = data[(data[x] <= 10) & (data[x] >= 1)]
-    data[color] = data[color].str[:20]
+    data = data.assign(**{color: data[color].str[:20]})
     fig = px.bar(data_frame=data,
                  x=x,
                  y=y,
@@ -341,6 +446,7 @@ def binned_bar_chart(data: pd.DataFrame, x: str, y: str, color: str, title):
     return fig
 
 
+@profiled
 def binned_scatter_plot(data: pd.DataFrame, x: str, y: str, color: str, title: str):
     """
     Creates a binned scatter plot using Plotly Express.
@@ -352,7 +458,7 @@ def binned_scatter_plot(data: pd.DataFrame, x: str, y: str, color: str, title: s
     :param title: Title of the plot.
     :return: Plotly figure object.
     """
-    data[color] = data[color].str[:20]
+    data = data.assign(**{color: data[color].str[:20]})
     fig = px.scatter(data_frame=data, x=x,
                      y=y,
                      color=color,
@@ -363,13 +469,12 @@ def binned_scatter_plot(data: pd.DataFrame, x: str, y: str, color: str, title: s
                                               "#0096c7", "#2d6a4f", "#7209b7"]
                      )
     fig.update_layout(title=title, height=500)
-    fig.update_xaxes(categoryorder='array', categoryarray=['0-3 months', '3-6 months',
-                                                           '6-12 months', '12-18 months',
-                                                           '18+ months'])
+    fig.update_xaxes(categoryorder='array', categoryarray=MONTHS_UNTIL_END_BINS[:-1])
     fig.update_traces(marker={'size': 15})
     return fig
 
 
+@profiled
 def scatter_plot(data: pd.DataFrame, x: str, y: str, title: str, name, text=None):
     """
     Create a scatter plot using Plotly graph objects.
@@ -408,6 +513,7 @@ def scatter_plot(data: pd.DataFrame, x: str, y: str, title: str, name, text=None
     return fig
 
 
+@profiled
 def pie_chart(data: pd.DataFrame, values: str, names: str, title: str, text_info: str):
     """
     Generate a pie chart.
@@ -432,6 +538,7 @@ def pie_chart(data: pd.DataFrame, values: str, names: str, title: str, text_info
     return fig
 
 
+@profiled
 def table_chart(data: pd.DataFrame, title: str):
     """
     Generate a formatted table chart using plotly graph objects.
@@ -461,25 +568,26 @@ def table_chart(data: pd.DataFrame, title: str):
     return fig
 
 
+@profiled
 def contracts_kpis(data: pd.DataFrame):
     """
     Calculate KPIs related to contracts.
+    Works on the column arrays directly, without building filtered DataFrames.
 
     :param data: DataFrame containing the contracts' data.
     :return: Tuple containing contracts count, average offers per contract, and total contracts value.
     """
-    contracts_count = data["generated_internal_id"].nunique()
-    total_offers = data['number_of_offers_received'].sum()
-    filtered_records = data[
-        (data['number_of_offers_received'] > 0)
-        | (data['number_of_offers_received'].notna())
-        ]
-    num_unique_contracts = len(filtered_records['generated_internal_id'].unique())
+    ids = data["generated_internal_id"].values
+    offers = data['number_of_offers_received']
+    contracts_count = _count_distinct(ids)
+    total_offers = _sum(offers)
+    # contracts with a known number of offers
+    num_unique_contracts = _count_distinct(ids[offers.notna().values])
     if num_unique_contracts == 0:
         average_offers_per_contract = 0
     else:
         average_offers_per_contract = total_offers / num_unique_contracts
-    contracts_value = data["Award Amount"].sum()
+    contracts_value = _sum(data["Award Amount"])
 
     return contracts_count, average_offers_per_contract, contracts_value
 
@@ -501,15 +609,51 @@ def format_currency_label(value):
         return f'{value:.2f}'
 
 
+def format_currency_labels(values: pd.Series):
+    """
+    Format a column of numerical values as currency labels, same output as format_currency_label.
+
+    Labels are assembled from whole cents with lookup tables. Values that cannot take that path
+    (negative, 1000 units or more, too close to a half cent to round safely, or not finite)
+    are formatted one by one instead.
+
+    :param values: Series of numerical values.
+    :return: Series of formatted currency label strings.
+    """
+    amounts = values.to_numpy(dtype=np.float64)
+    conditions = [amounts >= 1e9, amounts >= 1e6, amounts >= 1e3]
+    units = np.select(conditions, [3, 2, 1], default=0)
+    scaled = amounts / _CURRENCY_DIVISORS[units]
+
+    cents = scaled * 100
+    with np.errstate(invalid="ignore"):
+        fast = ~np.signbit(scaled) & (cents < 99999.5) & (np.abs(cents - np.floor(cents) - 0.5) > 1e-6)
+    cents = np.where(fast, np.round(cents), 0).astype(np.int64)
+    labels = _WHOLE_UNITS[cents // 100] + _CENTS_SUFFIXES[units * 100 + cents % 100]
+    for i in np.flatnonzero(~fast):
+        labels[i] = f"{scaled[i]:.2f}{_CURRENCY_SUFFIXES[units[i]]}"
+    return pd.Series(labels, index=values.index, dtype=object, name=values.name)
+
+
+def format_url_links(urls: pd.Series):
+    """
+    Format a column of URLs as html links.
+
+    :param urls: Series of URLs.
+    :return: Series of html anchor strings.
+    """
+    return '<a href="' + urls.astype(str) + '">Visit</a>'
+
+
 def format_date_column(data):
     """
     Format date columns in a DataFrame.
 
-    :param data: DataFrame containing the data.
-    :return: DataFrame with formatted date columns.
+    :param data: DataFrame containing the data, left unchanged.
+    :return: New DataFrame with formatted date columns, or the same DataFrame when it has none.
     """
-    if len(data) != 0:
-        for i in data.columns:
-            if isinstance(data[i].iloc[0], datetime.datetime):
-                data[i] = data[i].dt.strftime("%m-%d-%Y")
-    return data
+    formatted = {i: data[i].dt.strftime("%m-%d-%Y") for i in data.columns
+                 if pd.api.types.is_datetime64_any_dtype(data[i].dtype)}
+    if not formatted:
+        return data
+    return data.assign(**formatted)